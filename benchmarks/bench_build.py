@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Benchmark-Suite für das Erstellen und Exportieren von Büchern.
+
+Erzeugt synthetische Bücher (10, 1.000, 100.000 und 1.000.000 Kapitel,
+jeweils mit und ohne Bilder, mit unterschiedlich langen Texten) und misst
+für jede Stufe die Laufzeit sowie den Spitzenspeicher (tracemalloc).
+Die Ergebnisse werden als JSON geschrieben, damit sie zwischen Commits
+verglichen werden können:
+
+    python3 benchmarks/bench_build.py --output before.json
+    python3 benchmarks/bench_build.py --output after.json --compare before.json
+    python3 benchmarks/bench_build.py --sizes 10 1000 --no-memory
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from book_builder import InteractiveBook, iter_json_chapters  # noqa: E402
+from book_bundle import save_bundle  # noqa: E402
+
+DEFAULT_SIZES = (10, 1_000, 100_000, 1_000_000)
+IMAGE_COUNT = 50
+WORDS = ("Sonne", "Karte", "Reise", "Stadt", "Abenteuer", "Zeit", "Geschichte", "Weg", "Licht", "Nacht")
+# Kleinstes gültiges PNG (1x1 Pixel) für den Asset-Export
+TINY_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000100e221bc330000000049454e44ae426082"
+)
+
+
+def make_chapters(count: int, with_images: bool, image_dir: str, seed: int = 42):
+    """Erzeugt synthetische Kapitel als (Titel, Inhalt, Bild)-Tupel"""
+    rng = random.Random(seed)
+    # Wenige Textbausteine, damit das Erzeugen selbst kaum Zeit kostet
+    texts = [" ".join(rng.choice(WORDS) for _ in range(rng.choice((20, 200, 2000)))) for _ in range(64)]
+    images = [os.path.join(image_dir, f"bild_{i}.png") for i in range(IMAGE_COUNT)]
+    for i in range(count):
+        image = images[i % IMAGE_COUNT] if with_images else None
+        yield f"Kapitel {i}", texts[i % len(texts)], image
+
+
+def measure(func, memory: bool):
+    """Führt func einmal aus und gibt (Sekunden, Spitzenspeicher in Bytes) zurück"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - start
+        peak = None
+        if memory:
+            tracemalloc.start()
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return seconds, peak
+
+
+def run_case(count: int, with_images: bool, workdir: str, memory: bool, max_pages: int):
+    """Misst alle Stufen für ein Buch mit count Kapiteln"""
+    results = {}
+    chapters = list(make_chapters(count, with_images, os.path.join(workdir, "images")))
+    book = InteractiveBook(title="Benchmark", author="bench_build")
+    json_path = os.path.join(workdir, "book.json")
+    html_path = os.path.join(workdir, "book.html")
+    pack_path = os.path.join(workdir, "book.kibook")
+    store_path = os.path.join(workdir, "book.kidb")
+
+    def add_chapter():
+        book.chapters = []
+        for title, content, image in chapters:
+            book.add_chapter(title, content, image)
+
+    def add_chapters():
+        book.chapters = []
+        book.add_chapters(chapters)
+
+    def load_json():
+        with open(json_path, 'r', encoding='utf-8') as f:
+            for _ in iter_json_chapters(f):
+                pass
+
+    def save_html():
+        # Kalter Export: Fragment-Cache leeren
+        book.fragment_cache.fragments.clear()
+        book.save_to_html(html_path)
+
+    stages = [
+        ("add_chapter", add_chapter),
+        ("add_chapters", add_chapters),
+        ("save_to_json", lambda: book.save_to_json(json_path)),
+        ("save_to_json_compact", lambda: book.save_to_json(json_path, compact=True)),
+        ("iter_json_chapters", load_json),
+        ("save_to_html", save_html),
+        ("save_to_html_cached", lambda: book.save_to_html(html_path)),
+        ("save_to_pack", lambda: book.save_to_pack(pack_path)),
+        ("save_to_pack_lzma", lambda: book.save_to_pack(pack_path, compression="lzma")),
+        ("save_to_store", lambda: book.save_to_store(store_path)),
+        ("save_bundle", lambda: save_bundle(book, os.path.join(workdir, "bundle", "book.min.html"))),
+    ]
+    if with_images:
+        stages.append(("save_to_html_assets", lambda: book.save_to_html(html_path, assets=True)))
+    if count <= max_pages:
+        stages.append(("save_to_html_pages", lambda: book.save_to_html_pages(os.path.join(workdir, "pages"))))
+        stages.append(("save_to_html_reader", lambda: book.save_to_html_reader(os.path.join(workdir, "reader"))))
+
+    for name, func in stages:
+        seconds, peak = measure(func, memory)
+        results[name] = {"seconds": round(seconds, 6), "peak_bytes": peak}
+        print(f"  {name:<22} {seconds:10.3f} s" + (f" {peak / 1024 / 1024:10.1f} MiB" if peak is not None else ""))
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, baseline: dict):
+    """Gibt die Laufzeit-Verhältnisse gegenüber einer älteren Messung aus"""
+    print(f"\nVergleich mit {baseline.get('revision', '?')}:")
+    for case, stages in current["results"].items():
+        old_stages = baseline.get("results", {}).get(case, {})
+        for name, values in stages.items():
+            old = old_stages.get(name)
+            if not old or not old["seconds"]:
+                continue
+            ratio = values["seconds"] / old["seconds"]
+            marker = "  <-- langsamer" if ratio > 1.1 else ""
+            print(f"  {case:<18} {name:<22} {ratio:6.2f}x{marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--output", default="bench_results.json", help="JSON-Datei für die Ergebnisse")
+    parser.add_argument("--compare", help="ältere Ergebnisdatei zum Vergleich")
+    parser.add_argument("--no-memory", action="store_true", help="Spitzenspeicher nicht messen")
+    parser.add_argument("--max-pages", type=int, default=100_000,
+                        help="mehrseitigen Export nur bis zu dieser Kapitelanzahl messen")
+    args = parser.parse_args()
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": {},
+    }
+    workdir = tempfile.mkdtemp(prefix="book_bench_")
+    try:
+        os.makedirs(os.path.join(workdir, "images"))
+        for i in range(IMAGE_COUNT):
+            # Unterschiedliche Dateien, damit die Deduplizierung echte Arbeit hat
+            with open(os.path.join(workdir, "images", f"bild_{i}.png"), 'wb') as f:
+                f.write(TINY_PNG + i.to_bytes(4, "big"))
+        for count in args.sizes:
+            for with_images in (False, True):
+                case = f"{count}_{'images' if with_images else 'text'}"
+                print(f"{case}:")
+                report["results"][case] = run_case(count, with_images, workdir, not args.no_memory, args.max_pages)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nErgebnisse gespeichert: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
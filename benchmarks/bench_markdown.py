@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Skalierung des Kapitel-Renderers (render_markdown) mit der Textlänge.
+
+Erzeugt Kapitel von 1 bis 16 MB in mehreren Varianten: normaler Fließtext
+mit Auszeichnungen, Listen und Überschriften sowie Eingaben, an denen
+Regex-Ketten quadratisch werden (viele nicht geschlossene ``*`` und ``[``,
+lange Leerzeichenfolgen, ein einziger riesiger Absatz). Für jede Größe wird
+der Durchsatz gemessen. Wächst die Zeit pro MB von der kleinsten bis zur
+größten Größe um mehr als den Faktor 2 (quadratisches Verhalten ergäbe das
+Größenverhältnis selbst, also 16), endet das Skript mit Exit-Code 1:
+
+    python3 benchmarks/bench_markdown.py
+    python3 benchmarks/bench_markdown.py --sizes 1 2 4 --runs 3
+    python3 benchmarks/bench_markdown.py --cache
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from book_builder import MarkdownCache, render_markdown  # noqa: E402
+
+DEFAULT_SIZES = (1, 2, 4, 8, 16)
+WORDS = ("Sonne", "Karte", "Reise", "Stadt", "Abenteuer", "Zeit", "Geschichte", "Weg", "Licht", "Nacht")
+# Erlaubter Faktor zwischen der Zeit pro MB der kleinsten und größten Größe
+TOLERANCE = 2.0
+
+
+def prose(rng: random.Random) -> str:
+    """Ein Baustein aus normalem Text mit den unterstützten Auszeichnungen"""
+    blocks = []
+    for i in range(20):
+        words = [rng.choice(WORDS) for _ in range(60)]
+        words[5] = f"*{words[5]}*"
+        words[20] = f"**{words[20]}**"
+        words[40] = f"[{words[40]}](kapitel_{i}.html)"
+        words[50] = "<&>"
+        blocks.append(" ".join(words) + ".")
+        if i % 5 == 0:
+            blocks.append(f"## Abschnitt {i}")
+        if i % 7 == 0:
+            blocks.append("- eins\n- zwei mit _Betonung_\n1. erstens\n2. zweitens")
+    return "\n\n".join(blocks) + "\n\n"
+
+
+# Name -> Baustein, der bis zur gewünschten Größe wiederholt wird
+VARIANTS = {
+    "fliesstext": prose(random.Random(42)),
+    "offene_sterne": "*a **b ",
+    "offene_klammern": "[a ](b ",
+    "unterstriche": "snake_case_name _a ",
+    "leerzeichen": " " * 100 + "x\n",
+    "ein_absatz": " ".join(WORDS) + " *x* ",
+}
+
+
+def make_text(unit: str, megabytes: int) -> str:
+    size = megabytes * 1024 * 1024
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def measure(render, text: str, runs: int) -> float:
+    """
+    Beste Laufzeit in Sekunden aus mindestens runs Durchläufen; kurze
+    Messungen werden wiederholt, bis insgesamt eine halbe Sekunde vergangen ist.
+    """
+    best = None
+    total = 0.0
+    count = 0
+    while count < runs or total < 0.5:
+        start = time.perf_counter()
+        render(text)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+        total += seconds
+        count += 1
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Prüft, dass render_markdown linear mit der Textlänge skaliert.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="Kapitelgrößen in MB (Standard: 1 2 4 8 16)")
+    parser.add_argument("--runs", type=int, default=1, help="Durchläufe pro Messung (die beste zählt)")
+    parser.add_argument("--variants", nargs="+", choices=sorted(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--cache", action="store_true",
+                        help="zusätzlich einen zweiten Aufruf über den MarkdownCache messen")
+    args = parser.parse_args(argv)
+
+    sizes = sorted(args.sizes)
+    header = "".join(f"{f'{size} MB':>10}" for size in sizes)
+    print(f"{'Variante':<16}{header}  {'MB/s':>6}  Faktor")
+    failed = []
+    for name in args.variants:
+        timings = []
+        for size in sizes:
+            timings.append(measure(render_markdown, make_text(VARIANTS[name], size), args.runs))
+        per_mb = [seconds / size for seconds, size in zip(timings, sizes)]
+        factor = per_mb[-1] / per_mb[0] if per_mb[0] else 1.0
+        columns = "".join(f"{seconds:>9.3f}s" for seconds in timings)
+        print(f"{name:<16}{columns}  {sizes[-1] / timings[-1]:>6.1f}  {factor:.2f}")
+        if factor > TOLERANCE:
+            failed.append(name)
+
+    if args.cache:
+        cache = MarkdownCache()
+        text = make_text(VARIANTS["fliesstext"], sizes[0])
+        start = time.perf_counter()
+        cache.render(text)
+        first = time.perf_counter() - start
+        second = measure(cache.render, text, 1)
+        print(f"\nMarkdownCache ({sizes[0]} MB): erster Aufruf {first:.3f} s, danach {second * 1000:.2f} ms")
+
+    if failed:
+        print(f"\nNicht linear (Zeit pro MB wächst um mehr als x{TOLERANCE}): {', '.join(failed)}")
+        return 1
+    print(f"\nAlle Varianten linear (Zeit pro MB höchstens x{TOLERANCE} bei {sizes[-1] // sizes[0]}-facher Größe).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
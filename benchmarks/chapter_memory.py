@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Speichervergleich: Kapitel als Dictionary vs. Chapter-Objekt (__slots__).
+
+Misst mit tracemalloc, wie viel Speicher die Kapitel-Container selbst
+belegen. Die Texte werden für beide Varianten gemeinsam genutzt, damit nur
+der Overhead der Darstellung verglichen wird. Mit Python 3.11 (64 Bit)
+ergibt das etwa 192 B pro Dictionary und 88-89 B pro Chapter: 80 B für
+das Objekt mit sechs Slots (title, content, image, id, choices, _digest)
+plus 8 B für den Zeiger in der Liste, also etwa 54 % weniger.
+
+    python3 benchmarks/chapter_memory.py [anzahl_kapitel]
+"""
+
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from book_builder import Chapter  # noqa: E402
+
+
+def measure(build, count: int) -> int:
+    """Gibt den von build(count) belegten Speicher in Bytes zurück"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    chapters = build(count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del chapters
+    return after - before
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    title = "Kapitel"
+    content = "Inhalt " * 50
+    image = "images/bild.jpg"
+
+    def as_dicts(n):
+        return [{"title": title, "content": content, "image": image} for _ in range(n)]
+
+    def as_chapters(n):
+        return [Chapter(title, content, image) for _ in range(n)]
+
+    dict_bytes = measure(as_dicts, count)
+    chapter_bytes = measure(as_chapters, count)
+
+    print(f"Kapitel:          {count}")
+    print(f"List[Dict]:       {dict_bytes / 1024:10.1f} KiB ({dict_bytes / count:.0f} B/Kapitel)")
+    print(f"List[Chapter]:    {chapter_bytes / 1024:10.1f} KiB ({chapter_bytes / count:.0f} B/Kapitel)")
+    print(f"Ersparnis:        {100 * (1 - chapter_bytes / dict_bytes):.0f} %")
+
+
+if __name__ == "__main__":
+    main()
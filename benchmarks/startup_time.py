@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Startzeit-Benchmark mit Budget.
+
+Importiert jedes Einstiegsmodul in einem frischen Interpreter mit
+``python -X importtime`` und vergleicht die gemessene Importzeit mit dem
+Budget aus ``startup_budget.json``. Zusätzlich darf ein Modul bestimmte
+schwere Module beim Start nicht laden (``forbidden``), z.B. den
+Prozess-Pool oder den Dateiauswahl-Dialog. Bei einer Überschreitung endet
+das Skript mit Exit-Code 1, damit ``build.sh`` abbricht:
+
+    python3 benchmarks/startup_time.py
+    python3 benchmarks/startup_time.py --runs 10 --top 15
+    python3 benchmarks/startup_time.py --modules book_builder book_batch
+
+Nicht installierte GUI-Toolkits (Kivy, Tk) werden übersprungen.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_budget.json")
+
+
+def measure(module: str):
+    """
+    Importiert module einmal in einem neuen Prozess. Gibt
+    (Gesamtzeit in ms, {Modul: kumulierte Zeit in ms}) zurück oder None,
+    wenn der Import fehlschlägt.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        return None
+    imports = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _self, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            imports[name.strip()] = int(cumulative) / 1000
+    return imports.get(module), imports
+
+
+def check_module(module: str, budget: dict, runs: int, top: int):
+    """Misst ein Modul runs-mal und gibt die Liste der Verstöße zurück"""
+    samples = []
+    imports = {}
+    for _ in range(runs):
+        measured = measure(module)
+        if measured is None or measured[0] is None:
+            print(f"{module}: übersprungen (Import nicht möglich)")
+            return []
+        samples.append(measured[0])
+        imports = measured[1]
+    # Das Minimum ist am wenigsten von anderen Prozessen gestört
+    best = min(samples)
+    limit = budget.get("max_ms")
+    status = f"Budget {limit:.0f} ms" if limit else "kein Budget"
+    print(f"{module}: {best:.1f} ms (Median {sorted(samples)[len(samples) // 2]:.1f} ms, {status})")
+
+    slowest = sorted(
+        ((ms, name) for name, ms in imports.items() if name != module), reverse=True
+    )[:top]
+    for ms, name in slowest:
+        print(f"    {ms:8.1f} ms  {name}")
+
+    violations = []
+    if limit and best > limit:
+        violations.append(f"{module}: {best:.1f} ms > Budget {limit:.0f} ms")
+    for name in budget.get("forbidden", ()):
+        if name in imports:
+            violations.append(f"{module}: lädt beim Start '{name}'")
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget", default=DEFAULT_BUDGET, help="JSON-Datei mit dem Budget pro Modul")
+    parser.add_argument("--modules", nargs="+", help="nur diese Module prüfen")
+    parser.add_argument("--runs", type=int, default=5, help="Messungen pro Modul")
+    parser.add_argument("--top", type=int, default=8, help="so viele langsamste Importe anzeigen")
+    args = parser.parse_args()
+
+    with open(args.budget, 'r', encoding='utf-8') as f:
+        budgets = json.load(f)
+    # Einmal ohne Messung importieren, damit .pyc-Dateien aktuell sind
+    subprocess.run([sys.executable, "-m", "compileall", "-q", ROOT], cwd=ROOT, capture_output=True)
+
+    violations = []
+    for module in args.modules or list(budgets):
+        violations += check_module(module, budgets.get(module, {}), args.runs, args.top)
+
+    if violations:
+        print("\nStartzeit-Budget überschritten:")
+        for violation in violations:
+            print(f"  - {violation}")
+        sys.exit(1)
+    print("\nAlle Module innerhalb des Budgets.")
+
+
+if __name__ == "__main__":
+    main()
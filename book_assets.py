@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Bild-Assets für exportierte Bücher.
+
+Jedes referenzierte Bild wird geprüft, gehasht und genau einmal unter einem
+inhaltsadressierten Namen (``assets/<sha256>.<ext>``) abgelegt. Zusätzlich
+werden verkleinerte Varianten erzeugt, sofern Pillow installiert ist. Ein
+Cache im Asset-Ordner sorgt dafür, dass unveränderte Bilder beim nächsten
+Export weder neu gehasht noch neu skaliert werden.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+ASSETS_DIR = "assets"
+CACHE_FILE = ".asset_cache.json"
+
+# Dateisignaturen der unterstützten Bildformate
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+)
+
+
+def detect_image_type(path: str) -> Optional[str]:
+    """Erkennt das Bildformat anhand der Dateisignatur (None, wenn unbekannt)"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(12)
+    except (OSError, ValueError):
+        return None
+    for signature, extension in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def image_size(path: str) -> Optional[Tuple[int, int]]:
+    """
+    Liest Breite und Höhe aus dem Dateikopf (PNG, GIF, JPEG, WebP), ohne das
+    Bild zu dekodieren. None, wenn die Datei fehlt oder unbekannt ist
+    (auch bei ungültigen Pfaden, z.B. mit Nullbyte).
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(30)
+            if header.startswith(b"\x89PNG\r\n\x1a\n") and header[12:16] == b"IHDR":
+                return struct.unpack(">II", header[16:24])
+            if header[:6] in (b"GIF87a", b"GIF89a"):
+                return struct.unpack("<HH", header[6:10])
+            if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+                chunk = header[12:16]
+                if chunk == b"VP8X":
+                    return (int.from_bytes(header[24:27], "little") + 1,
+                            int.from_bytes(header[27:30], "little") + 1)
+                if chunk == b"VP8L":
+                    bits = int.from_bytes(header[21:25], "little")
+                    return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+                if chunk == b"VP8 ":
+                    width, height = struct.unpack("<HH", header[26:30])
+                    return width & 0x3FFF, height & 0x3FFF
+                return None
+            if header[:2] == b"\xff\xd8":
+                return _jpeg_size(f)
+    except (OSError, ValueError, struct.error):
+        return None
+    return None
+
+
+def _jpeg_size(f) -> Optional[Tuple[int, int]]:
+    """Sucht den SOF-Marker einer JPEG-Datei und liest die Abmessungen"""
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code == 0xFF:
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue
+        length = struct.unpack(">H", f.read(2))[0]
+        # SOF0..SOF15 ohne DHT (C4), JPG (C8) und DAC (CC)
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">xHH", f.read(5))
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class AssetPipeline:
+    """Kopiert, dedupliziert und skaliert die Bilder eines Buches"""
+
+    def __init__(self, output_dir: str, variant_widths: Tuple[int, ...] = (400, 800),
+                 display_width: int = 800, workers: int = None):
+        self.output_dir = output_dir
+        self.assets_dir = os.path.join(output_dir, ASSETS_DIR)
+        self.variant_widths = tuple(sorted(variant_widths))
+        self.display_width = display_width
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.cache_path = os.path.join(self.assets_dir, CACHE_FILE)
+        self.cache: Dict[str, Dict] = {}
+        self.warnings = []
+        # Relativer Pfad im Export -> (Breite, Höhe), sofern bekannt
+        self.sizes: Dict[str, Tuple[int, int]] = {}
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                self.cache = json.load(f)
+        except (OSError, ValueError):
+            self.cache = {}
+
+    def _save_cache(self):
+        with open(self.cache_path, 'w', encoding='utf-8') as f:
+            json.dump(self.cache, f, ensure_ascii=False)
+
+    def _identify(self, path: str) -> Optional[Dict]:
+        """Liefert Hash und Format eines Bildes, aus dem Cache wenn unverändert"""
+        try:
+            stat = os.stat(path)
+        except (OSError, ValueError):
+            self.warnings.append(f"Bild nicht gefunden: {path}")
+            return None
+        key = os.path.abspath(path)
+        entry = self.cache.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            if "dimensions" not in entry:
+                entry["dimensions"] = image_size(path)
+            return entry
+
+        extension = detect_image_type(path)
+        if extension is None:
+            self.warnings.append(f"Kein unterstütztes Bildformat: {path}")
+            return None
+        entry = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": _hash_file(path),
+            "ext": extension,
+            "dimensions": image_size(path),
+            "variants": [],
+        }
+        self.cache[key] = entry
+        return entry
+
+    def _store(self, path: str, entry: Dict) -> Dict:
+        """Kopiert das Original einmalig und erzeugt fehlende Varianten"""
+        name = entry["sha256"] + entry["ext"]
+        target = os.path.join(self.assets_dir, name)
+        if not os.path.exists(target):
+            shutil.copyfile(path, target + ".tmp")
+            os.replace(target + ".tmp", target)
+        try:
+            entry["variants"] = _make_variants(target, entry["sha256"], entry["ext"], self.variant_widths)
+        except OSError as exc:
+            # Beschädigtes Bild (Signatur passt, Inhalt nicht): Original ohne Varianten
+            self.warnings.append(f"Bild beschädigt, keine Varianten: {path} ({exc})")
+            entry["variants"] = []
+        return entry
+
+    def process(self, image_paths: Iterable[str]) -> Dict[str, str]:
+        """
+        Verarbeitet alle Bilder und gibt eine Zuordnung
+        Originalpfad -> relativer Pfad im Export zurück.
+        """
+        os.makedirs(self.assets_dir, exist_ok=True)
+        self._load_cache()
+        paths = list(dict.fromkeys(path for path in image_paths if path))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            entries = list(pool.map(self._identify, paths))
+            # Identische Bilder (gleicher Hash) nur einmal speichern/skalieren
+            unique = {}
+            for path, entry in zip(paths, entries):
+                if entry is not None:
+                    unique.setdefault(entry["sha256"], (path, entry))
+            stored = dict(zip(unique, pool.map(lambda item: self._store(*item), unique.values())))
+
+        mapping = {}
+        for path, entry in zip(paths, entries):
+            if entry is None:
+                continue
+            entry = stored[entry["sha256"]]
+            self.cache[os.path.abspath(path)]["variants"] = entry["variants"]
+            target = mapping[path] = ASSETS_DIR + "/" + self._display_name(entry)
+            size = self._display_size(entry)
+            if size:
+                self.sizes[target] = size
+        self._save_cache()
+        return mapping
+
+    def _display_name(self, entry: Dict) -> str:
+        """Wählt die größte Variante bis display_width, sonst das Original"""
+        best = None
+        for width in entry["variants"]:
+            if width <= self.display_width:
+                best = width
+        if best is None:
+            return entry["sha256"] + entry["ext"]
+        return f"{entry['sha256']}_{best}{entry['ext']}"
+
+    def _display_size(self, entry: Dict) -> Optional[Tuple[int, int]]:
+        """Abmessungen der im HTML verwendeten Datei (Variante oder Original)"""
+        if not entry.get("dimensions"):
+            return None
+        width, height = entry["dimensions"]
+        variants = [variant for variant in entry["variants"] if variant <= self.display_width]
+        if variants:
+            height = max(1, round(height * variants[-1] / width))
+            width = variants[-1]
+        return width, height
+
+
+def _make_variants(source: str, sha256: str, extension: str, widths: Tuple[int, ...]) -> list:
+    """
+    Erzeugt verkleinerte Varianten (benötigt Pillow, sonst keine Varianten).
+    Ein Bild, das Pillow nicht lesen kann, ergibt einen OSError.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return []
+
+    directory = os.path.dirname(source)
+    created = []
+    with Image.open(source) as image:
+        for width in widths:
+            if width >= image.width:
+                continue
+            target = os.path.join(directory, f"{sha256}_{width}{extension}")
+            if not os.path.exists(target):
+                height = max(1, round(image.height * width / image.width))
+                variant = image.resize((width, height))
+                try:
+                    variant.save(target + ".tmp", format=image.format)
+                    os.replace(target + ".tmp", target)
+                except BaseException:
+                    if os.path.exists(target + ".tmp"):
+                        os.remove(target + ".tmp")
+                    raise
+            created.append(width)
+    return created
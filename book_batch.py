@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Stapel-Build für viele Bücher.
+
+Jede ``*.json``-Datei im Spezifikations-Verzeichnis ist ein Buch im Format
+von ``save_to_json``. Ein optionaler Abschnitt ``build`` legt fest, was
+erzeugt wird:
+
+    {
+        "title": "...", "author": "...", "chapters": [...],
+        "build": {"formats": ["html", "pages"], "theme": "themes/dunkel", "assets": false}
+    }
+
+Formate sind alle Namen der Exporter-Registry (``json``, ``html``,
+``pages``, ``reader``, ``pack``, ``bundle`` sowie installierte Plugins).
+Mit ``bundle`` teilen sich alle Bücher des Katalogs ein Stylesheet in
+``<ausgabe>/styles/``; am Ende werden die gesparten Bytes ausgegeben. ``theme`` ist der Name eines registrierten Themes oder ein
+Verzeichnis relativ zur Spezifikation. Die Bücher werden parallel in einem
+Prozess-Pool gebaut. Ein Manifest (``.build_manifest.json`` im
+Ausgabeordner) speichert pro Buch einen Hash aller Eingaben; unveränderte
+Bücher, deren Ausgaben noch vorhanden sind, werden wie bei ``make``
+übersprungen. Am Ende wird eine Zeitübersicht pro Buch ausgegeben; mit
+``--profile`` zusätzlich ein Chrome-Trace aller Stufen (siehe book_profile).
+
+    python3 book_batch.py buecher/ --output dist/ --formats html json
+    python3 book_batch.py buecher/ --profile trace.json
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import book_profile
+from book_builder import (Chapter, InteractiveBook, available_exporters, get_exporter,
+                          iter_json_chapters, _atomic_write)
+from book_templates import Theme, get_theme
+
+# Formate, die HTML mit Bildern erzeugen und die Option assets verstehen
+HTML_FORMATS = ("html", "pages", "reader", "bundle")
+MANIFEST_NAME = ".build_manifest.json"
+# Erhöhen, wenn sich die Ausgabe bei gleichen Eingaben ändert
+MANIFEST_VERSION = 1
+
+
+def find_specs(directory: str) -> List[str]:
+    """Alle Buch-Spezifikationen im Verzeichnis (rekursiv, sortiert)"""
+    specs = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(".json") and not name.startswith("."):
+                specs.append(os.path.join(root, name))
+    return specs
+
+
+def load_manifest(output_dir: str) -> Dict[str, Dict]:
+    """Lädt das Build-Manifest (leer, wenn nicht vorhanden oder veraltet)"""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("books", {})
+
+
+def save_manifest(output_dir: str, books: Dict[str, Dict]):
+    """Schreibt das Build-Manifest"""
+    with _atomic_write(os.path.join(output_dir, MANIFEST_NAME)) as f:
+        json.dump({"version": MANIFEST_VERSION, "books": books}, f, ensure_ascii=False, indent=2)
+
+
+def _output_paths(output_dir: str, name: str, formats: List[str]) -> Dict[str, str]:
+    return {fmt: os.path.join(output_dir, name + get_exporter(fmt).extension) for fmt in formats}
+
+
+def _resolve_theme(theme: Optional[str], spec_dir: str) -> Theme:
+    if theme and os.path.isdir(os.path.join(spec_dir, theme)):
+        return Theme.from_directory(os.path.join(spec_dir, theme))
+    return get_theme(theme)
+
+
+def _input_hash(data: bytes, options: Dict, theme: Theme, chapters: List[Chapter], spec_dir: str) -> str:
+    """Hash über Spezifikation, Build-Optionen, Theme und ggf. Bilddateien"""
+    digest = hashlib.sha256(data)
+    digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+    digest.update(theme.fingerprint.encode("utf-8"))
+    if options["assets"]:
+        for image in sorted({chapter.image for chapter in chapters if chapter.image}):
+            try:
+                stat = os.stat(os.path.join(spec_dir, image))
+                digest.update(f"{image}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode("utf-8"))
+            except OSError:
+                digest.update(f"{image}\0-\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def build_book(task) -> Dict:
+    """
+    Baut ein Buch (läuft im Prozess-Pool). Gibt einen Eintrag für das
+    Manifest zurück: status ist "built", "skipped" oder "failed". Mit
+    profile enthält "trace" die dabei aufgezeichneten Ereignisse.
+    """
+    spec, name, output_dir, default_formats, previous, force, profile = task
+    if profile:
+        recorder = book_profile.TraceRecorder()
+        previous_sink = book_profile.set_sink(recorder)
+        try:
+            with book_profile.span("build_book", name=name):
+                result = build_book(task[:-1] + (False,))
+        finally:
+            book_profile.set_sink(previous_sink)
+        result["trace"] = recorder.events
+        return result
+
+    started = time.perf_counter()
+    result = {"spec": spec, "name": name}
+    try:
+        with open(spec, 'rb') as f:
+            data = f.read()
+        meta: Dict = {}
+        ingest_start = book_profile.now()
+        chapters = [Chapter.from_dict(item) for item in iter_json_chapters(io.StringIO(data.decode("utf-8")), meta)]
+        book_profile.complete("ingest", ingest_start, chapters=len(chapters), book=name)
+        book_profile.count("chapters", len(chapters))
+        build = meta.get("build") or {}
+        formats = build.get("formats") or default_formats
+        options = {"formats": sorted(formats), "theme": build.get("theme"),
+                   "assets": bool(build.get("assets", False)), "version": MANIFEST_VERSION}
+        spec_dir = os.path.dirname(os.path.abspath(spec))
+        theme = _resolve_theme(options["theme"], spec_dir)
+        outputs = _output_paths(output_dir, name, formats)
+        input_hash = _input_hash(data, options, theme, chapters, spec_dir)
+        result.update(hash=input_hash, outputs=sorted(outputs.values()))
+
+        if (not force and previous and previous.get("hash") == input_hash
+                and all(os.path.exists(path) for path in outputs.values())):
+            result.update(status="skipped", seconds=previous.get("seconds", 0.0))
+            return result
+
+        book = InteractiveBook(title=meta.get("title", ""), author=meta.get("author", ""))
+        book.chapters = chapters
+        book.set_theme(theme)
+        html_book = book
+        if options["assets"]:
+            # Bildpfade sind relativ zur Spezifikation, nicht zum Arbeitsverzeichnis
+            html_book = book.copy()
+            html_book.chapters = [
+                chapter.replace(image=os.path.join(spec_dir, chapter.image))
+                if chapter.image else chapter
+                for chapter in chapters
+            ]
+        stages = {}
+        # Erfolgsmeldungen der Exporte würden die Übersicht überfluten
+        with contextlib.redirect_stdout(io.StringIO()):
+            for fmt in formats:
+                stage_start = time.perf_counter()
+                profile_start = book_profile.now()
+                if fmt == "pages":
+                    # Parallel wird bereits über die Bücher gebaut
+                    html_book.export(fmt, outputs[fmt], workers=1, assets=options["assets"])
+                elif fmt == "bundle":
+                    bundle = html_book.export(fmt, outputs[fmt], assets=options["assets"])
+                    result["bundle"] = bundle.totals()
+                elif fmt in HTML_FORMATS:
+                    html_book.export(fmt, outputs[fmt], assets=options["assets"])
+                else:
+                    book.export(fmt, outputs[fmt])
+                stages[fmt] = round(time.perf_counter() - stage_start, 4)
+                book_profile.complete("export", profile_start, format=fmt, book=name)
+        result.update(status="built", stages=stages, chapters=len(chapters))
+    except Exception as e:
+        result.update(status="failed", error=f"{type(e).__name__}: {e}")
+    result["seconds"] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def build_all(spec_dir: str, output_dir: str, formats: List[str] = ("html",), workers: int = None,
+              force: bool = False, report=print,
+              trace: Optional[book_profile.TraceRecorder] = None) -> List[Dict]:
+    """
+    Baut alle Bücher aus spec_dir nach output_dir und aktualisiert das
+    Manifest. report(zeile) erhält eine Zeile pro fertigem Buch. Ist trace
+    ein TraceRecorder, übernimmt er die Ereignisse aller Arbeiter.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    specs = find_specs(spec_dir)
+    tasks = []
+    for spec in specs:
+        key = os.path.relpath(spec, spec_dir).replace(os.sep, "/")
+        name = os.path.splitext(key)[0].replace("/", "__")
+        tasks.append((spec, name, output_dir, list(formats), manifest.get(key), force, trace is not None))
+
+    results = []
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        completed = map(build_book, tasks)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        completed = (future.result() for future in as_completed([pool.submit(build_book, t) for t in tasks]))
+    try:
+        for result in completed:
+            if trace is not None:
+                trace.extend(result.pop("trace", ()))
+            results.append(result)
+            key = os.path.relpath(result["spec"], spec_dir).replace(os.sep, "/")
+            if result["status"] == "failed":
+                manifest.pop(key, None)
+                report(f"  FEHLER  {result['name']}: {result['error']}")
+            else:
+                manifest[key] = {name: result[name] for name in ("hash", "outputs", "seconds")}
+                if result["status"] == "built":
+                    report(f"  gebaut  {result['name']} ({result['seconds']:.2f} s)")
+    finally:
+        if workers != 1 and len(tasks) > 1:
+            pool.shutdown()
+        # Manifest auch nach einem Abbruch schreiben, damit fertige Bücher zählen
+        save_manifest(output_dir, manifest)
+    return results
+
+
+def format_summary(results: List[Dict], wall_time: float) -> str:
+    """Zeitübersicht pro Buch, langsamste zuerst"""
+    labels = {"built": "gebaut", "skipped": "übersprungen", "failed": "FEHLER"}
+    width = max([len("Buch")] + [len(result["name"]) for result in results])
+    lines = [f"{'Buch':<{width}}  {'Status':<12}  {'Zeit (s)':>9}  Formate"]
+    for result in sorted(results, key=lambda r: (r["status"] != "built", -r["seconds"])):
+        seconds = f"{result['seconds']:.2f}" if result["status"] == "built" else "-"
+        stages = ", ".join(f"{fmt} {sec:.2f}" for fmt, sec in result.get("stages", {}).items())
+        lines.append(f"{result['name']:<{width}}  {labels[result['status']]:<12}  {seconds:>9}  {stages}")
+    counts = {status: sum(1 for r in results if r["status"] == status) for status in labels}
+    cpu_time = sum(r["seconds"] for r in results if r["status"] == "built")
+    lines.append(
+        f"\n{counts['built']} gebaut, {counts['skipped']} übersprungen, {counts['failed']} fehlgeschlagen"
+        f" in {wall_time:.2f} s (Summe der Buchzeiten {cpu_time:.2f} s)"
+    )
+    return "\n".join(lines)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Baut viele Bücher parallel und inkrementell.")
+    parser.add_argument("specs", help="Verzeichnis mit Buch-Spezifikationen (*.json)")
+    parser.add_argument("--output", "-o", default="dist", help="Ausgabeordner (Standard: dist)")
+    parser.add_argument("--formats", nargs="+", choices=available_exporters(), default=["html"],
+                        help="Formate für Bücher ohne eigenen build-Abschnitt")
+    parser.add_argument("--workers", "-j", type=int, help="Anzahl Prozesse (Standard: CPU-Kerne)")
+    parser.add_argument("--force", action="store_true", help="alle Bücher neu bauen")
+    parser.add_argument("--profile", metavar="TRACE",
+                        help="Stufen-Zeiten als Chrome-Trace (JSON) in diese Datei schreiben")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    trace = book_profile.TraceRecorder() if args.profile else None
+    results = build_all(args.specs, args.output, args.formats, args.workers, args.force, trace=trace)
+    print()
+    print(format_summary(results, time.perf_counter() - started))
+    bundles = [result["bundle"] for result in results if "bundle" in result]
+    if bundles:
+        from book_bundle import format_savings
+        print(format_savings({key: sum(totals[key] for totals in bundles) for key in bundles[0]}))
+    if trace is not None:
+        trace.write(args.profile)
+        print()
+        print(trace.summary())
+        print(f"\nTrace wurde als '{args.profile}' gespeichert (chrome://tracing oder ui.perfetto.dev).")
+    return 1 if any(result["status"] == "failed" for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,9 +4,494 @@ Interaktiver KI Book Builder
 Ein einfaches Tool zum Erstellen interaktiver Bücher mit Bildern
 """
 
+import hashlib
+import importlib
 import json
+import logging
 import os
-from typing import List, Dict
+import re
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import partial
+from itertools import islice
+from typing import Callable, List, Dict, Optional, Tuple
+
+# Nur leichte Module beim Start laden; Pack-Format, Assets, Import und
+# Prozess-Pools werden erst bei der ersten Nutzung importiert (Startzeit
+# der GUIs, siehe benchmarks/startup_time.py)
+import book_profile
+from book_history import BookHistory, BookVersion, VersionedList
+from book_journal import BookJournal
+from book_search import SEARCH_SCRIPT, SearchIndex
+from book_story import StoryGraph
+from book_templates import Theme, get_theme
+
+logger = logging.getLogger(__name__)
+
+# progress(fertig, gesamt) für Exporte mit Fortschrittsanzeige
+ProgressCallback = Optional[Callable[[int, int], None]]
+
+
+def _search_text(chapter: "Chapter") -> str:
+    """Text eines Kapitels, der in den Suchindex aufgenommen wird"""
+    return chapter.title + "\n" + chapter.content
+
+
+# Platzhalter für die Kapitelnummer in zwischengespeicherten Fragmenten
+_NUMBER_MARK = "\x00"
+# Umschließt die Ziel-ID eines Auswahl-Links; das Linkziel hängt von der
+# Position des Zielkapitels und vom Exportformat ab und wird erst beim
+# Schreiben eingesetzt
+_LINK_MARK = "\x01"
+_LINK_RE = re.compile(_LINK_MARK + "([0-9a-f]*)" + _LINK_MARK)
+
+
+def _resolve_links(html: str, links: Dict[str, str]) -> str:
+    """Ersetzt die Ziel-IDs der Auswahl-Links durch Linkziele (unbekannte: "#")"""
+    return _LINK_RE.sub(lambda match: links.get(bytes.fromhex(match.group(1)).decode("utf-8"), "#"), html)
+
+
+# Kapiteltexte: Markdown-Teilmenge, in einem Durchlauf in HTML übersetzt
+# Anfang einer Block-Zeile: Trennlinie, Überschrift, Aufzählung, nummerierte Liste
+_BLOCK_RE = re.compile(
+    r"[ \t]{0,3}(?:(?P<rule>([-*_])(?:[ \t]*\2){2,}[ \t]*$)"
+    r"|(?P<heading>#{1,6})(?:[ \t]+|$)"
+    r"|(?P<bullet>[-*+])[ \t]+"
+    r"|(?P<number>\d{1,9})[.)][ \t]+)"
+)
+# Zeichen mit Bedeutung im (bereits escapten) Fließtext; alles dazwischen
+# wird unverändert übernommen
+_INLINE_RE = re.compile(
+    r"\\(?P<escaped>[\\`*_{}\[\]()#+\-.!])"
+    r"|(?P<delim>\*\*\*|___|\*\*|__|\*|_)"
+    r"|(?P<open>\[)"
+    r"|\]\((?P<url>[^()\s]*)\)"
+)
+# Browser ignorieren führende Steuerzeichen vor dem Schema
+_URL_SCHEME_RE = re.compile(r"[\x00-\x20]*([A-Za-z][A-Za-z0-9+.-]*):")
+_URL_SCHEMES = {"http", "https", "mailto"}
+_INLINE_TAGS = {"*": "em", "_": "em", "**": "strong", "__": "strong"}
+
+
+def _escape(text: str) -> str:
+    """
+    Maskiert Text für HTML, auch innerhalb von Attributen in " oder '.
+    Die Platzhalter _NUMBER_MARK und _LINK_MARK werden entfernt, damit
+    Benutzertext keine Kapitelnummern oder Linkziele einschleusen kann.
+    """
+    return (text.replace(_NUMBER_MARK, "").replace(_LINK_MARK, "")
+            .replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+            .replace('"', "&quot;").replace("'", "&#x27;"))
+
+
+def _link_target(target: str) -> str:
+    """
+    Ziel-ID eines Auswahl-Links für _resolve_links: hexadezimal zwischen
+    zwei _LINK_MARK, damit beliebige IDs keine Platzhalter enthalten
+    """
+    return _LINK_MARK + target.encode("utf-8").hex() + _LINK_MARK
+
+
+def _safe_url(url: str) -> str:
+    """Linkziel für href; andere Schemata als http(s)/mailto (javascript: ...) werden zu "#" """
+    match = _URL_SCHEME_RE.match(url)
+    if match and match.group(1).lower() not in _URL_SCHEMES:
+        return "#"
+    return url
+
+
+def _render_inline(text: str) -> str:
+    """
+    Hervorhebungen und Links eines Absatzes. Offene Auszeichnungen liegen
+    auf einem Stapel; jedes Zeichen wird einmal gelesen und jede offene
+    Auszeichnung höchstens einmal entfernt, daher linear auch bei vielen
+    nicht geschlossenen ``*`` oder ``[``. Nicht geschlossene bleiben Text.
+    """
+    # Einmal vorab escapen; die Auszeichnungszeichen sind davon nicht betroffen
+    text = _escape(text)
+    parts: List[str] = []
+    # (Art, Index in parts) der offenen Auszeichnungen
+    stack: List[Tuple[str, int]] = []
+    open_brackets = 0
+    # Anzahl offener Hervorhebungen je Art oberhalb jedes offenen "[": wie in
+    # CommonMark schließt eine Hervorhebung nie über ein offenes "[" hinweg
+    emphasis: List[Dict[str, int]] = [dict.fromkeys(_INLINE_TAGS, 0)]
+    # Die untersten offenen "[" umschließen einen fertigen Link (keine Links in Links)
+    inactive = 0
+    
+    def close(kind: str) -> int:
+        nonlocal open_brackets, inactive
+        # Darüberliegende, nicht geschlossene Auszeichnungen bleiben Text
+        while True:
+            open_kind, index = stack.pop()
+            if open_kind == "[":
+                if open_brackets == inactive:
+                    inactive -= 1
+                open_brackets -= 1
+                emphasis.pop()
+            else:
+                emphasis[-1][open_kind] -= 1
+            if open_kind == kind:
+                return index
+    
+    position = 0
+    for match in _INLINE_RE.finditer(text):
+        start, end = match.span()
+        if start > position:
+            parts.append(text[position:start])
+        position = end
+        group = match.lastgroup
+        if group == "escaped":
+            parts.append(match.group(group))
+        elif group == "open":
+            stack.append(("[", len(parts)))
+            open_brackets += 1
+            emphasis.append(dict.fromkeys(_INLINE_TAGS, 0))
+            parts.append("[")
+        elif group == "url":
+            if open_brackets > inactive:
+                parts[close("[")] = f'<a href="{_safe_url(match.group(group))}">'
+                parts.append("</a>")
+                inactive = open_brackets
+            else:
+                parts.append(match.group())
+        else:
+            delim = match.group(group)
+            char = delim[0]
+            before = text[start - 1] if start else " "
+            after = text[end] if end < len(text) else " "
+            can_open = not after.isspace()
+            can_close = not before.isspace()
+            if char == "_":
+                # Unterstriche innerhalb von Wörtern (snake_case) sind keine Auszeichnung
+                can_open = can_open and not before.isalnum()
+                can_close = can_close and not after.isalnum()
+            if len(delim) < 3:
+                kinds = [delim]
+            elif stack and stack[-1][0] == char:
+                kinds = [char, char * 2]
+            else:
+                kinds = [char * 2, char]
+            if can_close:
+                for kind in list(kinds):
+                    if not emphasis[-1][kind]:
+                        continue
+                    tag = _INLINE_TAGS[kind]
+                    parts[close(kind)] = f"<{tag}>"
+                    parts.append(f"</{tag}>")
+                    kinds.remove(kind)
+            if kinds and can_open:
+                # Bei *** schließt das innere * zuerst: <strong><em>...</em></strong>
+                for kind in sorted(kinds, key=len, reverse=True):
+                    stack.append((kind, len(parts)))
+                    emphasis[-1][kind] += 1
+                    parts.append(kind)
+            elif kinds:
+                parts.append("".join(kinds))
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+def render_markdown(text: str) -> str:
+    """
+    Übersetzt einen Kapiteltext in HTML: Absätze (durch Leerzeilen
+    getrennt), Überschriften (``#`` wird zu ``<h3>``, da der Kapiteltitel
+    ``<h2>`` ist), Aufzählungen (``-``, ``*``, ``+``) und nummerierte
+    Listen (``1.``), Trennlinien (``***``), ``*kursiv*``, ``**fett**``
+    und ``[Text](Ziel)``. Alles andere wird escaped, HTML im Text also
+    angezeigt statt ausgeführt. Jede Zeile wird einmal gelesen; die
+    Laufzeit wächst linear mit der Textlänge.
+    """
+    out: List[str] = []
+    paragraph: List[str] = []
+    item: List[str] = []
+    list_tag = None
+    
+    for line in text.splitlines():
+        if not line or line.isspace():
+            # Leerzeile beendet Absatz und Listenpunkt, die Liste läuft weiter
+            if paragraph:
+                out.append(f"<p>{_render_inline(chr(10).join(paragraph))}</p>\n")
+                paragraph.clear()
+            if item:
+                out.append(f"<li>{_render_inline(chr(10).join(item))}</li>\n")
+                item.clear()
+            continue
+        match = _BLOCK_RE.match(line)
+        if match is None:
+            if item:
+                item.append(line.strip())
+            else:
+                if list_tag:
+                    out.append(f"</{list_tag}>\n")
+                    list_tag = None
+                paragraph.append(line.strip())
+            continue
+        
+        if paragraph:
+            out.append(f"<p>{_render_inline(chr(10).join(paragraph))}</p>\n")
+            paragraph.clear()
+        if item:
+            out.append(f"<li>{_render_inline(chr(10).join(item))}</li>\n")
+            item.clear()
+        rest = line[match.end():]
+        tag = "ul" if match.group("bullet") else "ol" if match.group("number") else None
+        if list_tag and list_tag != tag:
+            out.append(f"</{list_tag}>\n")
+            list_tag = None
+        if tag:
+            if list_tag is None:
+                number = int(match.group("number") or 1)
+                out.append(f'<ol start="{number}">\n' if number != 1 else f"<{tag}>\n")
+                list_tag = tag
+            item.append(rest.strip())
+        elif match.group("rule"):
+            out.append("<hr>\n")
+        else:
+            level = min(len(match.group("heading")) + 2, 6)
+            heading = rest.strip()
+            if heading.endswith("#"):
+                # Schließende #-Folge, aber nicht "C#"
+                stripped = heading.rstrip("#")
+                if not stripped or stripped[-1] in " \t":
+                    heading = stripped.rstrip()
+            out.append(f"<h{level}>{_render_inline(heading)}</h{level}>\n")
+    
+    if paragraph:
+        out.append(f"<p>{_render_inline(chr(10).join(paragraph))}</p>\n")
+    if item:
+        out.append(f"<li>{_render_inline(chr(10).join(item))}</li>\n")
+    if list_tag:
+        out.append(f"</{list_tag}>\n")
+    return "".join(out)
+
+
+class MarkdownCache:
+    """
+    Gerenderte Kapiteltexte, adressiert über den Text selbst und damit
+    unabhängig von Theme, Kapitelnummer und Exportformat. Die Größe ist
+    durch max_chars (Text + HTML) begrenzt, ältere Einträge werden
+    verdrängt; Zugriffe aus mehreren Threads (Live-Vorschau) sind sicher.
+    """
+    
+    def __init__(self, max_chars: int = 32 * 1024 * 1024):
+        self.max_chars = max_chars
+        self.entries: "OrderedDict[str, str]" = OrderedDict()
+        self.chars = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def render(self, text: str) -> str:
+        """HTML zu text (siehe render_markdown), bei Bedarf gerendert"""
+        with self._lock:
+            html = self.entries.get(text)
+            if html is not None:
+                self.entries.move_to_end(text)
+                self.hits += 1
+                return html
+            self.misses += 1
+        html = render_markdown(text)
+        size = len(text) + len(html)
+        if size > self.max_chars:
+            return html
+        with self._lock:
+            if text not in self.entries:
+                self.entries[text] = html
+                self.chars += size
+            while self.chars > self.max_chars:
+                old_text, old_html = self.entries.popitem(last=False)
+                self.chars -= len(old_text) + len(old_html)
+        return html
+    
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.chars = 0
+
+
+# Gemeinsam für alle Bücher und Exporte (auch pro Arbeiterprozess)
+markdown_cache = MarkdownCache()
+
+
+def _render_chapter_fragment(theme: Theme, chapter: "Chapter", lazy: bool = False,
+                             size: Optional[Tuple[int, int]] = None) -> str:
+    """
+    Erzeugt den HTML-Block eines Kapitels mit Platzhalter statt Kapitelnummer.
+    Mit lazy=True wird das Bild nachladend und mit Breite/Höhe (size) eingebunden.
+    """
+    title = _escape(chapter.title)
+    image = ""
+    if chapter.image and lazy:
+        dimensions = f' width="{size[0]}" height="{size[1]}"' if size else ""
+        image = theme.render("reader_image", src=_escape(chapter.image), title=title, size=dimensions)
+    elif chapter.image:
+        image = theme.render("chapter_image", src=_escape(chapter.image), title=title)
+    if chapter.choices:
+        image += theme.render("choices", items="".join(
+            theme.render("choice", href=_link_target(target), label=_escape(label))
+            for label, target in chapter.choices
+        ))
+    return theme.render("chapter", number=_NUMBER_MARK, title=title,
+                        content=markdown_cache.render(chapter.content), image=image)
+
+
+class Chapter:
+    """
+    Ein einzelnes Kapitel (kompakt gespeichert dank __slots__).
+    
+    In verzweigten Geschichten hat ein Kapitel zusätzlich eine feste ``id``
+    und Auswahlmöglichkeiten ``choices`` als Tupel (Beschriftung, Ziel-ID).
+    """
+    
+    FIELDS = ("title", "content", "image")
+    __slots__ = FIELDS + ("id", "choices", "_digest")
+    
+    def __init__(self, title: str, content: str, image: Optional[str] = None,
+                 id: Optional[str] = None, choices: Tuple[Tuple[str, str], ...] = ()):
+        self.title = title
+        self.content = content
+        self.image = image
+        self.id = id
+        self.choices = choices
+    
+    def __setattr__(self, name: str, value):
+        # Jede Änderung macht das Kapitel "dirty" (Hash neu berechnen)
+        object.__setattr__(self, name, value)
+        if name != "_digest":
+            object.__setattr__(self, "_digest", None)
+    
+    @property
+    def dirty(self) -> bool:
+        """True, wenn sich das Kapitel seit dem letzten Hashen geändert hat"""
+        return self._digest is None
+    
+    def digest(self) -> str:
+        """
+        Inhalts-Hash des Kapitels (wird bis zur nächsten Änderung gemerkt).
+        Die ID gehört nicht dazu, da sie das gerenderte Kapitel nicht ändert.
+        """
+        if self._digest is None:
+            data = "\0".join((self.title, self.content, self.image or ""))
+            if self.choices:
+                data += "\0" + json.dumps(self.choices, ensure_ascii=False)
+            self._digest = hashlib.sha1(data.encode("utf-8")).hexdigest()
+        return self._digest
+    
+    def replace(self, **fields) -> "Chapter":
+        """Kopie des Kapitels mit geänderten Feldern (z.B. image=...)"""
+        values = {"title": self.title, "content": self.content, "image": self.image,
+                  "id": self.id, "choices": self.choices}
+        values.update(fields)
+        return Chapter(**values)
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Chapter":
+        """Erstellt ein Kapitel aus einem Dictionary im JSON-Format"""
+        choices = data.get("choices")
+        if choices:
+            choices = tuple((choice.get("label", ""), choice["target"]) for choice in choices)
+        return cls(data.get("title", ""), data.get("content", ""), data.get("image"),
+                   data.get("id"), choices or ())
+    
+    def to_dict(self) -> Dict:
+        """Gibt das Kapitel als Dictionary im JSON-Format zurück"""
+        data = {"title": self.title, "content": self.content, "image": self.image}
+        # Nur bei verzweigten Geschichten, damit lineare Bücher unverändert bleiben
+        if self.id is not None:
+            data["id"] = self.id
+        if self.choices:
+            data["choices"] = [{"label": label, "target": target} for label, target in self.choices]
+        return data
+    
+    # Dictionary-artiger Zugriff für bestehenden Code (chapter["title"])
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def get(self, key: str, default=None):
+        """Liest ein Feld wie bei einem Dictionary"""
+        if key not in self.FIELDS:
+            return default
+        return getattr(self, key)
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Chapter):
+            return NotImplemented
+        return ((self.title, self.content, self.image, self.id, self.choices)
+                == (other.title, other.content, other.image, other.id, other.choices))
+    
+    def __repr__(self) -> str:
+        return f"Chapter(title={self.title!r}, image={self.image!r})"
+
+
+def _stored_chapter(title: str, content: str, image: Optional[str], chapter_id: Optional[str],
+                    choices: tuple, digest: str) -> Chapter:
+    """Kapitel aus einer Buch-Datenbank; der gespeicherte Hash wird übernommen"""
+    chapter = Chapter(title, content, image, chapter_id, choices)
+    object.__setattr__(chapter, "_digest", digest)
+    return chapter
+
+
+class HtmlFragmentCache:
+    """
+    Cache für gerenderte Kapitel-Fragmente, adressiert über den Inhalts-Hash.
+    
+    Die Kapitelnummer ist nicht Teil des Fragments, damit Einfügen oder
+    Entfernen von Kapiteln die übrigen Einträge nicht ungültig macht. Der
+    Schlüssel enthält den Fingerabdruck des Themes, sodass ein Wechsel des
+    Themes oder eine geänderte Vorlage alte Fragmente nicht wiederverwendet.
+    """
+    
+    VERSION = 6
+    
+    def __init__(self):
+        self.fragments: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self) -> int:
+        return len(self.fragments)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self.fragments
+    
+    def get(self, key: str, render):
+        """Liefert das Fragment zu key und rendert es bei Bedarf mit render()"""
+        fragment = self.fragments.get(key)
+        if fragment is None:
+            self.misses += 1
+            fragment = self.fragments[key] = render()
+        else:
+            self.hits += 1
+        return fragment
+    
+    def prune(self, keep):
+        """Entfernt alle Einträge, deren Schlüssel nicht in keep enthalten sind"""
+        keep = set(keep)
+        self.fragments = {key: value for key, value in self.fragments.items() if key in keep}
+    
+    def load(self, filename: str) -> bool:
+        """Lädt den Cache von der Festplatte (False, wenn nicht vorhanden/ungültig)"""
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != self.VERSION:
+            return False
+        self.fragments.update(data.get("fragments", {}))
+        return True
+    
+    def save(self, filename: str):
+        """Schreibt den Cache auf die Festplatte"""
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump({"version": self.VERSION, "fragments": self.fragments}, f, ensure_ascii=False)
 
 
 class InteractiveBook:
@@ -15,113 +500,1003 @@ class InteractiveBook:
     def __init__(self, title: str, author: str):
         self.title = title
         self.author = author
-        self.chapters: List[Dict] = []
+        self.chapters: List[Chapter] = []
+        self.fragment_cache = HtmlFragmentCache()
+        self.theme = get_theme(None)
+        self.search_index: Optional[SearchIndex] = None
+        self._search_positions: Optional[Dict[str, List[int]]] = None
+        self.journal: Optional[BookJournal] = None
+        # Nach so vielen Journal-Einträgen wird automatisch verdichtet
+        self.compact_every = 10000
+        self.history: Optional[BookHistory] = None
+        self.story: Optional[StoryGraph] = None
+        self._next_id = 0
+        # Kapitel in einer SQLite-Datenbank statt im Speicher (open_store)
+        self.store = None
+        # Zählt jede Änderung über die Methoden des Buches (z.B. für die Vorschau)
+        self.revision = 0
     
-    def add_chapter(self, chapter_title: str, content: str, image_path: str = None):
+    def add_chapter(self, chapter_title: str, content: str, image_path: str = None) -> Chapter:
         """Fügt ein neues Kapitel zum Buch hinzu"""
-        chapter = {
-            "title": chapter_title,
-            "content": content,
-            "image": image_path
-        }
+        chapter = self._with_id(Chapter(chapter_title, content, image_path))
         self.chapters.append(chapter)
+        self._index_chapters(len(self.chapters) - 1)
+        book_profile.count("chapters")
+        if self._tracking:
+            self._changed("Kapitel hinzufügen", dict(chapter.to_dict(), op="add"),
+                          {"op": "truncate", "length": len(self.chapters) - 1}, added=(chapter,))
         print(f"Kapitel '{chapter_title}' wurde hinzugefügt.")
+        return chapter
     
-    def save_to_json(self, filename: str = "book.json"):
-        """Speichert das Buch als JSON-Datei"""
-        book_data = {
-            "title": self.title,
-            "author": self.author,
-            "chapters": self.chapters
-        }
+    def add_chapters(self, chapters) -> int:
+        """
+        Fügt viele Kapitel auf einmal hinzu (ohne Ausgabe pro Kapitel).
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(book_data, f, ensure_ascii=False, indent=2)
+        Akzeptiert Chapter-Objekte, Dictionaries im JSON-Format oder Tupel
+        (Titel, Inhalt[, Bild]). Gibt die Anzahl der neuen Kapitel zurück.
+        """
+        before = len(self.chapters)
+        started = book_profile.now()
+        new_chapters = (
+            item if isinstance(item, Chapter)
+            else Chapter.from_dict(item) if isinstance(item, dict)
+            else Chapter(*item)
+            for item in chapters
+        )
+        if self.story is not None:
+            new_chapters = (self._with_id(chapter) for chapter in new_chapters)
+        if self.store is None or self._tracking:
+            new_chapters = list(new_chapters)
+        # Eine Buch-Datenbank liest den Generator blockweise in einer Transaktion
+        self.chapters.extend(new_chapters)
+        added = len(self.chapters) - before
+        book_profile.complete("ingest", started, chapters=added)
+        with book_profile.span("index", chapters=added):
+            self._index_chapters(before)
+        book_profile.count("chapters", added)
+        if self._tracking and added:
+            self._changed(f"{added} Kapitel hinzufügen",
+                          {"op": "add_many", "chapters": [c.to_dict() for c in new_chapters]},
+                          {"op": "truncate", "length": before}, added=tuple(new_chapters))
+        logger.info("%d Kapitel zu '%s' hinzugefügt", added, self.title)
+        return added
+    
+    def import_directory(self, directory: str, workers: int = None, use_processes: bool = True) -> int:
+        """Importiert alle Text-/Markdown-Dateien eines Verzeichnisses als Kapitel"""
+        from book_import import iter_chapter_files
+        with book_profile.span("import_directory", directory=directory):
+            return self.add_chapters(iter_chapter_files(directory, workers=workers, use_processes=use_processes))
+    
+    def insert_chapter(self, index: int, chapter: Chapter) -> Chapter:
+        """Fügt ein Kapitel an Position index ein"""
+        index = min(max(index + len(self.chapters) if index < 0 else index, 0), len(self.chapters))
+        chapter = self._with_id(chapter)
+        self.chapters.insert(index, chapter)
+        self._index_chapters(index, index + 1)
+        if self._tracking:
+            self._changed("Kapitel einfügen", dict(chapter.to_dict(), op="insert", index=index),
+                          {"op": "remove", "index": index}, added=(chapter,))
+        return chapter
+    
+    def remove_chapter(self, index: int) -> Chapter:
+        """Entfernt das Kapitel an der angegebenen Position und gibt es zurück"""
+        index = range(len(self.chapters))[index]
+        chapter = self.chapters.pop(index)
+        self._unindex_chapter(chapter)
+        self._positions_changed()
+        if self._tracking:
+            self._changed("Kapitel entfernen", {"op": "remove", "index": index},
+                          dict(chapter.to_dict(), op="insert", index=index), removed=(chapter,))
+        return chapter
+    
+    def edit_chapter(self, index: int, chapter_title: str = None, content: str = None,
+                     image_path: str = None) -> Chapter:
+        """
+        Ändert ein bestehendes Kapitel (nur die angegebenen Felder). Das
+        Kapitel wird durch ein neues Chapter-Objekt ersetzt, damit ältere
+        Versionen (Rückgängig) unverändert bleiben; zurückgegeben wird das neue.
+        """
+        index = range(len(self.chapters))[index]
+        old = self.chapters[index]
+        chapter = old.replace(
+            title=old.title if chapter_title is None else chapter_title,
+            content=old.content if content is None else content,
+            image=old.image if image_path is None else (image_path or None),
+        )
+        if chapter == old:
+            return old
+        self._swap_chapter(index, chapter)
+        if self._tracking:
+            self._changed("Kapitel bearbeiten",
+                          {"op": "edit", "index": index, "title": chapter_title,
+                           "content": content, "image": image_path},
+                          {"op": "edit", "index": index, "title": old.title,
+                           "content": old.content, "image": old.image or ""},
+                          added=(chapter,), removed=(old,))
+        return chapter
+    
+    def move_chapter(self, source: int, target: int) -> Chapter:
+        """Verschiebt ein Kapitel von Position source an Position target"""
+        source = range(len(self.chapters))[source]
+        # Wie list.insert: Positionen außerhalb werden an den Rand gelegt
+        target = min(max(target + len(self.chapters) - 1 if target < 0 else target, 0), len(self.chapters) - 1)
+        if self.store is not None:
+            # Nur der Rang ändert sich; der Kapiteltext wird nicht gelesen
+            self.chapters.move(source, target)
+            chapter = self.chapters[target]
+        else:
+            chapter = self.chapters.pop(source)
+            self.chapters.insert(target, chapter)
+        self._positions_changed()
+        if self._tracking:
+            self._changed("Kapitel verschieben", {"op": "move", "from": source, "to": target},
+                          {"op": "move", "from": target, "to": source})
+        return chapter
+    
+    def set_meta(self, title: str = None, author: str = None):
+        """Ändert Titel und/oder Autor (wird im Journal festgehalten)"""
+        if title == self.title:
+            title = None
+        if author == self.author:
+            author = None
+        if title is None and author is None:
+            return
+        inverse = {"op": "meta", "title": None if title is None else self.title,
+                   "author": None if author is None else self.author}
+        if title is not None:
+            self.title = title
+        if author is not None:
+            self.author = author
+        if self.store is not None:
+            self.store.set_meta(title=self.title, author=self.author)
+        self.revision += 1
+        if self._tracking:
+            self._changed("Titel/Autor ändern", {"op": "meta", "title": title, "author": author}, inverse)
+    
+    def clear(self):
+        """
+        Entfernt alle Kapitel sowie Titel und Autor (mit History rückgängig
+        machbar). Bei einem Buch aus open_store wird die Datenbank dauerhaft
+        geleert; dort gibt es kein Rückgängig.
+        """
+        if not self.chapters and not self.title and not self.author:
+            return
+        removed = tuple(self.chapters) if self._tracking else ()
+        if self.store is not None:
+            self.store.clear()
+            self.store.set_meta(title="", author="")
+        else:
+            self.chapters = VersionedList() if self.history is not None else []
+        self.title = self.author = ""
+        self.revision += 1
+        if self.search_index is not None:
+            self.search_index = SearchIndex()
+            self._search_positions = None
+        if self.story is not None:
+            self.story = StoryGraph()
+        if self._tracking:
+            # Die Umkehrung wäre das ganze Buch; beim Rückgängigmachen wird
+            # stattdessen ein Snapshot ins Journal geschrieben
+            self._changed("Buch leeren", {"op": "clear"}, None, removed=removed)
+    
+    # --- Versionen (Rückgängig/Wiederholen) ---
+    
+    @property
+    def _tracking(self) -> bool:
+        return self.journal is not None or self.history is not None
+    
+    def _changed(self, label: str, operation: Optional[Dict], inverse: Optional[Dict],
+                 added: tuple = (), removed: tuple = ()):
+        """
+        Hält eine Änderung im Journal und im Verlauf fest. Ist operation
+        None (nicht als Operation darstellbar), wird ein Snapshot geschrieben.
+        """
+        if self.journal is not None:
+            if operation is None:
+                self.compact()
+            else:
+                self._record(operation)
+        if self.history is not None:
+            self.history.commit(BookVersion(
+                self.chapters.vector, self.title, self.author, label, added, removed,
+                None if operation is None else [operation], None if inverse is None else [inverse],
+            ))
+    
+    def enable_history(self, depth: int = 100, max_bytes: int = 64 * 1024 * 1024) -> BookHistory:
+        """
+        Aktiviert Rückgängig/Wiederholen. Die Kapitel werden dazu in einer
+        persistenten Liste gehalten (book_history.VersionedList): jede
+        Änderung erzeugt eine neue Version, die alle unveränderten Kapitel
+        und Baumknoten mit der vorigen teilt. Höchstens depth Schritte und
+        etwa max_bytes an nur von alten Versionen gehaltenen Daten bleiben
+        erhalten; ältere Versionen werden verworfen.
+        """
+        if self.store is not None:
+            raise ValueError("Rückgängig/Wiederholen ist mit einer Buch-Datenbank nicht möglich")
+        if not isinstance(self.chapters, VersionedList):
+            self.chapters = VersionedList(self.chapters)
+        self.history = BookHistory(
+            BookVersion(self.chapters.vector, self.title, self.author, "Start"), depth, max_bytes
+        )
+        return self.history
+    
+    def can_undo(self) -> bool:
+        return self.history is not None and self.history.can_undo()
+    
+    def can_redo(self) -> bool:
+        return self.history is not None and self.history.can_redo()
+    
+    def undo(self) -> Optional[str]:
+        """Macht die letzte Änderung rückgängig; gibt ihre Beschreibung zurück (oder None)"""
+        if not self.can_undo():
+            return None
+        version = self.history.undo()
+        self._checkout(self.history.current, version.added, version.removed, version.inverse)
+        return version.label
+    
+    def redo(self) -> Optional[str]:
+        """Stellt die zuletzt rückgängig gemachte Änderung wieder her"""
+        if not self.can_redo():
+            return None
+        version = self.history.redo()
+        self._checkout(version, version.removed, version.added, version.forward)
+        return version.label
+    
+    def _checkout(self, version: BookVersion, drop: tuple, restore: tuple, operations: Optional[List]):
+        """Wechselt in O(1) zur Version und gleicht Suchindex und Journal an"""
+        self.chapters.vector = version.vector
+        self.title = version.title
+        self.author = version.author
+        for chapter in drop:
+            self._unindex_chapter(chapter)
+        if self.search_index is not None:
+            for chapter in restore:
+                self.search_index.add(chapter.digest(), _search_text(chapter))
+        if self.story is not None:
+            for chapter in restore:
+                if chapter.id is not None:
+                    self.story.add(chapter.id, chapter.choices)
+        self._positions_changed()
+        if self.journal is not None:
+            if operations is None:
+                self.compact()
+            else:
+                for operation in operations:
+                    self._record(operation)
+    
+    # --- Journal (automatisches Speichern) ---
+    
+    @classmethod
+    def open_journaled(cls, path: str, title: str = "", author: str = "", **journal_options) -> "InteractiveBook":
+        """
+        Öffnet ein Buch mit Journal unter path (``<path>.snapshot.json`` und
+        ``<path>.journal``). Vorhandene Daten werden wiederhergestellt, indem
+        der Snapshot geladen und das Journal darauf abgespielt wird. Danach
+        wird jede Änderung sofort an das Journal angehängt.
+        """
+        journal = BookJournal(path, **journal_options)
+        book = cls(title=title, author=author)
+        if os.path.exists(journal.snapshot_path):
+            meta: Dict = {}
+            with open(journal.snapshot_path, 'r', encoding='utf-8') as f:
+                book.chapters = [Chapter.from_dict(data) for data in iter_json_chapters(f, meta)]
+            book.title = meta.get("title", title)
+            book.author = meta.get("author", author)
+            # Nur ein Journal derselben Generation setzt auf diesem Snapshot auf
+            journal.generation = meta.get("journal_generation", 0)
+        for operation in journal.read_operations():
+            book.apply_operation(operation)
+        book.journal = journal
+        return book
+    
+    def apply_operation(self, operation: Dict):
+        """Führt eine Journal-Operation aus (beim Wiederherstellen)"""
+        op = operation["op"]
+        if op == "add":
+            self.add_chapters([operation])
+        elif op == "add_many":
+            self.add_chapters(operation["chapters"])
+        elif op == "insert":
+            self.insert_chapter(operation["index"], Chapter.from_dict(operation))
+        elif op == "remove":
+            self.remove_chapter(operation["index"])
+        elif op == "truncate":
+            length = operation["length"]
+            if self.search_index is not None or self.story is not None:
+                for chapter in self.chapters[length:]:
+                    self._unindex_chapter(chapter)
+            del self.chapters[length:]
+            self._positions_changed()
+        elif op == "replace":
+            self.replace_chapter(operation["index"], Chapter.from_dict(operation))
+        elif op == "edit":
+            self.edit_chapter(operation["index"], operation.get("title"), operation.get("content"),
+                              operation.get("image"))
+        elif op == "move":
+            self.move_chapter(operation["from"], operation["to"])
+        elif op == "meta":
+            self.set_meta(operation.get("title"), operation.get("author"))
+        elif op == "clear":
+            self.clear()
+        else:
+            raise ValueError(f"Unbekannte Journal-Operation: {op}")
+    
+    def _record(self, operation: Dict):
+        self.journal.append(operation)
+        if self.journal.entries >= self.compact_every:
+            self.compact()
+    
+    def compact(self):
+        """Schreibt einen Snapshot des Buches und leert das Journal"""
+        if self.journal is not None:
+            self.journal.write_snapshot(
+                lambda f, generation: self.write_json(f, compact=True, extra={"journal_generation": generation})
+            )
+    
+    def _index_chapters(self, start: int, stop: int = None):
+        """Nimmt die Kapitel start..stop in Suchindex und Story-Graph auf (falls aktiv)"""
+        if self.search_index is not None:
+            for chapter in self.chapters[start:stop]:
+                self.search_index.add(chapter.digest(), _search_text(chapter))
+        if self.story is not None:
+            for chapter in self.chapters[start:stop]:
+                if chapter.id is not None:
+                    self.story.add(chapter.id, chapter.choices)
+        self._positions_changed()
+    
+    def _unindex_chapter(self, chapter: Chapter):
+        """Entfernt ein Kapitel aus Suchindex und Story-Graph (falls aktiv)"""
+        if self.search_index is not None:
+            self.search_index.remove(chapter.digest(), _search_text(chapter))
+        if self.story is not None and chapter.id is not None:
+            self.story.remove(chapter.id)
+    
+    def _swap_chapter(self, index: int, chapter: Chapter) -> Chapter:
+        """Ersetzt das Kapitel an index und gleicht die Indizes an; gibt das alte zurück"""
+        old = self.chapters[index]
+        self.chapters[index] = chapter
+        if self.search_index is not None and old.digest() != chapter.digest():
+            self.search_index.remove(old.digest(), _search_text(old))
+            self.search_index.add(chapter.digest(), _search_text(chapter))
+        if self.story is not None:
+            if old.id == chapter.id and old.id is not None:
+                self.story.update(old.id, chapter.choices)
+            else:
+                if old.id is not None:
+                    self.story.remove(old.id)
+                if chapter.id is not None:
+                    self.story.add(chapter.id, chapter.choices)
+        self._positions_changed()
+        return old
+    
+    def _positions_changed(self):
+        """Nach jeder Änderung der Kapitel: Revision zählen, Positionen neu, Startkapitel prüfen"""
+        self.revision += 1
+        self._search_positions = None
+        if self.story is not None:
+            self.story.set_start(self.chapters[0].id if self.chapters else None)
+    
+    def enable_search(self, index_file: str = None) -> SearchIndex:
+        """
+        Aktiviert die Volltextsuche. Der Index wird danach bei jeder Änderung
+        über add_chapter(s), edit_chapter und remove_chapter aktualisiert.
+        
+        Mit index_file wird ein gespeicherter Index geladen; nur Kapitel, die
+        sich seitdem geändert haben, werden neu indiziert.
+        """
+        index = SearchIndex()
+        if index_file and os.path.exists(index_file):
+            try:
+                index = SearchIndex.load(index_file)
+            except ValueError:
+                index = SearchIndex()
+        
+        keys = list(self._chapter_digests())
+        counts: Dict[str, int] = {}
+        for key in keys:
+            counts[key] = counts.get(key, 0) + 1
+        index.retain(counts)
+        # Kapiteltexte nur für noch nicht indizierte Kapitel lesen
+        for i, key in enumerate(keys):
+            if key not in index:
+                index.add(key, _search_text(self.chapters[i]))
+            index.refcounts[key] = counts[key]
+        
+        self.search_index = index
+        self._search_positions = None
+        return index
+    
+    def save_search_index(self, filename: str):
+        """Speichert den Suchindex neben dem Buch"""
+        if self.search_index is None:
+            self.enable_search()
+        self.search_index.save(filename)
+    
+    def search(self, query: str, limit: int = 20) -> List[Tuple[int, Chapter]]:
+        """
+        Durchsucht alle Kapitel. Unterstützt Präfixe (``wor*``) und Phrasen
+        (``"zwei worte"``). Gibt (Position, Kapitel) nach Relevanz sortiert zurück.
+        """
+        if self.search_index is None:
+            self.enable_search()
+        if self._search_positions is None:
+            positions: Dict[str, List[int]] = {}
+            for i, key in enumerate(self._chapter_digests()):
+                positions.setdefault(key, []).append(i)
+            self._search_positions = positions
+        
+        results = []
+        for key, _score in self.search_index.search(query, limit):
+            for i in self._search_positions.get(key, ()):
+                results.append((i, self.chapters[i]))
+        return results[:limit]
+    
+    # --- Verzweigte Geschichten ---
+    
+    def enable_story(self) -> StoryGraph:
+        """
+        Aktiviert verzweigte Geschichten: Kapitel ohne ID erhalten eine
+        (``k1``, ``k2``, ...), und der Story-Graph über alle Auswahl-Links
+        wird aufgebaut. Er wird danach bei jeder Änderung nachgeführt; das
+        erste Kapitel ist der Start.
+        """
+        self._next_id = max((_id_number(chapter.id) for chapter in self.chapters if chapter.id), default=0)
+        self.story = None
+        missing = [i for i, chapter in enumerate(self.chapters) if chapter.id is None]
+        if missing:
+            old = tuple(self.chapters[i] for i in missing)
+            new = []
+            for i in missing:
+                self._next_id += 1
+                new.append(self.chapters[i].replace(id=f"k{self._next_id}"))
+                self.chapters[i] = new[-1]
+            if self._tracking:
+                # Zu viele Einzeländerungen für das Journal: Snapshot
+                self._changed("Kapitel-IDs vergeben", None, None, added=tuple(new), removed=old)
+        story = StoryGraph(self.chapters[0].id if self.chapters else None)
+        for chapter in self.chapters:
+            story.add(chapter.id, chapter.choices)
+        self.story = story
+        return story
+    
+    def _with_id(self, chapter: Chapter) -> Chapter:
+        """Gibt einem neuen Kapitel eine ID, falls verzweigte Geschichten aktiv sind"""
+        if self.story is None:
+            return chapter
+        if chapter.id is None:
+            self._next_id += 1
+            return chapter.replace(id=f"k{self._next_id}")
+        self._next_id = max(self._next_id, _id_number(chapter.id))
+        return chapter
+    
+    def replace_chapter(self, index: int, chapter: Chapter) -> Chapter:
+        """Ersetzt das Kapitel an Position index vollständig (inkl. ID und Auswahl)"""
+        index = range(len(self.chapters))[index]
+        old = self.chapters[index]
+        if chapter == old:
+            return old
+        self._swap_chapter(index, chapter)
+        if self._tracking:
+            self._changed("Kapitel ersetzen", dict(chapter.to_dict(), op="replace", index=index),
+                          dict(old.to_dict(), op="replace", index=index), added=(chapter,), removed=(old,))
+        return chapter
+    
+    def add_choice(self, source: int, target: int, label: str) -> Chapter:
+        """Fügt Kapitel source eine Auswahl hinzu, die zu Kapitel target führt"""
+        if self.story is None:
+            self.enable_story()
+        chapter = self.chapters[source]
+        choice = (label, self.chapters[target].id)
+        return self.replace_chapter(source, chapter.replace(choices=chapter.choices + (choice,)))
+    
+    def remove_choice(self, source: int, position: int = -1) -> Chapter:
+        """Entfernt die Auswahl an position aus Kapitel source"""
+        chapter = self.chapters[source]
+        choices = list(chapter.choices)
+        del choices[position]
+        return self.replace_chapter(source, chapter.replace(choices=tuple(choices)))
+    
+    def chapter_positions(self) -> Dict[str, int]:
+        """Position jedes Kapitels mit ID (O(n))"""
+        ids = self.chapters.ids() if self._out_of_core else (chapter.id for chapter in self.chapters)
+        return {chapter_id: i for i, chapter_id in enumerate(ids) if chapter_id is not None}
+    
+    def validate_story(self) -> Dict[str, list]:
+        """
+        Prüft die verzweigte Geschichte in O(V+E) (siehe StoryGraph.validate).
+        Kapitel werden im Ergebnis über ihre Position angegeben; nur die
+        Ziele ins Leere führender Links bleiben IDs.
+        """
+        if self.story is None:
+            self.enable_story()
+        report = self.story.validate()
+        positions = self.chapter_positions()
+        report["dangling"] = [(positions[source], label, target) for source, label, target in report["dangling"]]
+        for key in ("unreachable", "dead_ends", "duplicates"):
+            report[key] = sorted(positions[node] for node in report[key])
+        report["cycles"] = [[positions[node] for node in cycle] for cycle in report["cycles"]]
+        return report
+    
+    def dirty_chapters(self) -> List[int]:
+        """Positionen aller Kapitel, deren HTML beim nächsten Export neu gerendert wird"""
+        return [
+            i for i, chapter in enumerate(self.chapters)
+            if chapter.dirty or self._fragment_key(chapter) not in self.fragment_cache
+        ]
+    
+    def set_theme(self, theme):
+        """Setzt das Theme für den HTML-Export (Name, Theme-Objekt oder None)"""
+        self.theme = get_theme(theme)
+        self.revision += 1
+    
+    @classmethod
+    def load_from_json(cls, filename: str = "book.json") -> "InteractiveBook":
+        """Lädt ein Buch aus einer JSON-Datei (Kapitel werden einzeln gelesen)"""
+        meta: Dict = {}
+        with open(filename, 'r', encoding='utf-8') as f:
+            chapters = [Chapter.from_dict(data) for data in iter_json_chapters(f, meta)]
         
+        book = cls(title=meta.get("title", ""), author=meta.get("author", ""))
+        book.chapters = chapters
+        return book
+    
+    @classmethod
+    def load_from_pack(cls, filename: str) -> "InteractiveBook":
+        """Lädt ein gepacktes Buch (.kibook) vollständig"""
+        with cls.open_pack(filename) as packed:
+            book = cls(title=packed.title, author=packed.author)
+            book.chapters = list(packed)
+        return book
+    
+    @staticmethod
+    def open_pack(filename: str) -> "PackedBook":
+        """
+        Öffnet ein gepacktes Buch für wahlfreien Zugriff, ohne es zu laden:
+        ``open_pack(pfad)[n]`` liefert Kapitel n als Chapter in O(1).
+        """
+        from book_pack import PackedBook
+        return PackedBook(filename, chapter_factory=Chapter.from_dict)
+    
+    def save_to_pack(self, filename: str = "book.kibook", compression: str = "zlib"):
+        """Speichert das Buch im gepackten Format mit Kapitel-Index (zlib, lzma oder none)"""
+        from book_pack import write_pack
+        with book_profile.span("save_pack", chapters=len(self.chapters), compression=compression):
+            write_pack(
+                filename,
+                {"title": self.title, "author": self.author},
+                (chapter.to_dict() for chapter in self.chapters),
+                compression=compression,
+            )
         print(f"Buch wurde als '{filename}' gespeichert.")
     
-    def save_to_html(self, filename: str = "book.html"):
-        """Speichert das Buch als HTML-Datei"""
-        html_content = f"""<!DOCTYPE html>
-<html lang="de">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{self.title}</title>
-    <style>
-        body {{
-            font-family: 'Georgia', serif;
-            max-width: 800px;
-            margin: 0 auto;
-            padding: 20px;
-            background-color: #f5f5f5;
-        }}
-        .book-container {{
-            background-color: white;
-            padding: 40px;
-            box-shadow: 0 0 10px rgba(0,0,0,0.1);
-        }}
-        h1 {{
-            color: #333;
-            border-bottom: 3px solid #4CAF50;
-            padding-bottom: 10px;
-        }}
-        .author {{
-            color: #666;
-            font-style: italic;
-            margin-bottom: 30px;
-        }}
-        .chapter {{
-            margin-bottom: 40px;
-            padding: 20px;
-            border-left: 4px solid #4CAF50;
-            background-color: #fafafa;
-        }}
-        .chapter h2 {{
-            color: #4CAF50;
-            margin-top: 0;
-        }}
-        .chapter img {{
-            max-width: 100%;
-            height: auto;
-            margin: 20px 0;
-            border-radius: 5px;
-        }}
-        .chapter-content {{
-            line-height: 1.6;
-            color: #333;
-        }}
-    </style>
-</head>
-<body>
-    <div class="book-container">
-        <h1>{self.title}</h1>
-        <p class="author">von {self.author}</p>
-"""
+    @classmethod
+    def open_store(cls, path: str, title: str = None, author: str = None, **store_options) -> "InteractiveBook":
+        """
+        Öffnet (oder erstellt) ein Buch in einer SQLite-Datenbank (.kidb).
+        Im Speicher bleiben nur Zeilen-IDs und Reihenfolge; Kapiteltexte
+        werden erst beim Zugriff gelesen, Exporte streamen direkt aus der
+        Datenbank. Jede Änderung ist sofort gespeichert, Journal und
+        Rückgängig/Wiederholen werden daher nicht verwendet.
         
-        for i, chapter in enumerate(self.chapters, 1):
-            html_content += f"""
-        <div class="chapter">
-            <h2>Kapitel {i}: {chapter['title']}</h2>
-            <div class="chapter-content">
-                <p>{chapter['content']}</p>
-            </div>
-"""
-            if chapter.get('image'):
-                html_content += f"""            <img src="{chapter['image']}" alt="{chapter['title']}">
-"""
-            html_content += """        </div>
-"""
+        store_options werden an book_store.ChapterStore weitergereicht
+        (z.B. batch_size für add_chapters).
+        """
+        from book_store import ChapterStore
+        store = ChapterStore(path, chapter_factory=_stored_chapter, **store_options)
+        book = cls(title=store.get_meta("title", ""), author=store.get_meta("author", ""))
+        book.chapters = book.store = store
+        book.set_meta(title, author)
+        return book
+    
+    def save_to_store(self, filename: str = "book.kidb"):
+        """Speichert das Buch als SQLite-Datenbank (siehe open_store)"""
+        from book_store import write_store
+        with book_profile.span("save_store", chapters=len(self.chapters)):
+            write_store(filename, {"title": self.title, "author": self.author}, self.chapters)
+        print(f"Buch wurde als '{filename}' gespeichert.")
+    
+    def close(self):
+        """
+        Schließt die Buch-Datenbank (falls mit open_store geöffnet) bzw. bei
+        einer Kopie (copy()) deren Lesetransaktion auf der Datenbank.
+        """
+        if self.store is not None:
+            self.store.close()
+        elif hasattr(self.chapters, "close"):
+            self.chapters.close()
+    
+    @property
+    def _out_of_core(self) -> bool:
+        """True, wenn die Kapitel aus einer Buch-Datenbank gelesen werden (auch bei Kopien)"""
+        return hasattr(self.chapters, "digests")
+    
+    def chapter_titles(self) -> List[str]:
+        """Alle Kapiteltitel (aus einer Buch-Datenbank ohne die Texte zu lesen)"""
+        if self._out_of_core:
+            return list(self.chapters.titles())
+        return [chapter.title for chapter in self.chapters]
+    
+    def _chapter_digests(self):
+        """Inhalts-Hashes aller Kapitel in Reihenfolge (aus einer Buch-Datenbank ohne Texte)"""
+        if self._out_of_core:
+            return self.chapters.digests()
+        return (chapter.digest() for chapter in self.chapters)
+    
+    def iter_json(self, compact: bool = False, progress: ProgressCallback = None, extra: Dict = None):
+        """
+        Erzeugt das JSON-Dokument stückweise, ein Kapitel nach dem anderen.
         
-        html_content += """    </div>
-</body>
-</html>"""
+        progress(fertig, gesamt) wird nach jedem Kapitel aufgerufen. extra
+        sind zusätzliche Felder der obersten Ebene (vor dem Titel).
+        """
+        chapters = _track_progress(self.chapters, progress)
+        if compact:
+            dump = partial(json.dumps, ensure_ascii=False, separators=(',', ':'))
+            fields = "".join(dump(key) + ':' + dump(value) + ',' for key, value in (extra or {}).items())
+            yield '{' + fields + '"title":' + dump(self.title) + ',"author":' + dump(self.author) + ',"chapters":['
+            for i, chapter in enumerate(chapters):
+                yield (',' if i else '') + dump(chapter.to_dict())
+            yield ']}'
+            return
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        # Entspricht byte-genau json.dump(..., indent=2)
+        dump = partial(json.dumps, ensure_ascii=False, indent=2)
+        fields = "".join('\n  ' + dump(key) + ': ' + dump(value) + ',' for key, value in (extra or {}).items())
+        yield '{' + fields + '\n  "title": ' + dump(self.title) + ',\n  "author": ' + dump(self.author) + ',\n  "chapters": ['
+        if not self.chapters:
+            yield ']\n}'
+            return
+        for i, chapter in enumerate(chapters):
+            yield (',\n    ' if i else '\n    ') + dump(chapter.to_dict()).replace('\n', '\n    ')
+        yield '\n  ]\n}'
+    
+    def write_json(self, fileobj, compact: bool = False, progress: ProgressCallback = None,
+                   extra: Dict = None):
+        """Schreibt das JSON-Dokument direkt in ein geöffnetes Textdatei-Objekt (extra: siehe iter_json)"""
+        if book_profile.sink is not None:
+            fileobj = book_profile.TimedWriter(fileobj)
+        with book_profile.span("serialize_json", chapters=len(self.chapters)):
+            for chunk in self.iter_json(compact=compact, progress=progress, extra=extra):
+                fileobj.write(chunk)
+        if isinstance(fileobj, book_profile.TimedWriter):
+            fileobj.report(format="json")
+    
+    def save_to_json(self, filename: str = "book.json", compact: bool = False,
+                     progress: ProgressCallback = None):
+        """
+        Speichert das Buch als JSON-Datei.
+        
+        Die Datei wird erst nach erfolgreichem Export an ihren Platz gelegt;
+        bricht der Export ab (z.B. ExportCancelled aus progress), bleibt keine
+        halb geschriebene Datei zurück.
+        """
+        with book_profile.span("save_json", filename=filename), _atomic_write(filename) as f:
+            self.write_json(f, compact=compact, progress=progress)
         
         print(f"Buch wurde als '{filename}' gespeichert.")
     
+    def _export_chapters(self, image_map: Dict[str, str] = None):
+        """Kapitel für den Export, Bildpfade ggf. auf exportierte Assets umgeschrieben"""
+        if not image_map:
+            return iter(self.chapters)
+        return (
+            chapter.replace(image=image_map[chapter.image])
+            if chapter.image in image_map else chapter
+            for chapter in self.chapters
+        )
+    
+    def _process_assets(self, output_dir: str, sizes: Dict = None) -> Dict[str, str]:
+        """
+        Legt alle Kapitelbilder im Asset-Ordner unter output_dir ab. Ist
+        sizes ein Dict, werden darin die Abmessungen der Bilder abgelegt.
+        """
+        from book_assets import AssetPipeline
+        pipeline = AssetPipeline(output_dir)
+        with book_profile.span("assets", output_dir=output_dir):
+            image_map = pipeline.process(chapter.image for chapter in self.chapters)
+        book_profile.count("assets", len(image_map))
+        for warning in pipeline.warnings:
+            print(f"Warnung: {warning}")
+        if sizes is not None:
+            sizes.update(pipeline.sizes)
+        return image_map
+    
+    def iter_html(self, image_map: Dict[str, str] = None, search_script: str = None,
+                  progress: ProgressCallback = None, stylesheet: str = None):
+        """
+        Erzeugt das HTML-Dokument stückweise (Kopf, Kapitel, Fuß).
+        
+        search_script ist der relative Pfad der Index-Datei für die Suche im
+        Browser (siehe save_to_html); ohne ihn wird kein Suchfeld erzeugt.
+        progress(fertig, gesamt) wird nach jedem Kapitel aufgerufen.
+        stylesheet verweist auf ein externes Stylesheet statt das CSS
+        einzubetten (siehe Theme.head).
+        """
+        theme = self.theme
+        title = _escape(self.title)
+        yield (theme.head(title, "search_style" if search_script else None, stylesheet)
+               + theme.render("book_open", title=title, author=_escape(self.author)))
+        if search_script:
+            yield theme.render("search_box")
+        
+        chapters = _track_progress(self._export_chapters(image_map), progress, len(self.chapters))
+        links = None
+        # Eine Abfrage pro Export; ohne Senke kostet das Profiling nichts pro Kapitel
+        profiling = book_profile.sink is not None
+        for i, chapter in enumerate(chapters, 1):
+            if profiling:
+                started = book_profile.now()
+            html = self._render_chapter_html(i, chapter)
+            if _LINK_MARK in html:
+                if links is None:
+                    links = self._chapter_links("#kapitel-{}")
+                html = _resolve_links(html, links)
+            if profiling:
+                book_profile.complete("render_chapter", started, index=i, title=chapter.title)
+            yield html
+        
+        yield theme.render("book_close")
+        if search_script:
+            yield f"""    <script src="{search_script}"></script>
+""" + SEARCH_SCRIPT
+        yield theme.render("document_close")
+    
+    def _chapter_links(self, pattern: str) -> Dict[str, str]:
+        """Linkziel jedes Kapitels mit ID; pattern erhält die Kapitelnummer"""
+        return {chapter.id: pattern.format(i) for i, chapter in enumerate(self.chapters, 1)
+                if chapter.id is not None}
+    
+    def _fragment_key(self, chapter: Chapter) -> str:
+        """Schlüssel eines Kapitels im Fragment-Cache (Theme + Inhalt)"""
+        return self.theme.fingerprint + ":" + chapter.digest()
+    
+    def _render_chapter_html(self, index: int, chapter: Chapter) -> str:
+        """Erzeugt den HTML-Block für ein einzelnes Kapitel (mit Cache)"""
+        if self._out_of_core:
+            # Der Cache hielte sonst das ganze gerenderte Buch im Speicher
+            fragment = _render_chapter_fragment(self.theme, chapter)
+        else:
+            fragment = self.fragment_cache.get(
+                self._fragment_key(chapter), lambda: _render_chapter_fragment(self.theme, chapter)
+            )
+        return fragment.replace(_NUMBER_MARK, str(index))
+    
+    def write_html(self, fileobj, image_map: Dict[str, str] = None, search_script: str = None,
+                   progress: ProgressCallback = None, stylesheet: str = None,
+                   minify: Callable[[str], str] = None):
+        """
+        Schreibt das HTML-Dokument direkt in ein geöffnetes Textdatei-Objekt.
+        minify wird, falls angegeben, auf jedes Stück angewendet.
+        """
+        if book_profile.sink is not None:
+            fileobj = book_profile.TimedWriter(fileobj)
+        chunks = self.iter_html(image_map, search_script, progress, stylesheet)
+        if minify is not None:
+            chunks = map(minify, chunks)
+        for chunk in chunks:
+            fileobj.write(chunk)
+        if isinstance(fileobj, book_profile.TimedWriter):
+            fileobj.report(format="html")
+    
+    def save_to_html(self, filename: str = "book.html", persist_cache: bool = False,
+                     assets: bool = False, search: bool = False, progress: ProgressCallback = None,
+                     stylesheet: str = None, minify=False):
+        """
+        Speichert das Buch als HTML-Datei.
+        
+        Mit persist_cache=True wird der Fragment-Cache neben der Ausgabe
+        (``<filename>.cache.json``) gespeichert und beim nächsten Export
+        wiederverwendet, sodass nur geänderte Kapitel neu gerendert werden.
+        Mit assets=True werden die Bilder in den Ordner ``assets/`` neben der
+        Ausgabe kopiert (siehe book_assets.AssetPipeline). Mit search=True
+        wird ein kompakter Suchindex (``<name>.search.js``) geschrieben und
+        ein Suchfeld in die Seite eingebaut.
+        
+        progress(fertig, gesamt) wird nach jedem Kapitel aufgerufen; wie bei
+        save_to_json bleibt bei einem Abbruch keine halbe Datei zurück.
+        
+        stylesheet ist der relative Pfad eines gemeinsamen Stylesheets, auf
+        das statt des eingebetteten CSS verwiesen wird; minify=True (oder ein
+        book_bundle.HtmlMinifier) entfernt überflüssige Leerzeichen. Beides
+        zusammen mit gzip-Dateien erzeugt book_bundle.save_bundle.
+        """
+        started = book_profile.now()
+        if minify is True:
+            from book_bundle import HtmlMinifier
+            minify = HtmlMinifier()
+        cache_file = filename + ".cache.json"
+        if persist_cache and not self.fragment_cache:
+            self.fragment_cache.load(cache_file)
+        image_map = self._process_assets(os.path.dirname(os.path.abspath(filename))) if assets else None
+        
+        search_script = None
+        if search:
+            if self.search_index is None:
+                self.enable_search()
+            search_script = os.path.splitext(os.path.basename(filename))[0] + ".search.js"
+            search_path = os.path.join(os.path.dirname(filename), search_script)
+            with book_profile.span("search_index"), open(search_path, 'w', encoding='utf-8') as f:
+                self.search_index.export_shard(
+                    f,
+                    list(self._chapter_digests()),
+                    self.chapter_titles(),
+                )
+        
+        # Geänderte Vorlagen-Dateien einmal pro Export erkennen
+        self.theme.refresh()
+        with _atomic_write(filename) as f:
+            self.write_html(f, image_map, search_script, progress, stylesheet, minify or None)
+        
+        # Nur Fragmente behalten, die im aktuellen Buch noch vorkommen
+        if not self._out_of_core:
+            self.fragment_cache.prune(self._fragment_key(chapter) for chapter in self._export_chapters(image_map))
+        if persist_cache:
+            self.fragment_cache.save(cache_file)
+        book_profile.complete("save_html", started, filename=filename, chapters=len(self.chapters))
+        
+        print(f"Buch wurde als '{filename}' gespeichert.")
+    
+    def save_to_html_pages(self, directory: str = "book_html", workers: int = None,
+                           use_processes: bool = True, assets: bool = False):
+        """
+        Speichert das Buch als mehrseitiges HTML: eine Übersichtsseite
+        (index.html) und eine Seite pro Kapitel mit Vor/Zurück-Navigation.
+        
+        Die Kapitelseiten werden parallel gerendert und geschrieben, wahlweise
+        in einem Prozess- oder Thread-Pool mit ``workers`` Arbeitern
+        (Standard: Anzahl der CPU-Kerne). Mit assets=True werden die Bilder
+        in ``<directory>/assets/`` abgelegt.
+        """
+        started = book_profile.now()
+        os.makedirs(directory, exist_ok=True)
+        chapters = self._export_chapters(self._process_assets(directory) if assets else None)
+        total = len(self.chapters)
+        width = max(4, len(str(total)))
+        workers = workers or os.cpu_count() or 1
+        theme = self.theme
+        theme.refresh()
+        
+        with open(os.path.join(directory, "index.html"), 'w', encoding='utf-8') as f:
+            for chunk in _toc_page(theme, self.title, self.author, self.chapter_titles(),
+                                   partial(_chapter_page_name, width=width)):
+                f.write(chunk)
+        
+        # Kapitel in Blöcken verteilen, damit auch sehr große Bücher nur
+        # wenige Aufträge (und wenig Prozess-Kommunikation) erzeugen
+        batch_size = max(1, min(1000, -(-total // (workers * 4))))
+        # Prozess, der die Ereignisse sammelt (None: Profiling aus)
+        profiling = os.getpid() if book_profile.sink is not None else None
+        
+        def jobs():
+            # Blöcke erst bei Bedarf lesen, damit eine Buch-Datenbank streamt
+            positions = None
+            for start in range(0, total, batch_size):
+                batch = list(islice(chapters, batch_size))
+                if positions is None and any(chapter.choices for chapter in batch):
+                    positions = self.chapter_positions()
+                # Jeder Auftrag erhält nur die Seitennamen seiner Linkziele
+                targets = {target: _chapter_page_name(positions[target] + 1, width)
+                           for chapter in batch for _label, target in chapter.choices
+                           if target in positions} if positions else {}
+                yield (directory, self.title, start + 1, total, width, batch, theme, targets, profiling)
+        
+        def collect(result):
+            _count, events = result
+            if events and book_profile.sink is not None:
+                for event in events:
+                    book_profile.sink(event)
+        
+        if workers == 1 or total <= batch_size:
+            for job in jobs():
+                _write_chapter_pages(job)
+        else:
+            from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+            pool_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+            with pool_class(max_workers=workers) as pool:
+                # Höchstens zwei Aufträge pro Arbeiter gleichzeitig im Speicher;
+                # result() reicht Fehler aus den Arbeitern weiter
+                pending = deque()
+                for job in jobs():
+                    pending.append(pool.submit(_write_chapter_pages, job))
+                    if len(pending) >= workers * 2:
+                        collect(pending.popleft().result())
+                while pending:
+                    collect(pending.popleft().result())
+        book_profile.complete("save_pages", started, directory=directory, chapters=total)
+        
+        print(f"Buch wurde als {total + 1} HTML-Seiten in '{directory}' gespeichert.")
+    
+    def save_to_html_reader(self, directory: str = "book_reader", chunk_size: int = 20,
+                            assets: bool = False):
+        """
+        Speichert das Buch als nachladenden Leser: eine kleine Startseite
+        (index.html) mit Inhaltsverzeichnis, deren Kapitel beim Scrollen oder
+        Navigieren blockweise aus ``kapitel/<nr>.js`` nachgeladen werden.
+        
+        Die Startseite ist unabhängig von der Buchlänge gleich groß; das
+        Inhaltsverzeichnis (toc.js) wird erst beim Aufklappen geladen. Bilder
+        werden mit ``loading="lazy"`` und, soweit bekannt, mit Breite und
+        Höhe eingebunden, damit sich das Layout beim Laden nicht verschiebt.
+        """
+        from book_assets import image_size
+        started = book_profile.now()
+        chapter_dir = os.path.join(directory, "kapitel")
+        os.makedirs(chapter_dir, exist_ok=True)
+        sizes: Dict[str, Tuple[int, int]] = {}
+        image_map = self._process_assets(directory, sizes) if assets else None
+        theme = self.theme
+        theme.refresh()
+        total = len(self.chapters)
+        chunk_count = -(-total // chunk_size)
+        width = max(4, len(str(chunk_count)))
+        
+        config = {"count": total, "chunk": chunk_size, "width": width,
+                  "prefix": "kapitel/", "toc": "toc.js"}
+        with _atomic_write(os.path.join(directory, "index.html")) as f:
+            title = _escape(self.title)
+            f.write(theme.head(title, "reader_style"))
+            f.write(theme.render("book_open", title=title, author=_escape(self.author)))
+            f.write(theme.render("reader_open"))
+            f.write(theme.render("book_close"))
+            f.write(theme.render("reader_script", config=json.dumps(config)))
+            f.write(theme.render("document_close"))
+        
+        with open(os.path.join(directory, "toc.js"), 'w', encoding='utf-8') as f:
+            f.write("window.BOOK_TOC(")
+            json.dump(self.chapter_titles(), f, ensure_ascii=False, separators=(',', ':'))
+            f.write(");\n")
+        
+        chapters = self._export_chapters(image_map)
+        links = None
+        for chunk in range(chunk_count):
+            chunk_started = book_profile.now()
+            blocks = []
+            for index in range(chunk * chunk_size + 1, min(total, (chunk + 1) * chunk_size) + 1):
+                chapter = next(chapters)
+                size = None
+                if chapter.image:
+                    if chapter.image not in sizes:
+                        sizes[chapter.image] = image_size(chapter.image)
+                    size = sizes[chapter.image]
+                block = _render_chapter_fragment(theme, chapter, True, size).replace(_NUMBER_MARK, str(index))
+                if chapter.choices:
+                    if links is None:
+                        links = self._chapter_links("#kapitel-{}")
+                    block = _resolve_links(block, links)
+                blocks.append(block)
+            with open(os.path.join(chapter_dir, f"{chunk + 1:0{width}d}.js"), 'w', encoding='utf-8') as f:
+                f.write(f"window.BOOK_CHUNK({chunk}, ")
+                json.dump(blocks, f, ensure_ascii=False, separators=(',', ':'))
+                f.write(");\n")
+            book_profile.complete("reader_chunk", chunk_started, chunk=chunk + 1, chapters=len(blocks))
+        book_profile.complete("save_reader", started, directory=directory, chapters=total)
+        
+        print(f"Buch wurde als nachladender Leser in '{directory}' gespeichert.")
+    
+    def export(self, format_name: str, path: str, **options):
+        """Exportiert das Buch über die Exporter-Registry (z.B. "html", "pack")"""
+        return get_exporter(format_name)(self, path, **options)
+    
+    def copy(self) -> "InteractiveBook":
+        """
+        Flache Kopie für Exporte im Hintergrund: eigene Kapitelliste, gemeinsame
+        Kapitel-Objekte und gemeinsamer Fragment-Cache. Die Kopie eines Buches
+        aus open_store liest über einen eigenen Snapshot und muss nach dem
+        Export mit close() freigegeben werden (ExportJob tut das selbst).
+        """
+        book = InteractiveBook(title=self.title, author=self.author)
+        if isinstance(self.chapters, VersionedList):
+            # O(1): der aktuelle Stand ist unveränderlich
+            book.chapters = VersionedList(self.chapters.vector)
+        elif self.store is not None:
+            # Eigene Lesetransaktion statt Kopie aller Kapitel
+            book.chapters = self.store.snapshot()
+        else:
+            book.chapters = list(self.chapters)
+        book.fragment_cache = self.fragment_cache
+        book.theme = self.theme
+        return book
+    
     def display_info(self):
         """Zeigt Informationen über das Buch an"""
         print(f"\nBuch: {self.title}")
@@ -129,8 +1504,389 @@ class InteractiveBook:
         print(f"Anzahl Kapitel: {len(self.chapters)}")
 
 
-def main():
-    """Hauptfunktion mit Beispiel-Nutzung"""
+def _id_number(chapter_id: str) -> int:
+    """Laufende Nummer einer automatisch vergebenen ID ("k12" -> 12), sonst 0"""
+    return int(chapter_id[1:]) if chapter_id[:1] == "k" and chapter_id[1:].isdigit() else 0
+
+
+def _chapter_page_name(index: int, width: int) -> str:
+    """Dateiname der HTML-Seite eines Kapitels"""
+    return f"kapitel_{index:0{width}d}.html"
+
+
+def _write_chapter_pages(job) -> Tuple[int, Optional[List[Dict]]]:
+    """
+    Schreibt einen Block von Kapitelseiten (läuft im Arbeiter-Pool). Gibt
+    die Anzahl der Seiten und, falls in einem eigenen Prozess profiliert
+    wurde, die dort aufgezeichneten Ereignisse zurück.
+    """
+    directory, book_title, first_index, total, width, chapters, theme, links, profiling = job
+    recorder = previous = None
+    if profiling is not None and profiling != os.getpid():
+        # Arbeiterprozess: eigene Aufzeichnung, die der Aufrufer übernimmt
+        # (eine per fork geerbte Senke würde die Ereignisse verlieren)
+        recorder = book_profile.TraceRecorder()
+        previous = book_profile.set_sink(recorder)
+    try:
+        with book_profile.span("write_pages", first=first_index, pages=len(chapters)):
+            _render_chapter_pages(directory, book_title, first_index, total, width, chapters, theme, links)
+    finally:
+        if recorder is not None:
+            book_profile.set_sink(previous)
+    return len(chapters), recorder.events if recorder is not None else None
+
+
+def _render_chapter_pages(directory: str, book_title: str, first_index: int, total: int, width: int,
+                          chapters: List[Chapter], theme: Theme, links: Dict[str, str]):
+    """Rendert und schreibt die Seiten eines Blocks"""
+    page_href = partial(_chapter_page_name, width=width)
+    for index, chapter in enumerate(chapters, first_index):
+        page = _chapter_page(theme, book_title, index, total, chapter, links, page_href)
+        with open(os.path.join(directory, page_href(index)), 'w', encoding='utf-8') as f:
+            f.write(page)
+
+
+def _chapter_page(theme: Theme, book_title: str, index: int, total: int, chapter: Chapter,
+                  links: Dict[str, str], page_href: Callable[[int], str]) -> str:
+    """Einzelne Kapitelseite mit Vor/Zurück-Navigation; page_href(n) ist der Link auf Seite n"""
+    nav_none = theme.render("nav_none")
+    prev_link = theme.render("nav_prev", href=page_href(index - 1)) if index > 1 else nav_none
+    next_link = theme.render("nav_next", href=page_href(index + 1)) if index < total else nav_none
+    nav = theme.render("nav", prev=prev_link, next=next_link)
+    fragment = _render_chapter_fragment(theme, chapter).replace(_NUMBER_MARK, str(index))
+    if chapter.choices:
+        fragment = _resolve_links(fragment, links)
+    return (
+        theme.head(f"{_escape(chapter.title)} - {_escape(book_title)}", "pages_style")
+        + theme.render("page_open")
+        + nav
+        + fragment
+        + nav
+        + theme.render("book_close")
+        + theme.render("document_close")
+    )
+
+
+def _toc_page(theme: Theme, title: str, author: str, titles, page_href: Callable[[int], str]):
+    """Übersichtsseite mit Inhaltsverzeichnis, stückweise erzeugt"""
+    title = _escape(title)
+    yield theme.head(title, "pages_style")
+    yield theme.render("book_open", title=title, author=_escape(author))
+    yield theme.render("toc_open")
+    toc_item = theme.templates["toc_item"]
+    for i, chapter_title in enumerate(titles, 1):
+        yield toc_item.render(href=page_href(i), title=_escape(chapter_title))
+    yield theme.render("toc_close")
+    yield theme.render("book_close")
+    yield theme.render("document_close")
+
+
+class ExportCancelled(Exception):
+    """Wird (z.B. aus einem progress-Callback) ausgelöst, um einen Export abzubrechen"""
+
+
+def _track_progress(chapters, progress: ProgressCallback, total: int = None):
+    """Reicht die Kapitel durch und meldet nach jedem Kapitel den Fortschritt"""
+    if progress is None:
+        return chapters
+    if total is None:
+        total = len(chapters)
+    
+    def tracked():
+        progress(0, total)
+        for done, chapter in enumerate(chapters, 1):
+            yield chapter
+            progress(done, total)
+    return tracked()
+
+
+@contextmanager
+def _atomic_write(filename: str):
+    """Schreibt in eine temporäre Datei und ersetzt das Ziel erst bei Erfolg"""
+    part = filename + ".part"
+    try:
+        with open(part, 'w', encoding='utf-8') as f:
+            yield f
+        os.replace(part, filename)
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+
+
+class ExportJob:
+    """
+    Führt einen Export in einem Hintergrund-Thread aus.
+    
+    ``export`` bekommt einen progress-Callback übergeben und reicht ihn an
+    save_to_json/save_to_html weiter. Die Oberfläche fragt ``progress``,
+    ``done`` und ``error`` regelmäßig aus ihrer Ereignisschleife ab (Tk:
+    ``after()``, Kivy: ``Clock``) und kann jederzeit ``cancel()`` aufrufen.
+    
+    snapshot ist die exportierte Kopie des Buches (siehe copy()); sie wird
+    nach dem Export in jedem Fall geschlossen.
+    """
+    
+    def __init__(self, export: Callable[[Callable[[int, int], None]], None],
+                 snapshot: "InteractiveBook" = None):
+        self._export = export
+        self.snapshot = snapshot
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self.progress = (0, 0)
+        self.done = False
+        self.cancelled = False
+        self.error: Optional[BaseException] = None
+    
+    def start(self) -> "ExportJob":
+        self._thread.start()
+        return self
+    
+    def cancel(self):
+        """Bittet den Export, beim nächsten Kapitel abzubrechen"""
+        self._cancel.set()
+    
+    def _report(self, done: int, total: int):
+        if self._cancel.is_set():
+            raise ExportCancelled()
+        self.progress = (done, total)
+    
+    def _run(self):
+        try:
+            self._export(self._report)
+        except ExportCancelled:
+            self.cancelled = True
+        except Exception as exc:
+            self.error = exc
+        finally:
+            if self.snapshot is not None:
+                self.snapshot.close()
+            self.done = True
+
+
+_JSON_CHUNK_SIZE = 64 * 1024
+_JSON_WHITESPACE = " \t\n\r"
+# Längstes Token, das am Pufferende abgeschnitten sein kann (z.B. "\\uXXXX", "-Infinity")
+_JSON_LOOKAHEAD = 16
+
+
+def iter_json_chapters(fileobj, meta: Dict = None):
+    """
+    Liest die Kapitel einer Buch-JSON-Datei einzeln aus einem Textdatei-Objekt.
+    
+    Es wird immer nur ein Kapitel gleichzeitig dekodiert. Alle übrigen Felder
+    der obersten Ebene (z.B. Titel und Autor) werden in ``meta`` abgelegt,
+    sobald sie gelesen wurden.
+    """
+    if meta is None:
+        meta = {}
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    
+    def fill(size=_JSON_CHUNK_SIZE):
+        nonlocal buf, pos, eof
+        chunk = fileobj.read(size)
+        buf = buf[pos:] + chunk
+        pos = 0
+        if not chunk:
+            eof = True
+    
+    def peek():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _JSON_WHITESPACE:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if eof:
+                raise ValueError("Unerwartetes Ende der JSON-Datei")
+            fill()
+    
+    def expect(char):
+        nonlocal pos
+        if peek() != char:
+            raise ValueError(f"Ungültige Buch-JSON: '{char}' erwartet an Position {pos}")
+        pos += 1
+    
+    def grow():
+        # Den offenen Rest verdoppeln statt um einen festen Block zu
+        # verlängern, damit lange Werte nur O(log n)-mal dekodiert werden
+        fill(max(_JSON_CHUNK_SIZE, len(buf) - pos))
+    
+    def decode():
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as exc:
+                # Fehler mitten im Puffer sind endgültig, nur Fehler am
+                # Pufferende (oder ein offener String) brauchen mehr Daten
+                incomplete = (exc.msg.startswith("Unterminated string")
+                              or exc.pos >= len(buf) - _JSON_LOOKAHEAD)
+                if eof or not incomplete:
+                    raise
+                grow()
+                continue
+            # Zahlen am Pufferende könnten abgeschnitten sein
+            if end == len(buf) and not eof:
+                grow()
+                continue
+            pos = end
+            return value
+    
+    expect('{')
+    if peek() == '}':
+        return
+    while True:
+        key = decode()
+        expect(':')
+        if key == "chapters":
+            expect('[')
+            if peek() == ']':
+                pos += 1
+            else:
+                while True:
+                    yield decode()
+                    if peek() == ',':
+                        pos += 1
+                        continue
+                    expect(']')
+                    break
+        else:
+            meta[key] = decode()
+        if peek() == ',':
+            pos += 1
+            continue
+        expect('}')
+        return
+
+
+class Exporter:
+    """
+    Ein Exportformat in der Registry. target ist ``"modul:attribut"``; das
+    Modul wird erst beim ersten Export in diesem Format importiert. Die
+    Export-Funktion wird als ``funktion(book, pfad, **optionen)`` aufgerufen.
+    """
+    
+    def __init__(self, name: str, target: str, extension: str = "", description: str = ""):
+        self.name = name
+        self.target = target
+        self.extension = extension
+        self.description = description
+        self._function: Optional[Callable] = None
+    
+    def load(self) -> Callable:
+        """Importiert die Export-Funktion (nur beim ersten Aufruf)"""
+        if self._function is None:
+            module_name, _, attribute = self.target.partition(":")
+            function = importlib.import_module(module_name)
+            for part in attribute.split("."):
+                function = getattr(function, part)
+            self._function = function
+        return self._function
+    
+    def __call__(self, book: InteractiveBook, path: str, **options):
+        return self.load()(book, path, **options)
+    
+    def __repr__(self) -> str:
+        return f"Exporter({self.name!r}, {self.target!r})"
+
+
+# Name -> Exporter; weitere Formate über register_exporter() oder den
+# Entry-Point "book_builder.exporters" installierter Pakete
+EXPORTERS: Dict[str, Exporter] = {}
+EXPORTER_ENTRY_POINTS = "book_builder.exporters"
+
+
+def register_exporter(name: str, target: str, extension: str = "", description: str = "") -> Exporter:
+    """Registriert ein Exportformat unter name (ersetzt ein vorhandenes)"""
+    exporter = EXPORTERS[name] = Exporter(name, target, extension, description)
+    return exporter
+
+
+def get_exporter(name: str) -> Exporter:
+    """Liefert das Exportformat name (ValueError, wenn unbekannt)"""
+    exporter = EXPORTERS.get(name)
+    if exporter is None:
+        _discover_exporters()
+        exporter = EXPORTERS.get(name)
+    if exporter is None:
+        raise ValueError(f"Unbekanntes Exportformat: {name}")
+    return exporter
+
+
+def available_exporters() -> List[str]:
+    """Namen aller bekannten Exportformate (inklusive installierter Plugins)"""
+    _discover_exporters()
+    return sorted(EXPORTERS)
+
+
+_discovered = False
+
+
+def _discover_exporters():
+    """Sucht einmalig nach Plugins über Entry-Points (importiert sie nicht)"""
+    global _discovered
+    if _discovered:
+        return
+    _discovered = True
+    for entry_point in _exporter_entry_points():
+        if entry_point.name not in EXPORTERS:
+            register_exporter(entry_point.name, entry_point.value)
+
+
+def _exporter_entry_points():
+    """Entry-Points der Exporter-Gruppe auch mit älteren importlib.metadata-Versionen"""
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        # Python 3.7: ohne importlib.metadata keine Plugins
+        return ()
+    try:
+        return entry_points(group=EXPORTER_ENTRY_POINTS)
+    except TypeError:
+        # Python 3.8/3.9: entry_points() liefert ein Dictionary nach Gruppen
+        return entry_points().get(EXPORTER_ENTRY_POINTS, ())
+
+
+register_exporter("json", "book_builder:InteractiveBook.save_to_json", ".json", "JSON-Datei")
+register_exporter("html", "book_builder:InteractiveBook.save_to_html", ".html", "HTML-Datei")
+register_exporter("pages", "book_builder:InteractiveBook.save_to_html_pages", "_html",
+                  "Mehrseitiges HTML (eine Seite pro Kapitel)")
+register_exporter("reader", "book_builder:InteractiveBook.save_to_html_reader", "_reader",
+                  "Nachladender HTML-Leser")
+register_exporter("pack", "book_builder:InteractiveBook.save_to_pack", ".kibook",
+                  "Gepacktes Buch mit Kapitel-Index")
+register_exporter("store", "book_builder:InteractiveBook.save_to_store", ".kidb",
+                  "SQLite-Datenbank (Kapitel werden bei Bedarf gelesen)")
+register_exporter("bundle", "book_bundle:save_bundle", ".min.html",
+                  "HTML mit gemeinsamem Stylesheet, minifiziert und mit gzip-Dateien")
+
+
+def main(argv: List[str] = None):
+    """Hauptfunktion mit Beispiel-Nutzung; --profile TRACE schreibt einen Chrome-Trace"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Erstellt ein Beispielbuch als JSON und HTML.")
+    parser.add_argument("--profile", metavar="TRACE",
+                        help="Stufen-Zeiten als Chrome-Trace (JSON) in diese Datei schreiben")
+    args = parser.parse_args(argv)
+    
+    if args.profile:
+        with book_profile.recording() as trace:
+            _build_example()
+        trace.write(args.profile)
+        print()
+        print(trace.summary())
+        print(f"\nTrace wurde als '{args.profile}' gespeichert (chrome://tracing oder ui.perfetto.dev).")
+    else:
+        _build_example()
+
+
+def _build_example():
     print("=== Interaktiver KI Book Builder ===\n")
     
     # Beispiel: Ein neues Buch erstellen
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Kompakte HTML-Ausgabe für große Kataloge.
+
+``save_bundle`` speichert ein Buch wie ``save_to_html``, aber
+
+- das CSS des Themes liegt in einer gemeinsamen, inhaltsadressierten Datei
+  (``styles/stil-<sha256>.css``), auf die jedes Buch nur verweist; Bücher
+  mit demselben Theme teilen sich die Datei, Browser laden sie einmal,
+- das HTML wird minifiziert (überflüssige Leerzeichen zwischen
+  Block-Elementen entfallen, ``<pre>``, ``<textarea>`` und ``<script>``
+  bleiben unverändert),
+- neben jeder Datei liegt eine vorkomprimierte ``.gz``-Fassung, die ein
+  Webserver direkt ausliefern kann (z.B. nginx ``gzip_static on``).
+
+Der zurückgegebene ``BundleReport`` zählt die gesparten Bytes:
+
+    from book_bundle import save_bundle
+
+    report = save_bundle(book, "dist/buch.min.html", search=True)
+    print(report.summary())
+
+Auch als Exportformat ``bundle`` (``book.export("bundle", pfad)``).
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import shutil
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import book_profile
+
+STYLES_DIR = "styles"
+
+# Elemente, deren Inhalt unverändert bleibt (style wird als CSS minifiziert)
+_RAW_ELEMENT = re.compile(r"<(pre|textarea|script|style)\b[^>]*>.*?</\1\s*>", re.S | re.I)
+_TAG = re.compile(r"(<[^>]*>)")
+_TAG_NAME = re.compile(r"</?([A-Za-z][A-Za-z0-9]*)")
+# Nur ASCII-Leerraum; geschützte Leerzeichen (U+00A0) bleiben erhalten
+_SPACE = re.compile(r"[ \t\r\n\f]+")
+# Elemente, an deren Grenzen Leerraum nicht dargestellt wird
+_BLOCK_TAGS = frozenset("""
+    html head body meta title link style script base
+    div p h1 h2 h3 h4 h5 h6 ul ol li dl dt dd nav details summary
+    header footer section article aside main figure figcaption
+    blockquote pre table thead tbody tfoot tr td th hr br
+""".split())
+
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_CSS_STRING = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')""")
+_CSS_PUNCTUATION = re.compile(r" ?([{};,>]) ?")
+
+
+def minify_css(css: str) -> str:
+    """Entfernt Kommentare und überflüssigen Leerraum (Zeichenketten bleiben unverändert)"""
+    parts = _CSS_STRING.split(_CSS_COMMENT.sub("", css))
+    for i in range(0, len(parts), 2):
+        text = _SPACE.sub(" ", parts[i])
+        text = _CSS_PUNCTUATION.sub(r"\1", text).replace(": ", ":").replace(";}", "}")
+        parts[i] = text
+    return "".join(parts).strip()
+
+
+def _is_block(tag: Optional[str]) -> bool:
+    # None steht für den Rand eines Stücks; iter_html teilt nur zwischen Blöcken
+    if tag is None:
+        return True
+    match = _TAG_NAME.match(tag)
+    return match is None or match.group(1).lower() in _BLOCK_TAGS
+
+
+def _collapse(html: str, before: Optional[str], after: Optional[str]) -> str:
+    """Fasst Leerraum in Text zusammen und entfernt ihn an Block-Grenzen"""
+    tokens = _TAG.split(html)
+    last = len(tokens) - 1
+    for i in range(0, len(tokens), 2):
+        text = _SPACE.sub(" ", tokens[i])
+        if text.startswith(" ") and _is_block(tokens[i - 1] if i else before):
+            text = text[1:]
+        if text.endswith(" ") and _is_block(tokens[i + 1] if i < last else after):
+            text = text[:-1]
+        tokens[i] = text
+    return "".join(tokens)
+
+
+def minify_html(html: str) -> str:
+    """
+    Minifiziert ein HTML-Dokument oder ein Stück davon. Leerraum wird zu
+    einem Leerzeichen zusammengefasst und an Block-Grenzen entfernt; der
+    Anfang und das Ende des Stücks gelten als Block-Grenze. Setzt voraus,
+    dass das Theme kein ``white-space: pre`` außerhalb von ``<pre>`` nutzt.
+    """
+    parts = []
+    position = 0
+    before = None
+    for match in _RAW_ELEMENT.finditer(html):
+        element = match.group(0)
+        opening = element[:element.index(">") + 1]
+        parts.append(_collapse(html[position:match.start()], before, opening))
+        if match.group(1).lower() == "style":
+            closing = element.rindex("</")
+            element = opening + minify_css(element[len(opening):closing]) + element[closing:]
+        parts.append(element)
+        before = "</" + match.group(1) + ">"
+        position = match.end()
+    parts.append(_collapse(html[position:], before, None))
+    return "".join(parts)
+
+
+class HtmlMinifier:
+    """minify_html als Filter für write_html, der die Bytes vorher/nachher zählt"""
+
+    def __init__(self):
+        self.before = 0
+        self.after = 0
+
+    def __call__(self, chunk: str) -> str:
+        minified = minify_html(chunk)
+        self.before += len(chunk.encode("utf-8"))
+        self.after += len(minified.encode("utf-8"))
+        return minified
+
+
+@contextmanager
+def _replace(path: str):
+    """
+    Liefert einen temporären Pfad, der bei Erfolg path ersetzt. Eine eigene
+    Datei pro Prozess, da parallele Builds dasselbe Stylesheet schreiben.
+    """
+    part = f"{path}.{os.getpid()}.part"
+    try:
+        yield part
+        os.replace(part, path)
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+
+
+def stylesheet_name(css: str) -> str:
+    """Inhaltsadressierter Dateiname eines Stylesheets"""
+    return f"stil-{hashlib.sha256(css.encode('utf-8')).hexdigest()[:16]}.css"
+
+
+def write_stylesheet(css: str, directory: str) -> Tuple[str, bool]:
+    """
+    Legt das Stylesheet unter seinem Inhalts-Hash in directory ab. Gibt den
+    Pfad zurück und ob die Datei neu geschrieben wurde (vorhandene Dateien
+    haben denselben Inhalt und bleiben unberührt).
+    """
+    path = os.path.join(directory, stylesheet_name(css))
+    if os.path.exists(path):
+        return path, False
+    os.makedirs(directory, exist_ok=True)
+    with _replace(path) as part:
+        with open(part, 'w', encoding='utf-8') as f:
+            f.write(css)
+    return path, True
+
+
+def precompress(path: str, level: int = 9) -> int:
+    """
+    Schreibt ``<path>.gz`` (ohne Zeitstempel, also bei gleichem Inhalt
+    byte-identisch) und gibt dessen Größe zurück.
+    """
+    target = path + ".gz"
+    with book_profile.span("precompress", filename=path), _replace(target) as part:
+        with open(path, 'rb') as source, open(part, 'wb') as raw:
+            with gzip.GzipFile(filename="", mode='wb', compresslevel=level, fileobj=raw, mtime=0) as f:
+                shutil.copyfileobj(source, f, 1024 * 1024)
+    return os.path.getsize(target)
+
+
+class BundleReport:
+    """
+    Bytes pro geschriebener Datei: original (wie save_to_html sie ohne
+    Bündel geschrieben hätte), size (geschrieben) und compressed (.gz).
+    Ein Bericht kann über mehrere save_bundle-Aufrufe gesammelt werden.
+    """
+
+    def __init__(self):
+        self.files: List[Dict] = []
+
+    def add(self, path: str, original: int, size: int, compressed: Optional[int] = None):
+        self.files.append({"path": path, "original": original, "size": size, "compressed": compressed})
+
+    @property
+    def original(self) -> int:
+        return sum(entry["original"] for entry in self.files)
+
+    @property
+    def size(self) -> int:
+        return sum(entry["size"] for entry in self.files)
+
+    @property
+    def compressed(self) -> int:
+        """Ausgelieferte Bytes, wenn vorhandene .gz-Dateien genutzt werden"""
+        return sum(entry["size"] if entry["compressed"] is None else entry["compressed"]
+                   for entry in self.files)
+
+    def totals(self) -> Dict[str, int]:
+        return {"files": len(self.files), "original": self.original, "size": self.size,
+                "compressed": self.compressed}
+
+    def summary(self) -> str:
+        """Tabelle pro Datei und die gesparten Bytes insgesamt"""
+        width = max([len("Datei")] + [len(entry["path"]) for entry in self.files])
+        lines = [f"{'Datei':<{width}}  {'Original':>10}  {'Geschrieben':>11}  {'gzip':>10}"]
+        for entry in self.files:
+            compressed = "-" if entry["compressed"] is None else entry["compressed"]
+            lines.append(f"{entry['path']:<{width}}  {entry['original']:>10}  {entry['size']:>11}  {compressed:>10}")
+        lines.append(format_savings(self.totals()))
+        return "\n".join(lines)
+
+
+def format_savings(totals: Dict[str, int]) -> str:
+    """Eine Zeile mit den gesparten Bytes (totals wie BundleReport.totals())"""
+    original = totals["original"] or 1
+    saved = totals["original"] - totals["size"]
+    saved_gzip = totals["original"] - totals["compressed"]
+    return (f"Gespart: {saved} Bytes ({saved / original:.0%}) durch gemeinsames Stylesheet und"
+            f" Minifizieren, {saved_gzip} Bytes ({saved_gzip / original:.0%}) mit gzip"
+            f" ({totals['original']} -> {totals['compressed']} Bytes in {totals['files']} Dateien)")
+
+
+def save_bundle(book, filename: str = "book.min.html", styles_dir: str = None, minify: bool = True,
+                compress: bool = True, report: BundleReport = None, **html_options) -> BundleReport:
+    """
+    Speichert book als HTML mit gemeinsamem Stylesheet (in styles_dir,
+    Standard ``styles/`` neben der Ausgabe), minifiziert (minify) und mit
+    ``.gz``-Dateien (compress). Weitere Optionen (assets, search, progress,
+    persist_cache) gehen an save_to_html. Die Einträge werden an report
+    angehängt, der zurückgegeben wird.
+    """
+    report = report if report is not None else BundleReport()
+    output_dir = os.path.dirname(os.path.abspath(filename))
+    styles_dir = styles_dir or os.path.join(os.path.dirname(filename), STYLES_DIR)
+    theme = book.theme
+    theme.refresh()
+    css = theme.stylesheet()
+    if minify:
+        css = minify_css(css)
+    with book_profile.span("stylesheet"):
+        css_path, created = write_stylesheet(css, styles_dir)
+    href = os.path.relpath(os.path.abspath(css_path), output_dir).replace(os.sep, "/")
+
+    minifier = HtmlMinifier() if minify else None
+    book.save_to_html(filename, stylesheet=href, minify=minifier or False, **html_options)
+
+    # Das eingebettete CSS, das save_to_html sonst in den Kopf geschrieben hätte
+    search = html_options.get("search", False)
+    extra_style = "search_style" if search else None
+    embedded = (len(theme.head(book.title, extra_style).encode("utf-8"))
+                - len(theme.head(book.title, extra_style, href).encode("utf-8")))
+    size = os.path.getsize(filename)
+    original = (minifier.before if minifier is not None else size) + embedded
+    report.add(filename, original, size, precompress(filename) if compress else None)
+    if search:
+        search_path = os.path.join(os.path.dirname(filename),
+                                   os.path.splitext(os.path.basename(filename))[0] + ".search.js")
+        size = os.path.getsize(search_path)
+        report.add(search_path, size, size, precompress(search_path) if compress else None)
+    if created:
+        size = os.path.getsize(css_path)
+        report.add(css_path, 0, size, precompress(css_path) if compress else None)
+    elif compress and not os.path.exists(css_path + ".gz"):
+        precompress(css_path)
+
+    print(format_savings(report.totals()))
+    return report
@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+"""
+KI-Generierung von Kapiteln.
+
+Ein Backend (``GenerationBackend``) erzeugt zu einem Prompt einen Text.
+Die ``GenerationEngine`` schickt viele Prompts gleichzeitig mit asyncio an
+das Backend:
+
+    - höchstens ``concurrency`` Anfragen laufen parallel,
+    - ein Token-Bucket begrenzt die Anfragen pro Sekunde (``rate``, ``burst``),
+    - vorübergehende Fehler werden mit exponentiellem Backoff wiederholt,
+    - Ergebnisse landen in einem Cache auf der Festplatte (``PromptCache``,
+      LRU nach Anzahl und Größe), gleiche Prompts werden nur einmal gesendet.
+
+``fill_book`` fügt die Kapitel in das Buch ein, sobald sie fertig sind, und
+nicht erst, wenn auch die langsamste Anfrage beantwortet ist. Die
+Reihenfolge der Anfragen bleibt dabei im Buch erhalten.
+
+Eingebaute Backends: ``stub`` (deterministischer lokaler Text, zum Testen)
+und ``http`` (OpenAI-kompatibler Chat-Endpunkt, nur Standardbibliothek).
+
+    python3 book_generate.py "Die Reise" -c "Aufbruch" "Der Sturm" "Heimkehr"
+    python3 book_generate.py "Die Reise" -c Aufbruch --backend http \\
+        --url http://localhost:8080/v1/chat/completions --model llama3
+"""
+
+import abc
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sys
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+from book_builder import Chapter, InteractiveBook, ProgressCallback, _atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationError(Exception):
+    """Das Backend konnte keinen Text erzeugen"""
+
+
+class TransientGenerationError(GenerationError):
+    """Vorübergehender Fehler (Zeitüberschreitung, Rate-Limit, 5xx); wird wiederholt"""
+
+
+class GenerationBackend(abc.ABC):
+    """
+    Schnittstelle für Text-Generatoren. ``fingerprint`` fließt in den
+    Cache-Schlüssel ein und muss sich ändern, wenn dasselbe Prompt ein
+    anderes Ergebnis liefern würde (anderes Modell, andere Parameter).
+    """
+
+    name = "base"
+
+    @property
+    def fingerprint(self) -> str:
+        return self.name
+
+    @abc.abstractmethod
+    async def generate(self, prompt: str) -> str:
+        """Erzeugt den Text zu prompt; Fehler als GenerationError"""
+
+
+_STUB_WORDS = (
+    "der Wind", "ein Licht", "die Stadt", "das Meer", "eine Stimme", "der Wald", "ein Brief",
+    "die Nacht", "ein Fremder", "der Turm", "die Karte", "ein Versprechen", "der Fluss",
+    "die Erinnerung", "ein Schlüssel", "der Morgen",
+)
+_STUB_VERBS = (
+    "wartet", "erzählt", "verschwindet", "leuchtet", "ruft", "verändert alles", "bleibt",
+    "führt weiter", "öffnet sich", "schweigt",
+)
+
+
+class StubBackend(GenerationBackend):
+    """
+    Deterministisches lokales Backend zum Testen: derselbe Prompt ergibt
+    immer denselben Text. ``delay`` simuliert eine (pro Prompt
+    unterschiedliche) Antwortzeit, ``failures`` lässt die ersten Versuche
+    je Prompt mit einem vorübergehenden Fehler scheitern.
+    """
+
+    name = "stub"
+
+    def __init__(self, delay: float = 0.0, failures: int = 0, paragraphs: int = 3):
+        self.delay = delay
+        self.failures = failures
+        self.paragraphs = paragraphs
+        self.calls = 0
+        self._attempts: Dict[str, int] = {}
+
+    @property
+    def fingerprint(self) -> str:
+        return f"stub:{self.paragraphs}"
+
+    async def generate(self, prompt: str) -> str:
+        self.calls += 1
+        seed = hashlib.sha256(prompt.encode("utf-8")).digest()
+        if self.delay:
+            await asyncio.sleep(self.delay * (0.5 + seed[0] / 255))
+        attempt = self._attempts.get(prompt, 0) + 1
+        self._attempts[prompt] = attempt
+        if attempt <= self.failures:
+            raise TransientGenerationError(f"Stub-Fehler (Versuch {attempt})")
+        rng = random.Random(seed)
+        paragraphs = []
+        for _ in range(self.paragraphs):
+            sentences = []
+            for _ in range(rng.randint(3, 6)):
+                subject = rng.choice(_STUB_WORDS)
+                sentences.append(f"{subject[0].upper()}{subject[1:]} {rng.choice(_STUB_VERBS)}.")
+            paragraphs.append(" ".join(sentences))
+        return "\n\n".join(paragraphs)
+
+
+class HttpBackend(GenerationBackend):
+    """
+    OpenAI-kompatibler Chat-Completions-Endpunkt (auch lokale Server wie
+    llama.cpp oder Ollama). Die blockierende Anfrage läuft in einem Thread,
+    damit die Ereignisschleife weitere Anfragen starten kann.
+    """
+
+    name = "http"
+
+    def __init__(self, url: str, model: str, api_key: str = None, max_tokens: int = 1024,
+                 temperature: float = 0.7, timeout: float = 120.0,
+                 system: str = "Du bist ein Autor und schreibst Buchkapitel auf Deutsch."):
+        self.url = url
+        self.model = model
+        self.api_key = api_key
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.timeout = timeout
+        self.system = system
+
+    @property
+    def fingerprint(self) -> str:
+        return f"http:{self.url}:{self.model}:{self.max_tokens}:{self.temperature}:{self.system}"
+
+    async def generate(self, prompt: str) -> str:
+        # urllib blockiert; im Standard-Threadpool (asyncio.to_thread erst ab Python 3.9)
+        return await asyncio.get_running_loop().run_in_executor(None, self._request, prompt)
+
+    def _request(self, prompt: str) -> str:
+        import urllib.error
+        import urllib.request
+        body = json.dumps({
+            "model": self.model,
+            "messages": [{"role": "system", "content": self.system},
+                         {"role": "user", "content": prompt}],
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+        }).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(self.url, data=body, headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                data = json.load(response)
+        except urllib.error.HTTPError as e:
+            if e.code == 429 or e.code >= 500:
+                raise TransientGenerationError(f"HTTP {e.code}") from e
+            raise GenerationError(f"HTTP {e.code}: {e.reason}") from e
+        except (urllib.error.URLError, TimeoutError) as e:
+            raise TransientGenerationError(str(e)) from e
+        try:
+            return data["choices"][0]["message"]["content"].strip()
+        except (KeyError, IndexError, TypeError) as e:
+            raise GenerationError("Unerwartete Antwort des Servers") from e
+
+
+BACKENDS: Dict[str, Callable[..., GenerationBackend]] = {
+    "stub": StubBackend,
+    "http": HttpBackend,
+}
+
+
+def register_backend(name: str, factory: Callable[..., GenerationBackend]):
+    """Meldet ein Backend an; factory(**optionen) erzeugt es"""
+    BACKENDS[name] = factory
+
+
+def get_backend(name: str, **options) -> GenerationBackend:
+    """Erzeugt ein registriertes Backend"""
+    try:
+        factory = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unbekanntes Backend '{name}' (verfügbar: {', '.join(sorted(BACKENDS))})") from None
+    return factory(**options)
+
+
+class TokenBucket:
+    """
+    Token-Bucket: füllt sich mit rate Tokens pro Sekunde bis höchstens
+    capacity. acquire() wartet, bis genug Tokens da sind; Wartende kommen
+    der Reihe nach dran.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        async with self._lock:
+            self._refill()
+            while self.tokens < tokens:
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
+
+
+class PromptCache:
+    """
+    Cache Prompt → Text auf der Festplatte, eine Datei pro Eintrag. Die
+    LRU-Reihenfolge ergibt sich aus der Änderungszeit der Dateien (wird bei
+    jedem Treffer aktualisiert); beim Überschreiten von max_entries oder
+    max_bytes werden die am längsten nicht benutzten Einträge gelöscht.
+    """
+
+    SUFFIX = ".txt"
+
+    def __init__(self, directory: str, max_entries: int = 10000, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.endswith(self.SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, entry.name[:-len(self.SUFFIX)], stat.st_size))
+        self._entries: "OrderedDict[str, int]" = OrderedDict(
+            (key, size) for _mtime, key, size in sorted(entries)
+        )
+        self.bytes = sum(self._entries.values())
+
+    @staticmethod
+    def key(fingerprint: str, prompt: str) -> str:
+        return hashlib.sha256(f"{fingerprint}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[str]:
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                text = f.read()
+            os.utime(self._path(key))
+        except OSError:
+            self.bytes -= self._entries.pop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return text
+
+    def put(self, key: str, text: str):
+        with _atomic_write(self._path(key)) as f:
+            f.write(text)
+        size = os.path.getsize(self._path(key))
+        self.bytes += size - self._entries.pop(key, 0)
+        self._entries[key] = size
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+            old, old_size = self._entries.popitem(last=False)
+            self.bytes -= old_size
+            try:
+                os.remove(self._path(old))
+            except OSError:
+                pass
+
+
+class GenerationRequest:
+    """
+    Eine Anfrage: ein neues Kapitel ``title`` aus ``prompt`` oder, mit
+    ``expand``, neuer Inhalt für das bestehende Kapitel an dieser Position.
+    """
+
+    __slots__ = ("title", "prompt", "image", "expand")
+
+    def __init__(self, title: str, prompt: str, image: str = None, expand: int = None):
+        self.title = title
+        self.prompt = prompt
+        self.image = image
+        self.expand = expand
+
+    def __repr__(self) -> str:
+        return f"GenerationRequest({self.title!r})"
+
+
+class GenerationResult:
+    """Ergebnis einer Anfrage; text ist None, wenn error gesetzt ist"""
+
+    __slots__ = ("request", "position", "text", "error", "cached", "attempts", "seconds")
+
+    def __init__(self, request: GenerationRequest, position: int):
+        self.request = request
+        self.position = position
+        self.text: Optional[str] = None
+        self.error: Optional[BaseException] = None
+        self.cached = False
+        self.attempts = 0
+        self.seconds = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def chapter_prompt(book: InteractiveBook, title: str, notes: str = "") -> str:
+    """Prompt für ein neues Kapitel des Buches"""
+    prompt = f"Schreibe das Kapitel \"{title}\" des Buches \"{book.title}\""
+    if book.author:
+        prompt += f" von {book.author}"
+    prompt += "."
+    if notes:
+        prompt += f"\n\nHinweise: {notes}"
+    return prompt
+
+
+def expand_prompt(book: InteractiveBook, index: int, instruction: str = "Erweitere und verbessere den Text.") -> str:
+    """Prompt zum Überarbeiten des Kapitels an Position index"""
+    chapter = book.chapters[index]
+    return (f"Kapitel \"{chapter.title}\" des Buches \"{book.title}\".\n\n"
+            f"{instruction}\n\n---\n{chapter.content}")
+
+
+class GenerationEngine:
+    """
+    Führt viele Anfragen nebenläufig aus (siehe Moduldokumentation).
+    rate=None schaltet die Ratenbegrenzung ab, cache=None den Cache.
+    """
+
+    def __init__(self, backend: GenerationBackend, concurrency: int = 4, rate: float = None,
+                 burst: float = None, retries: int = 3, backoff: float = 0.5,
+                 timeout: float = None, cache: PromptCache = None):
+        self.backend = backend
+        self.concurrency = max(1, concurrency)
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache
+
+    async def _call(self, prompt: str, result: GenerationResult, semaphore: asyncio.Semaphore,
+                    bucket: Optional[TokenBucket]) -> str:
+        """Ruft das Backend mit Wiederholungen auf"""
+        delay = self.backoff
+        while True:
+            result.attempts += 1
+            try:
+                async with semaphore:
+                    if bucket is not None:
+                        await bucket.acquire()
+                    call = self.backend.generate(prompt)
+                    return await (asyncio.wait_for(call, self.timeout) if self.timeout else call)
+            except (TransientGenerationError, asyncio.TimeoutError, OSError) as e:
+                if result.attempts > self.retries:
+                    raise
+                logger.info("Wiederhole %r nach Fehler: %s", result.request, e)
+            # Außerhalb des Semaphors warten, damit andere Anfragen weiterlaufen
+            await asyncio.sleep(delay * (0.5 + random.random()))
+            delay *= 2
+
+    async def generate(self, requests: Iterable[GenerationRequest]) -> AsyncIterator[GenerationResult]:
+        """Liefert die Ergebnisse in der Reihenfolge, in der sie fertig werden"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        bucket = TokenBucket(self.rate, self.burst) if self.rate else None
+        fingerprint = self.backend.fingerprint
+        # Gleiche Prompts teilen sich eine laufende Anfrage
+        inflight: Dict[str, asyncio.Task] = {}
+
+        async def run(position: int, request: GenerationRequest) -> GenerationResult:
+            result = GenerationResult(request, position)
+            started = time.perf_counter()
+            key = PromptCache.key(fingerprint, request.prompt)
+            try:
+                text = self.cache.get(key) if self.cache is not None else None
+                if text is not None:
+                    result.cached = True
+                else:
+                    if key not in inflight:
+                        inflight[key] = asyncio.ensure_future(self._call(request.prompt, result, semaphore, bucket))
+                    else:
+                        result.cached = True
+                    text = await asyncio.shield(inflight[key])
+                    if self.cache is not None and not result.cached:
+                        self.cache.put(key, text)
+                result.text = text
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                result.error = e
+            result.seconds = time.perf_counter() - started
+            return result
+
+        tasks = [asyncio.ensure_future(run(position, request)) for position, request in enumerate(requests)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in list(tasks) + list(inflight.values()):
+                task.cancel()
+
+    async def fill_book(self, book: InteractiveBook, requests: List[GenerationRequest],
+                        progress: ProgressCallback = None,
+                        on_result: Callable[[GenerationResult], None] = None) -> List[GenerationResult]:
+        """
+        Erzeugt die Kapitel und fügt jedes sofort ins Buch ein (neue
+        Kapitel hinter den vorhandenen, in der Reihenfolge der Anfragen;
+        ``expand``-Anfragen ersetzen den Inhalt des Kapitels). Fehlgeschlagene
+        Anfragen werden übersprungen und sind am Ergebnis erkennbar.
+        """
+        base = len(book.chapters)
+        inserted: List[int] = []
+        results = []
+        total = len(requests)
+        if progress:
+            progress(0, total)
+        async for result in self.generate(requests):
+            request = result.request
+            if result.ok:
+                if request.expand is not None:
+                    book.edit_chapter(request.expand, content=result.text)
+                else:
+                    # Position unter den bereits eingefügten Kapiteln suchen
+                    book.insert_chapter(base + bisect_left(inserted, result.position),
+                                        Chapter(request.title, result.text, request.image))
+                    insort(inserted, result.position)
+            else:
+                logger.warning("Generierung von %r fehlgeschlagen: %s", request, result.error)
+            results.append(result)
+            if on_result:
+                on_result(result)
+            if progress:
+                progress(len(results), total)
+        results.sort(key=lambda r: r.position)
+        return results
+
+
+def generate_chapters(book: InteractiveBook, requests: List[GenerationRequest],
+                      backend: GenerationBackend = None, progress: ProgressCallback = None,
+                      **engine_options) -> List[GenerationResult]:
+    """Synchrone Variante von GenerationEngine.fill_book (eigene Ereignisschleife)"""
+    engine = GenerationEngine(backend or StubBackend(), **engine_options)
+    return asyncio.run(engine.fill_book(book, requests, progress))
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Erzeugt Kapitel eines Buches mit einem KI-Backend.")
+    parser.add_argument("title", help="Titel des Buches")
+    parser.add_argument("--chapters", "-c", nargs="+", required=True, help="Titel der Kapitel")
+    parser.add_argument("--author", default="", help="Autor des Buches")
+    parser.add_argument("--notes", default="", help="Hinweise, die jedem Prompt angehängt werden")
+    parser.add_argument("--output", "-o", default="book.json", help="Ausgabedatei (Format nach Endung)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="stub")
+    parser.add_argument("--url", help="Endpunkt für --backend http")
+    parser.add_argument("--model", help="Modell für --backend http")
+    parser.add_argument("--concurrency", "-j", type=int, default=4, help="parallele Anfragen")
+    parser.add_argument("--rate", type=float, help="höchstens so viele Anfragen pro Sekunde")
+    parser.add_argument("--retries", type=int, default=3, help="Wiederholungen bei vorübergehenden Fehlern")
+    parser.add_argument("--cache", default=".ki_cache", help="Verzeichnis des Prompt-Caches ('' = aus)")
+    args = parser.parse_args(argv)
+
+    if args.backend == "http":
+        if not args.url or not args.model:
+            parser.error("--backend http braucht --url und --model")
+        backend = get_backend("http", url=args.url, model=args.model, api_key=os.environ.get("KI_API_KEY"))
+    else:
+        backend = get_backend(args.backend)
+
+    book = InteractiveBook(title=args.title, author=args.author)
+    requests = [GenerationRequest(title, chapter_prompt(book, title, args.notes)) for title in args.chapters]
+    cache = PromptCache(args.cache) if args.cache else None
+    engine = GenerationEngine(backend, concurrency=args.concurrency, rate=args.rate,
+                              retries=args.retries, cache=cache)
+
+    def report(result: GenerationResult):
+        status = "Cache" if result.cached else f"{result.seconds:.2f} s"
+        if result.ok:
+            print(f"  fertig  {result.request.title} ({status})")
+        else:
+            print(f"  FEHLER  {result.request.title}: {result.error}")
+
+    started = time.perf_counter()
+    results = asyncio.run(engine.fill_book(book, requests, on_result=report))
+    failed = sum(1 for result in results if not result.ok)
+    print(f"\n{len(results) - failed} von {len(results)} Kapiteln in {time.perf_counter() - started:.2f} s erzeugt"
+          + (f" (Cache: {cache.hits} Treffer)" if cache is not None else ""))
+
+    exporters = {".json": "json", ".html": "html", ".kibook": "pack"}
+    book.export(exporters.get(os.path.splitext(args.output)[1].lower(), "json"), args.output)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Versionierte Kapitellisten für Rückgängig/Wiederholen.
+
+Die Kapitel liegen in einem persistenten Vektor: einem flachen B-Baum mit
+bis zu 64 Kapiteln pro Blatt und 32 Kindern pro Knoten. Jede Änderung
+kopiert nur den Pfad von der Wurzel zum betroffenen Blatt (O(log n)); alle
+anderen Blätter und Knoten werden von der alten und der neuen Version
+gemeinsam genutzt. Eine Version ist deshalb nur ein Zeiger auf eine
+Wurzel, und Rückgängig/Wiederholen tauscht lediglich diesen Zeiger aus.
+
+Leere Blätter und Knoten werden beim Löschen entfernt, zu kleine aber
+nicht zusammengelegt; die Baumhöhe bleibt trotzdem durch die größte
+jemals erreichte Kapitelanzahl begrenzt.
+"""
+
+from bisect import bisect_right
+from collections.abc import MutableSequence
+from typing import Iterable, Iterator, List, Optional
+
+# Kapitel pro Blatt und Kinder pro Knoten
+_LEAF = 64
+_BRANCH = 32
+
+
+class _Node:
+    """Innerer Knoten: Kinder und kumulierte Größen für die Suche per bisect"""
+
+    __slots__ = ("children", "ends")
+
+    def __init__(self, children: tuple):
+        self.children = children
+        ends = []
+        total = 0
+        for child in children:
+            total += len(child) if type(child) is tuple else child.ends[-1]
+            ends.append(total)
+        self.ends = ends
+
+
+def _size(node) -> int:
+    return len(node) if type(node) is tuple else node.ends[-1]
+
+
+def _locate(node: _Node, index: int):
+    """Kind und Position darin für index (index == Größe zeigt hinter das letzte Kind)"""
+    k = bisect_right(node.ends, index)
+    if k == len(node.children):
+        k -= 1
+    return k, index - (node.ends[k - 1] if k else 0)
+
+
+def _split(items: tuple, limit: int) -> list:
+    if len(items) <= limit:
+        return [items]
+    half = len(items) // 2
+    return [items[:half], items[half:]]
+
+
+def _get(node, index: int):
+    while type(node) is not tuple:
+        k, index = _locate(node, index)
+        node = node.children[k]
+    return node[index]
+
+
+def _set(node, index: int, value):
+    if type(node) is tuple:
+        return node[:index] + (value,) + node[index + 1:]
+    k, index = _locate(node, index)
+    children = node.children
+    return _Node(children[:k] + (_set(children[k], index, value),) + children[k + 1:])
+
+
+def _insert(node, index: int, value) -> list:
+    """Fügt value ein; gibt ein oder (nach einer Teilung) zwei Knoten zurück"""
+    if type(node) is tuple:
+        return _split(node[:index] + (value,) + node[index:], _LEAF)
+    k, index = _locate(node, index)
+    children = node.children
+    children = children[:k] + tuple(_insert(children[k], index, value)) + children[k + 1:]
+    return [_Node(part) for part in _split(children, _BRANCH)]
+
+
+def _delete(node, index: int):
+    """Entfernt das Element an index; None, wenn der Knoten leer wird"""
+    if type(node) is tuple:
+        return node[:index] + node[index + 1:] or None
+    k, index = _locate(node, index)
+    child = _delete(node.children[k], index)
+    children = node.children[:k] + ((child,) if child is not None else ()) + node.children[k + 1:]
+    return _Node(children) if children else None
+
+
+def _push_leaf(node, leaf: tuple, height: int) -> list:
+    """Hängt ein Blatt rechts an einen Knoten der Höhe height an"""
+    if height == 1:
+        children = node.children + (leaf,)
+    else:
+        children = node.children[:-1] + tuple(_push_leaf(node.children[-1], leaf, height - 1))
+    return [_Node(part) for part in _split(children, _BRANCH)]
+
+
+def _height(node) -> int:
+    height = 0
+    while type(node) is not tuple:
+        node = node.children[0]
+        height += 1
+    return height
+
+
+def _leaves(node, start: int = 0) -> Iterator[tuple]:
+    """Liefert die Blätter ab Position start (das erste ggf. angeschnitten)"""
+    if type(node) is tuple:
+        yield node[start:] if start else node
+        return
+    k, start = _locate(node, start)
+    for child in node.children[k:]:
+        yield from _leaves(child, start)
+        start = 0
+
+
+def _root_from(parts: list):
+    root = parts[0] if len(parts) == 1 else _Node(tuple(parts))
+    while type(root) is not tuple and len(root.children) == 1:
+        root = root.children[0]
+    return root
+
+
+class PersistentVector:
+    """Unveränderliche Folge; jede Änderung liefert einen neuen Vektor"""
+
+    __slots__ = ("root",)
+
+    def __init__(self, items: Iterable = ()):
+        self.root = ()
+        vector = self.extend(items)
+        self.root = vector.root
+
+    @classmethod
+    def _from_root(cls, root) -> "PersistentVector":
+        vector = cls.__new__(cls)
+        vector.root = root
+        return vector
+
+    def __len__(self) -> int:
+        return _size(self.root)
+
+    def __iter__(self):
+        for leaf in _leaves(self.root):
+            yield from leaf
+
+    def iter_from(self, start: int) -> Iterator:
+        """Iteriert ab Position start, ohne die Blätter davor zu besuchen"""
+        if start >= len(self):
+            return
+        for leaf in _leaves(self.root, start):
+            yield from leaf
+
+    def __getitem__(self, index: int):
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("Index außerhalb des Bereichs")
+        return _get(self.root, index)
+
+    def set(self, index: int, value) -> "PersistentVector":
+        return self._from_root(_set(self.root, self._check(index), value))
+
+    def insert(self, index: int, value) -> "PersistentVector":
+        size = len(self)
+        # Wie list.insert: Positionen außerhalb werden an den Rand gelegt
+        if index < 0:
+            index = max(0, index + size)
+        return self._from_root(_root_from(_insert(self.root, min(index, size), value)))
+
+    def delete(self, index: int) -> "PersistentVector":
+        root = _delete(self.root, self._check(index))
+        return self._from_root(() if root is None else _root_from([root]))
+
+    def extend(self, items: Iterable) -> "PersistentVector":
+        """Hängt viele Elemente blattweise an (O(k + log n) statt k einzelne Einfügungen)"""
+        items = tuple(items)
+        root = self.root
+        start = 0
+        # Zuerst ein nicht volles Wurzelblatt auffüllen
+        if type(root) is tuple and len(root) < _LEAF:
+            start = _LEAF - len(root)
+            root = root + items[:start]
+        for offset in range(start, len(items), _LEAF):
+            leaf = items[offset:offset + _LEAF]
+            if type(root) is tuple:
+                root = _Node((root, leaf))
+            else:
+                root = _root_from(_push_leaf(root, leaf, _height(root)))
+        return self._from_root(root)
+
+    def _check(self, index: int) -> int:
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("Index außerhalb des Bereichs")
+        return index
+
+
+class VersionedList(MutableSequence):
+    """
+    Veränderbare Liste über einem PersistentVector. Jede Änderung ersetzt
+    ``vector`` durch eine neue Version; ältere Versionen bleiben gültig und
+    teilen sich alle unveränderten Teile mit der aktuellen.
+    """
+
+    def __init__(self, items: Iterable = ()):
+        self.vector = items if isinstance(items, PersistentVector) else PersistentVector(items)
+
+    def __len__(self) -> int:
+        return len(self.vector)
+
+    def __iter__(self):
+        return iter(self.vector)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self.vector))
+            if step == 1:
+                result = []
+                for item in self.vector.iter_from(start):
+                    if len(result) >= stop - start:
+                        break
+                    result.append(item)
+                return result
+            return list(self.vector)[index]
+        return self.vector[index]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            items = list(self.vector)
+            items[index] = value
+            self.vector = PersistentVector(items)
+        else:
+            self.vector = self.vector.set(index, value)
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            items = list(self.vector)
+            del items[index]
+            self.vector = PersistentVector(items)
+        else:
+            self.vector = self.vector.delete(index)
+
+    def insert(self, index: int, value):
+        self.vector = self.vector.insert(index, value)
+
+    def append(self, value):
+        self.vector = self.vector.insert(len(self.vector), value)
+
+    def extend(self, values: Iterable):
+        self.vector = self.vector.extend(values)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, VersionedList)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"VersionedList({len(self)} Einträge)"
+
+
+class BookVersion:
+    """
+    Ein Stand des Buches. added/removed sind die gegenüber der vorigen
+    Version neuen bzw. entfernten Kapitel (für Suchindex und Speicherbudget),
+    forward/inverse die Journal-Operationen zum Wiederholen bzw.
+    Rückgängigmachen (None: nicht als Operation darstellbar).
+    """
+
+    __slots__ = ("vector", "title", "author", "label", "added", "removed", "forward", "inverse", "cost")
+
+    def __init__(self, vector: PersistentVector, title: str, author: str, label: str,
+                 added: tuple = (), removed: tuple = (), forward: Optional[List] = None,
+                 inverse: Optional[List] = None):
+        self.vector = vector
+        self.title = title
+        self.author = author
+        self.label = label
+        self.added = added
+        self.removed = removed
+        self.forward = forward
+        self.inverse = inverse
+        # Geschätzter Speicher, der nur von dieser Version gehalten wird:
+        # neue Kapiteltexte plus die kopierten Knoten auf dem Pfad
+        self.cost = 256 + (_height(vector.root) + 1) * _BRANCH * 8 + sum(
+            len(chapter.title) + len(chapter.content) + len(chapter.image or "") for chapter in added
+        )
+
+
+class BookHistory:
+    """
+    Verlauf der Buchversionen mit begrenzter Tiefe und Speicherbudget.
+    Wird eines der Limits überschritten, fallen die ältesten Versionen weg.
+    """
+
+    def __init__(self, initial: BookVersion, depth: int = 100, max_bytes: int = 64 * 1024 * 1024):
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.versions: List[BookVersion] = [initial]
+        self.position = 0
+        self.bytes = initial.cost
+
+    @property
+    def current(self) -> BookVersion:
+        return self.versions[self.position]
+
+    def can_undo(self) -> bool:
+        return self.position > 0
+
+    def can_redo(self) -> bool:
+        return self.position < len(self.versions) - 1
+
+    def commit(self, version: BookVersion):
+        """Nimmt eine neue Version auf; verworfene Wiederholen-Schritte entfallen"""
+        for dropped in self.versions[self.position + 1:]:
+            self.bytes -= dropped.cost
+        del self.versions[self.position + 1:]
+        self.versions.append(version)
+        self.bytes += version.cost
+        self.position += 1
+        evict = 0
+        while (len(self.versions) - evict > self.depth + 1
+               or self.bytes > self.max_bytes and evict < self.position):
+            self.bytes -= self.versions[evict].cost
+            evict += 1
+        if evict:
+            del self.versions[:evict]
+            self.position -= evict
+
+    def undo(self) -> BookVersion:
+        """Geht eine Version zurück und gibt die rückgängig gemachte zurück"""
+        version = self.versions[self.position]
+        self.position -= 1
+        return version
+
+    def redo(self) -> BookVersion:
+        """Geht eine Version vor und gibt sie zurück"""
+        self.position += 1
+        return self.versions[self.position]
+
+    def undo_label(self) -> Optional[str]:
+        return self.current.label if self.can_undo() else None
+
+    def redo_label(self) -> Optional[str]:
+        return self.versions[self.position + 1].label if self.can_redo() else None
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Import von Kapiteln aus einem Verzeichnis mit Text- und Markdown-Dateien.
+
+Jede Datei wird zu einem Kapitel. Die Dateien werden nach Namen sortiert und
+parallel eingelesen; die Kapitel werden trotzdem in der richtigen
+Reihenfolge und blockweise geliefert, sodass nie das ganze Verzeichnis
+gleichzeitig im Speicher liegt.
+
+Markdown-Dateien:
+    - Eine erste Überschrift ``# Titel`` wird zum Kapiteltitel.
+    - Ein alleinstehendes Bild ``![Beschreibung](pfad.jpg)`` wird zum
+      Kapitelbild (relativ zur Datei aufgelöst).
+Ohne Überschrift wird der Dateiname als Titel verwendet.
+"""
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterator, Optional, Tuple
+
+CHAPTER_EXTENSIONS = (".md", ".markdown", ".txt")
+
+_HEADING_RE = re.compile(r"^#\s+(.+?)\s*#*\s*$")
+_IMAGE_RE = re.compile(r"^!\[[^\]]*\]\(\s*([^)\s]+)[^)]*\)\s*$")
+
+
+def parse_chapter_file(path: str) -> Tuple[str, str, Optional[str]]:
+    """Liest eine Kapiteldatei und gibt (Titel, Inhalt, Bild) zurück"""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        lines = f.read().splitlines()
+
+    title = None
+    image = None
+    is_markdown = not path.lower().endswith(".txt")
+    if is_markdown:
+        body = []
+        # Leerzeilen vor der Überschrift zählen nicht als Text
+        has_text = False
+        for line in lines:
+            stripped = line.strip()
+            if title is None and not has_text and stripped:
+                match = _HEADING_RE.match(stripped)
+                if match:
+                    title = match.group(1)
+                    continue
+            has_text = has_text or bool(stripped)
+            if image is None:
+                match = _IMAGE_RE.match(stripped)
+                if match:
+                    image = match.group(1)
+                    if "://" not in image and not os.path.isabs(image):
+                        image = os.path.normpath(os.path.join(os.path.dirname(path), image))
+                    continue
+            body.append(line)
+        lines = body
+
+    if title is None:
+        title = os.path.splitext(os.path.basename(path))[0].replace("_", " ").strip()
+    return title, "\n".join(lines).strip(), image
+
+
+def find_chapter_files(directory: str, extensions=CHAPTER_EXTENSIONS) -> list:
+    """Alle Kapiteldateien im Verzeichnis, nach Dateinamen sortiert"""
+    names = sorted(
+        entry.name for entry in os.scandir(directory)
+        if entry.is_file() and entry.name.lower().endswith(tuple(extensions))
+    )
+    return [os.path.join(directory, name) for name in names]
+
+
+def iter_chapter_files(directory: str, extensions=CHAPTER_EXTENSIONS, workers: int = None,
+                       use_processes: bool = True,
+                       batch_size: int = 256) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """
+    Liefert (Titel, Inhalt, Bild) für jede Kapiteldatei in Dateinamen-Reihenfolge.
+
+    Die Dateien werden in Blöcken von batch_size parallel eingelesen.
+    """
+    paths = find_chapter_files(directory, extensions)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) <= 1:
+        for path in paths:
+            yield parse_chapter_file(path)
+        return
+
+    pool_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    chunksize = max(1, batch_size // (workers * 4))
+    with pool_class(max_workers=workers) as pool:
+        for start in range(0, len(paths), batch_size):
+            batch = paths[start:start + batch_size]
+            yield from pool.map(parse_chapter_file, batch, chunksize=chunksize)
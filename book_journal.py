@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Append-only Journal für automatisches Speichern und Wiederherstellung.
+
+Jede Änderung am Buch wird als eine JSON-Zeile an ``<pfad>.journal``
+angehängt (O(1) pro Änderung). ``fsync`` wird gebündelt: nach
+``sync_every`` Einträgen oder spätestens nach ``sync_interval`` Sekunden
+beim nächsten Eintrag bzw. Aufruf von ``sync()``. Beim Verdichten wird das
+ganze Buch als Snapshot (``<pfad>.snapshot.json``) geschrieben und das
+Journal geleert. Beim Start wird der Snapshot geladen und das Journal
+darauf abgespielt (siehe InteractiveBook.open_journaled).
+
+Snapshot und Journal tragen eine Generation: jeder Snapshot zählt sie
+hoch, und die erste Zeile des Journals nennt die Generation des
+Snapshots, auf den seine Einträge aufsetzen. Stürzt das Programm ab,
+nachdem ein neuer Snapshot abgelegt, aber bevor das Journal geleert
+wurde, passen die Generationen nicht zusammen und die Einträge (die der
+Snapshot schon enthält) werden nicht noch einmal abgespielt.
+"""
+
+import json
+import os
+import time
+from typing import Callable, Dict, Iterator
+
+
+class BookJournal:
+    """Journal-Datei und Snapshot eines Buches"""
+
+    def __init__(self, path: str, sync_every: int = 64, sync_interval: float = 1.0):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.snapshot_path = path + ".snapshot.json"
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.entries = 0
+        # Generation des Snapshots, auf den die Journal-Einträge aufsetzen
+        self.generation = 0
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+            if self._file.tell() == 0:
+                self._file.write(self._header())
+
+    def _header(self) -> str:
+        return json.dumps({"generation": self.generation}) + "\n"
+
+    def has_data(self) -> bool:
+        """True, wenn es einen Snapshot oder Journal-Einträge gibt"""
+        if os.path.exists(self.snapshot_path):
+            return True
+        if not os.path.exists(self.journal_path):
+            return False
+        with open(self.journal_path, 'rb') as f:
+            # Die Kopfzeile allein zählt nicht
+            first = f.readline()
+            return b'"op"' in first or bool(f.readline())
+
+    def append(self, operation: Dict):
+        """Hängt eine Operation an das Journal an"""
+        self._open()
+        self._file.write(json.dumps(operation, ensure_ascii=False, separators=(',', ':')) + "\n")
+        self._file.flush()
+        self.entries += 1
+        self._pending += 1
+        if self._pending >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        """Schreibt ausstehende Einträge dauerhaft auf die Festplatte (fsync)"""
+        if self._file is not None and self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def read_operations(self) -> Iterator[Dict]:
+        """
+        Liest alle Operationen seit dem Snapshot der Generation
+        ``self.generation``. Eine unvollständige letzte Zeile (Absturz während
+        des Schreibens) wird abgeschnitten. Gehört das Journal zu einer
+        anderen Generation, sind seine Einträge nicht (mehr) gültig: es wird
+        ohne Abspielen geleert. Journale ohne Kopfzeile gelten als Generation 0.
+        """
+        if not os.path.exists(self.journal_path):
+            return
+        good_offset = 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    operation = json.loads(line.decode("utf-8"))
+                except ValueError:
+                    break
+                if "op" not in operation:
+                    if operation.get("generation") != self.generation:
+                        good_offset = -1
+                        break
+                    good_offset += len(line)
+                    continue
+                good_offset += len(line)
+                self.entries += 1
+                yield operation
+        if good_offset < 0:
+            self._truncate_journal()
+        elif good_offset < os.path.getsize(self.journal_path):
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(good_offset)
+
+    def write_snapshot(self, write: Callable):
+        """
+        Verdichtet das Journal: write(fileobj, generation) schreibt das ganze
+        Buch samt der neuen Generation als Snapshot, danach wird das Journal
+        geleert und auf die neue Generation umgestellt.
+        """
+        self.sync()
+        generation = self.generation + 1
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            write(f, generation)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        self.generation = generation
+        self._truncate_journal()
+
+    def _truncate_journal(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        with open(self.journal_path, 'w', encoding='utf-8') as f:
+            f.write(self._header())
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries = 0
+        self._pending = 0
+
+    def clear(self):
+        """Verwirft Snapshot und Journal (z.B. nach "Reset")"""
+        # Zuerst der Snapshot: ohne ihn gilt Generation 0, ein übrig
+        # gebliebenes Journal einer anderen Generation wird verworfen
+        if os.path.exists(self.snapshot_path):
+            os.remove(self.snapshot_path)
+        self.generation = 0
+        self._truncate_journal()
+
+    def close(self):
+        """Synchronisiert und schließt die Journal-Datei"""
+        self.sync()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
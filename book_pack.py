@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Gepacktes Buchformat (.kibook) mit wahlfreiem Zugriff auf einzelne Kapitel.
+
+Aufbau der Datei:
+
+    Kopf (40 Byte)   Magic, Version, Kompression, Kapitelanzahl,
+                     Offset des Index, Offset/Länge der Metadaten
+    Kapitel          jedes Kapitel einzeln komprimiertes JSON
+    Metadaten        JSON mit Titel, Autor, ...
+    Index            pro Kapitel (Offset: u64, Länge: u32), little endian
+
+Der Index hat Einträge fester Größe, daher kann Kapitel N über eine
+memory-mapped Datei in O(1) gelesen werden, ohne den Rest zu laden.
+"""
+
+import json
+import lzma
+import mmap
+import os
+import struct
+import zlib
+from typing import Callable, Dict, Iterable, Iterator
+
+MAGIC = b"KIBOOK"
+VERSION = 1
+HEADER = struct.Struct("<6sHBxxxQQQ")  # magic, version, compression, count, index, meta
+META_LENGTH = struct.Struct("<I")
+INDEX_ENTRY = struct.Struct("<QI")
+
+COMPRESSIONS = {"none": 0, "zlib": 1, "lzma": 2}
+# Rohes LZMA2 ohne xz-Container und mit kleinem Wörterbuch: Kapitel sind
+# einzeln komprimiert, Container-Kopf und großes Wörterbuch kosten sonst mehr
+# als sie sparen
+_LZMA_FILTERS = [{"id": lzma.FILTER_LZMA2, "preset": 6, "dict_size": 1 << 20}]
+_COMPRESS = {
+    0: lambda data: data,
+    1: lambda data: zlib.compress(data, 6),
+    2: lambda data: lzma.compress(data, format=lzma.FORMAT_RAW, filters=_LZMA_FILTERS),
+}
+_DECOMPRESS = {
+    0: lambda data: data,
+    1: zlib.decompress,
+    2: lambda data: lzma.decompress(data, format=lzma.FORMAT_RAW, filters=_LZMA_FILTERS),
+}
+
+
+def write_pack(filename: str, meta: Dict, chapters: Iterable[Dict], compression: str = "zlib") -> int:
+    """
+    Schreibt ein gepacktes Buch. ``chapters`` wird nur einmal durchlaufen,
+    es liegt also immer nur ein Kapitel gleichzeitig im Speicher.
+    Gibt die Anzahl der geschriebenen Kapitel zurück.
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unbekannte Kompression: {compression}")
+    method = COMPRESSIONS[compression]
+    compress = _COMPRESS[method]
+    index = bytearray()
+    count = 0
+
+    with open(filename + ".tmp", 'wb') as f:
+        f.write(b"\0" * (HEADER.size + META_LENGTH.size))
+        for chapter in chapters:
+            blob = compress(json.dumps(chapter, ensure_ascii=False, separators=(',', ':')).encode("utf-8"))
+            index += INDEX_ENTRY.pack(f.tell(), len(blob))
+            f.write(blob)
+            count += 1
+
+        meta_offset = f.tell()
+        meta_blob = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        f.write(meta_blob)
+        index_offset = f.tell()
+        f.write(index)
+
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, method, count, index_offset, meta_offset))
+        f.write(META_LENGTH.pack(len(meta_blob)))
+    os.replace(filename + ".tmp", filename)
+    return count
+
+
+class PackedBook:
+    """
+    Lesezugriff auf ein gepacktes Buch über eine memory-mapped Datei.
+
+    ``book[n]`` liest und entpackt nur Kapitel n. Mit ``chapter_factory``
+    lassen sich die Kapitel-Dictionaries direkt in eigene Objekte umwandeln.
+    """
+
+    def __init__(self, filename: str, chapter_factory: Callable[[Dict], object] = None):
+        self.filename = filename
+        self._factory = chapter_factory
+        self._file = open(filename, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Keine gültige Buchdatei: {filename}")
+
+        if len(self._map) < HEADER.size + META_LENGTH.size:
+            self.close()
+            raise ValueError(f"Keine gültige Buchdatei: {filename}")
+        magic, version, method, count, index_offset, meta_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Keine gültige Buchdatei: {filename}")
+        if version != VERSION or method not in _DECOMPRESS:
+            self.close()
+            raise ValueError(f"Nicht unterstützte Buchdatei (Version {version}): {filename}")
+        (meta_length,) = META_LENGTH.unpack_from(self._map, HEADER.size)
+
+        self._decompress = _DECOMPRESS[method]
+        self._count = count
+        self._index_offset = index_offset
+        self.meta: Dict = json.loads(self._map[meta_offset:meta_offset + meta_length].decode("utf-8"))
+
+    @property
+    def title(self) -> str:
+        return self.meta.get("title", "")
+
+    @property
+    def author(self) -> str:
+        return self.meta.get("author", "")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("Kapitelindex außerhalb des Buches")
+        offset, length = INDEX_ENTRY.unpack_from(self._map, self._index_offset + index * INDEX_ENTRY.size)
+        data = json.loads(self._decompress(self._map[offset:offset + length]).decode("utf-8"))
+        return self._factory(data) if self._factory else data
+
+    def __iter__(self) -> Iterator:
+        for index in range(self._count):
+            yield self[index]
+
+    def close(self):
+        """Gibt die memory-mapped Datei wieder frei"""
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self) -> "PackedBook":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
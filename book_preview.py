@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Lokaler Vorschau-Server für ein Buch im Speicher.
+
+Statt bei jeder Vorschau das ganze Buch als Datei zu exportieren, rendert
+der Server jede Seite erst beim Abruf direkt aus dem InteractiveBook:
+``/`` ist das Inhaltsverzeichnis, ``/<n>.html`` Kapitel n (wie beim
+Export ``pages``), ``/bild/<n>`` das Bild von Kapitel n. Die Antwortzeit
+hängt daher nicht von der Buchlänge ab.
+
+Der ETag einer Kapitelseite ist ein Hash ihrer Eingaben (Kapitel-Hash,
+Position, Nachbarn, Linkziele, Theme); ein Abruf mit passendem
+``If-None-Match`` wird ohne Rendern mit 304 beantwortet. Gerenderte Seiten
+liegen in einem LRU-Cache. Über ``/events`` (Server-Sent Events) meldet der
+Server jede Änderung am Buch; die Seite fragt dann mit ihrem ETag nach und
+lädt sich nur neu, wenn sich gerade sie geändert hat.
+
+Anfragen mit fremdem ``Host``-Header (z.B. über DNS-Rebinding von einer
+anderen Website) werden mit 403 abgelehnt; erlaubt sind nur die gebundene
+Adresse, ``127.0.0.1`` und ``localhost`` mit dem Port des Servers.
+
+    server = PreviewServer(book).start()
+    webbrowser.open(server.url)
+    ...
+    server.stop()
+"""
+
+import hashlib
+import mimetypes
+import os
+import threading
+import time
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from book_builder import InteractiveBook, _chapter_page, _toc_page
+
+# Wie oft der Server auf Änderungen am Buch prüft (Sekunden)
+POLL_INTERVAL = 0.25
+# Kommentarzeile, damit getrennte Verbindungen bemerkt werden (Sekunden)
+KEEPALIVE_INTERVAL = 15.0
+
+# Fragt bei jeder Änderung mit dem eigenen ETag nach und lädt nur bei 200 neu
+RELOAD_SCRIPT = """    <script>
+(function () {
+    var etag = %s;
+    var events = new EventSource("/events");
+    events.onmessage = function () {
+        fetch(location.href, {headers: {"If-None-Match": etag}, cache: "no-store"}).then(function (response) {
+            if (response.status === 200) { location.reload(); }
+        });
+    };
+})();
+    </script>
+"""
+
+
+def _page_href(index: int) -> str:
+    return f"{index}.html"
+
+
+class _Snapshot:
+    """Unveränderlicher Stand des Buches zu einer Revision"""
+
+    def __init__(self, book: InteractiveBook, revision: Tuple[int, int, str]):
+        self.revision = revision
+        self.book = book.copy()
+        self.theme = book.theme
+        self._positions: Optional[Dict[str, int]] = None
+        # Laufende Anfragen; ein abgelöster Stand wird nach der letzten geschlossen
+        self.users = 0
+        self.retired = False
+
+    def positions(self) -> Dict[str, int]:
+        # Erst bei der ersten Seite mit Auswahl-Links berechnen
+        if self._positions is None:
+            self._positions = self.book.chapter_positions()
+        return self._positions
+
+
+class PreviewServer:
+    """
+    HTTP-Server (Standardbibliothek) in einem Hintergrund-Thread. ``book``
+    darf jederzeit ersetzt werden, z.B. wenn die GUI ein anderes Buch öffnet.
+    Mit port=0 wählt das System einen freien Port (siehe ``url``).
+    """
+
+    def __init__(self, book: InteractiveBook, host: str = "127.0.0.1", port: int = 0,
+                 cache_pages: int = 256):
+        self.book = book
+        self.cache_pages = cache_pages
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+        self._stopped = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        server = self._httpd = ThreadingHTTPServer((host, port), _PreviewHandler)
+        server.daemon_threads = True
+        server.preview = self
+        self._thread: Optional[threading.Thread] = None
+        # Gegen DNS-Rebinding: nur Anfragen an die eigene Adresse beantworten
+        bound, port = server.server_address[:2]
+        names = {(f"[{bound}]" if ":" in bound else bound).lower(), "127.0.0.1", "localhost"}
+        self.allowed_hosts = {f"{name}:{port}" for name in names}
+        if port == 80:
+            # Browser lassen den Standard-Port weg
+            self.allowed_hosts |= names
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "PreviewServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        with self._lock:
+            snapshot, self._snapshot = self._snapshot, None
+            if snapshot is not None:
+                self._retire(snapshot)
+
+    def revision(self) -> Tuple[int, int, str]:
+        """Stand des Buches: Revision, Identität und Theme (ändert sich bei jeder Änderung)"""
+        book = self.book
+        theme = book.theme
+        if theme.directory:
+            # Geänderte Vorlagen-Dateien sollen ebenfalls neu laden
+            theme.refresh()
+        return (id(book), book.revision, theme.fingerprint)
+
+    def snapshot(self) -> _Snapshot:
+        """
+        Aktueller Stand; eine neue Kopie nur nach einer Änderung. Jeder
+        Aufruf muss mit release() abgeschlossen werden.
+        """
+        revision = self.revision()
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.revision != revision:
+                if snapshot is not None:
+                    self._retire(snapshot)
+                snapshot = self._snapshot = _Snapshot(self.book, revision)
+            snapshot.users += 1
+        return snapshot
+
+    def release(self, snapshot: _Snapshot):
+        with self._lock:
+            snapshot.users -= 1
+            if snapshot.retired and not snapshot.users:
+                snapshot.book.close()
+
+    def _retire(self, snapshot: _Snapshot):
+        # Die Kopie eines Datenbank-Buches hält eine Lesetransaktion offen
+        snapshot.retired = True
+        if not snapshot.users:
+            snapshot.book.close()
+
+    def _cached(self, etag: str, render) -> bytes:
+        with self._lock:
+            page = self._cache.get(etag)
+            if page is not None:
+                self._cache.move_to_end(etag)
+                self.hits += 1
+                return page
+        page = render().encode("utf-8")
+        with self._lock:
+            self.misses += 1
+            self._cache[etag] = page
+            while len(self._cache) > self.cache_pages:
+                self._cache.popitem(last=False)
+        return page
+
+    # --- Seiten ---
+
+    def index_page(self, snapshot: _Snapshot) -> Tuple[str, Callable[[], str]]:
+        """ETag und Render-Funktion des Inhaltsverzeichnisses"""
+        book = snapshot.book
+        etag = _etag("toc", snapshot.revision)
+
+        def render():
+            return "".join(_toc_page(snapshot.theme, book.title, book.author, book.chapter_titles(), _page_href))
+        return etag, render
+
+    def chapter_page(self, snapshot: _Snapshot, index: int) -> Tuple[str, Callable[[], str]]:
+        """ETag und Render-Funktion von Kapitel index (1-basiert)"""
+        book = snapshot.book
+        total = len(book.chapters)
+        chapter = book.chapters[index - 1]
+        links = {}
+        if chapter.choices:
+            positions = snapshot.positions()
+            links = {target: _page_href(positions[target] + 1)
+                     for _label, target in chapter.choices if target in positions}
+        if chapter.image and "://" not in chapter.image:
+            chapter = chapter.replace(image=f"bild/{index}")
+        etag = _etag("chapter", index, index < total, book.title, chapter.digest(),
+                     sorted(links.items()), snapshot.theme.fingerprint)
+
+        def render():
+            return _chapter_page(snapshot.theme, book.title, index, total, chapter, links, _page_href)
+        return etag, render
+
+    def page(self, snapshot: _Snapshot, etag: str, render) -> bytes:
+        """Gerenderte Seite mit eingebautem Neuladen (aus dem Cache, falls vorhanden)"""
+        def render_with_reload():
+            html = render()
+            script = RELOAD_SCRIPT % _js_string(etag)
+            position = html.rfind("</body>")
+            if position < 0:
+                return html + script
+            return html[:position] + script + html[position:]
+        return self._cached(etag, render_with_reload)
+
+    def image_path(self, snapshot: _Snapshot, index: int) -> Optional[str]:
+        image = snapshot.book.chapters[index - 1].image
+        return image if image and os.path.isfile(image) else None
+
+
+def _etag(*parts) -> str:
+    return '"' + hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def _js_string(text: str) -> str:
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+class _PreviewHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        preview: PreviewServer = self.server.preview
+        if self.headers.get("Host", "").lower() not in preview.allowed_hosts:
+            self._send(HTTPStatus.FORBIDDEN, b"Unbekannter Host", "text/plain; charset=utf-8")
+            return
+        path = urlsplit(self.path).path
+        if path == "/events":
+            self._events(preview)
+            return
+        snapshot = preview.snapshot()
+        try:
+            self._get(preview, snapshot, path)
+        finally:
+            preview.release(snapshot)
+
+    def _get(self, preview: PreviewServer, snapshot: _Snapshot, path: str):
+        try:
+            if path in ("/", "/index.html"):
+                etag, render = preview.index_page(snapshot)
+            elif path.startswith("/bild/"):
+                self._image(preview.image_path(snapshot, _page_number(path[len("/bild/"):], snapshot)))
+                return
+            else:
+                name = path.lstrip("/")
+                if not name.endswith(".html"):
+                    raise LookupError(path)
+                etag, render = preview.chapter_page(snapshot, _page_number(name[:-len(".html")], snapshot))
+        except LookupError:
+            self._send(HTTPStatus.NOT_FOUND, b"Nicht gefunden", "text/plain; charset=utf-8")
+            return
+        if etag in self._if_none_match():
+            preview.not_modified += 1
+            self._send(HTTPStatus.NOT_MODIFIED, b"", None, etag)
+            return
+        self._send(HTTPStatus.OK, preview.page(snapshot, etag, render), "text/html; charset=utf-8", etag)
+
+    def _if_none_match(self) -> set:
+        header = self.headers.get("If-None-Match", "")
+        tags = (tag.strip() for tag in header.split(","))
+        return {tag[2:] if tag.startswith("W/") else tag for tag in tags if tag}
+
+    def _send(self, status: HTTPStatus, body: bytes, content_type: Optional[str], etag: str = None):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        if etag:
+            self.send_header("ETag", etag)
+            # Immer nachfragen: die Antwort ist dann meist ein leeres 304
+            self.send_header("Cache-Control", "no-cache")
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _image(self, path: Optional[str]):
+        if path is None:
+            self._send(HTTPStatus.NOT_FOUND, b"Nicht gefunden", "text/plain; charset=utf-8")
+            return
+        stat = os.stat(path)
+        etag = _etag("image", os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if etag in self._if_none_match():
+            self._send(HTTPStatus.NOT_MODIFIED, b"", None, etag)
+            return
+        with open(path, 'rb') as f:
+            body = f.read()
+        self._send(HTTPStatus.OK, body, mimetypes.guess_type(path)[0] or "application/octet-stream", etag)
+
+    def _events(self, preview: PreviewServer):
+        """Server-Sent Events: eine Nachricht pro Änderung am Buch"""
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.close_connection = True
+        last = preview.revision()
+        idle = 0.0
+        try:
+            while not preview._stopped.wait(POLL_INTERVAL):
+                revision = preview.revision()
+                if revision != last:
+                    last = revision
+                    self.wfile.write(f"data: {revision[1]}\n\n".encode("utf-8"))
+                    idle = 0.0
+                elif idle >= KEEPALIVE_INTERVAL:
+                    self.wfile.write(b": ping\n\n")
+                    idle = 0.0
+                else:
+                    idle += POLL_INTERVAL
+                    continue
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    do_HEAD = do_GET
+
+
+def _page_number(text: str, snapshot: _Snapshot) -> int:
+    """Kapitelnummer aus der URL (LookupError, wenn es das Kapitel nicht gibt)"""
+    if not text.isdigit() or not 1 <= int(text) <= len(snapshot.book.chapters):
+        raise LookupError(text)
+    return int(text)
+
+
+def main():
+    import argparse
+    import webbrowser
+
+    parser = argparse.ArgumentParser(description="Zeigt ein Buch (JSON) im Browser an und lädt bei Änderungen neu.")
+    parser.add_argument("book", help="Buch im JSON-Format")
+    parser.add_argument("--port", type=int, default=8000, help="Port (Standard: 8000, 0 = frei wählen)")
+    parser.add_argument("--no-browser", action="store_true", help="keinen Browser öffnen")
+    args = parser.parse_args()
+
+    server = PreviewServer(InteractiveBook.load_from_json(args.book), port=args.port).start()
+    print(f"Vorschau unter {server.url} (Strg+C beendet)")
+    if not args.no_browser:
+        webbrowser.open(server.url)
+    mtime = os.stat(args.book).st_mtime_ns
+    try:
+        while True:
+            time.sleep(1.0)
+            # Die Datei wurde neu gespeichert: Buch neu laden, Seiten melden sich selbst
+            current = os.stat(args.book).st_mtime_ns
+            if current != mtime:
+                mtime = current
+                try:
+                    server.book = InteractiveBook.load_from_json(args.book)
+                except (OSError, ValueError) as e:
+                    print(f"Warnung: {e}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
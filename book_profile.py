@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Profiling von Build und Export: Zeitspannen und Zähler pro Stufe.
+
+Die Stufen (Kapitel aufnehmen, Kapitel rendern, Serialisieren, Schreiben,
+Assets) melden Ereignisse im Chrome-Trace-Format an eine austauschbare
+Senke ``sink`` (ein Callable, das ein Dictionary erhält). Ohne Senke kostet
+eine Messstelle nur eine Abfrage von ``book_profile.sink``; ``span()``
+liefert dann ein gemeinsames Objekt ohne Wirkung.
+
+    from book_profile import recording
+
+    with recording() as trace:
+        book.save_to_html("buch.html")
+    trace.write("trace.json")      # in chrome://tracing oder Perfetto öffnen
+    print(trace.summary())
+
+Ereignisse: ``{"ph": "X"}`` für Zeitspannen (ts/dur in Mikrosekunden),
+``{"ph": "C"}`` für Zähler (laufende Summe).
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# Aktive Senke; None schaltet das Profiling ab
+sink: Optional[Callable[[Dict], None]] = None
+_counters: Dict[str, float] = {}
+
+
+def now() -> int:
+    """Zeitstempel in Mikrosekunden (monoton)"""
+    return time.perf_counter_ns() // 1000
+
+
+def set_sink(callback: Optional[Callable[[Dict], None]]) -> Optional[Callable[[Dict], None]]:
+    """Setzt die Senke (None = aus) und gibt die bisherige zurück"""
+    global sink
+    previous, sink = sink, callback
+    if previous is None:
+        # Zähler beginnen mit jeder neuen Aufzeichnung bei null
+        _counters.clear()
+    return previous
+
+
+def complete(stage: str, started: int, **args):
+    """Meldet eine Zeitspanne der Stufe stage von started (siehe now()) bis jetzt"""
+    if sink is None:
+        return
+    ts = now()
+    sink({"name": stage, "ph": "X", "ts": started, "dur": ts - started,
+          "pid": os.getpid(), "tid": threading.get_ident(), "args": args})
+
+
+def count(name: str, value: float = 1):
+    """Erhöht einen Zähler und meldet die neue Summe"""
+    if sink is None:
+        return
+    total = _counters[name] = _counters.get(name, 0) + value
+    sink({"name": name, "ph": "C", "ts": now(), "pid": os.getpid(), "args": {name: total}})
+
+
+class _Span:
+    __slots__ = ("name", "args", "started")
+
+    def __init__(self, name: str, args: Dict):
+        self.name = name
+        self.args = args
+
+    def __enter__(self) -> "_Span":
+        self.started = now()
+        return self
+
+    def __exit__(self, *exc_info):
+        complete(self.name, self.started, **self.args)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(stage: str, **args):
+    """Kontextmanager, der die Dauer des Blocks meldet (ohne Senke wirkungslos)"""
+    if sink is None:
+        return _NULL_SPAN
+    return _Span(stage, args)
+
+
+class TimedWriter:
+    """
+    Datei-Hülle, die die Zeit in write() summiert. report() meldet sie als
+    eine Spanne "file_write" (Summe aller Aufrufe, beginnend beim ersten).
+    """
+
+    __slots__ = ("fileobj", "first", "elapsed", "calls", "chars")
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.first = None
+        self.elapsed = 0
+        self.calls = 0
+        self.chars = 0
+
+    def write(self, data: str):
+        started = now()
+        if self.first is None:
+            self.first = started
+        self.fileobj.write(data)
+        self.elapsed += now() - started
+        self.calls += 1
+        self.chars += len(data)
+
+    def report(self, **args):
+        if sink is None or self.first is None:
+            return
+        sink({"name": "file_write", "ph": "X", "ts": self.first, "dur": self.elapsed,
+              "pid": os.getpid(), "tid": threading.get_ident(),
+              "args": dict(args, calls=self.calls, chars=self.chars)})
+
+
+class TraceRecorder:
+    """Senke, die alle Ereignisse sammelt und als Chrome-Trace schreibt"""
+
+    def __init__(self):
+        self.events: List[Dict] = []
+
+    def __call__(self, event: Dict):
+        self.events.append(event)
+
+    def extend(self, events: List[Dict]):
+        """Übernimmt Ereignisse aus einem anderen Prozess"""
+        self.events.extend(events)
+
+    def write(self, filename: str):
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+    def summary(self, top: int = 10) -> str:
+        """Gesamtzeit pro Stufe und die langsamsten einzelnen Spannen"""
+        spans = [event for event in self.events if event["ph"] == "X"]
+        stages: Dict[str, List[int]] = {}
+        for event in spans:
+            stages.setdefault(event["name"], []).append(event["dur"])
+        width = max([len("Stufe")] + [len(name) for name in stages])
+        lines = [f"{'Stufe':<{width}}  {'Anzahl':>7}  {'Summe (ms)':>11}  {'Max (ms)':>9}"]
+        for name, durations in sorted(stages.items(), key=lambda item: -sum(item[1])):
+            lines.append(f"{name:<{width}}  {len(durations):>7}  {sum(durations) / 1000:>11.2f}"
+                         f"  {max(durations) / 1000:>9.2f}")
+        slowest = sorted(spans, key=lambda event: -event["dur"])[:top]
+        if slowest:
+            lines.append("\nLangsamste Spannen:")
+            for event in slowest:
+                details = ", ".join(f"{key}={value}" for key, value in event["args"].items())
+                lines.append(f"  {event['dur'] / 1000:9.2f} ms  {event['name']}" + (f" ({details})" if details else ""))
+        return "\n".join(lines)
+
+
+@contextmanager
+def recording(recorder: TraceRecorder = None):
+    """Zeichnet im Block alle Ereignisse in einem TraceRecorder auf"""
+    recorder = recorder if recorder is not None else TraceRecorder()
+    previous = set_sink(recorder)
+    try:
+        yield recorder
+    finally:
+        set_sink(previous)
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Volltextsuche über die Kapitel eines Buches.
+
+Der invertierte Index speichert pro Wort die Dokumente und die Wortpositionen
+darin. Dokumente werden über einen frei wählbaren Schlüssel angesprochen
+(InteractiveBook verwendet den Inhalts-Hash des Kapitels), sodass sich der
+Index beim Hinzufügen, Ändern und Entfernen von Kapiteln inkrementell
+aktualisieren und neben dem Buch speichern lässt.
+
+Suchanfragen:
+    wort            Kapitel, die das Wort enthalten
+    wor*            Präfixsuche
+    "zwei worte"    Phrasensuche (Wörter direkt hintereinander)
+Mehrere Teile werden UND-verknüpft, das Ergebnis ist nach BM25 sortiert.
+"""
+
+import bisect
+import json
+import math
+import re
+from typing import Dict, Iterable, List, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+_QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+# BM25-Parameter
+_K1 = 1.2
+_B = 0.75
+
+# Kleines Suchskript für den HTML-Export; BOOK_SEARCH kommt aus der Index-Datei
+SEARCH_SCRIPT = """<script>
+(function () {
+    var data = window.BOOK_SEARCH, input = document.getElementById("book-search"),
+        out = document.getElementById("book-search-results");
+    if (!data || !input) { return; }
+    function lower(terms, prefix) {
+        var lo = 0, hi = terms.length;
+        while (lo < hi) { var mid = (lo + hi) >> 1; if (terms[mid] < prefix) { lo = mid + 1; } else { hi = mid; } }
+        return lo;
+    }
+    function lookup(word, prefix) {
+        var hits = {}, i = lower(data.terms, word);
+        for (; i < data.terms.length; i++) {
+            var term = data.terms[i];
+            if (prefix ? term.lastIndexOf(word, 0) !== 0 : term !== word) { break; }
+            var postings = data.postings[i], idf = Math.log(1 + data.count / (postings.length / 2));
+            for (var j = 0; j < postings.length; j += 2) {
+                hits[postings[j]] = (hits[postings[j]] || 0) + postings[j + 1] * idf;
+            }
+        }
+        return hits;
+    }
+    input.addEventListener("input", function () {
+        var words = input.value.toLowerCase().match(/[\\p{L}\\p{N}_]+/gu) || [], scores = null;
+        words.forEach(function (word, n) {
+            var hits = lookup(word, n === words.length - 1), next = {};
+            for (var doc in hits) { if (!scores || doc in scores) { next[doc] = (scores ? scores[doc] : 0) + hits[doc]; } }
+            scores = next;
+        });
+        out.innerHTML = "";
+        Object.keys(scores || {}).sort(function (a, b) { return scores[b] - scores[a]; }).slice(0, 20)
+            .forEach(function (doc) {
+                var item = document.createElement("li"), link = document.createElement("a");
+                link.href = "#kapitel-" + doc;
+                link.textContent = "Kapitel " + doc + ": " + data.titles[doc - 1];
+                item.appendChild(link);
+                out.appendChild(item);
+            });
+    });
+})();
+</script>
+"""
+
+
+def tokenize(text: str) -> List[str]:
+    """Zerlegt einen Text in kleingeschriebene Wörter"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class SearchIndex:
+    """Invertierter Index mit Wortpositionen"""
+
+    VERSION = 1
+
+    def __init__(self):
+        # Wort -> {Schlüssel: [Positionen]}
+        self.postings: Dict[str, Dict[str, List[int]]] = {}
+        # Schlüssel -> Anzahl Wörter; Referenzzähler für identische Kapitel
+        self.lengths: Dict[str, int] = {}
+        self.refcounts: Dict[str, int] = {}
+        self._total_length = 0
+        self._sorted_terms: List[str] = None
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.lengths
+
+    def add(self, key: str, text: str):
+        """Nimmt ein Dokument in den Index auf (mehrfaches Hinzufügen wird gezählt)"""
+        if key in self.refcounts:
+            self.refcounts[key] += 1
+            return
+        self.refcounts[key] = 1
+        tokens = tokenize(text)
+        for position, token in enumerate(tokens):
+            docs = self.postings.get(token)
+            if docs is None:
+                docs = self.postings[token] = {}
+                self._sorted_terms = None
+            docs.setdefault(key, []).append(position)
+        self.lengths[key] = len(tokens)
+        self._total_length += len(tokens)
+
+    def remove(self, key: str, text: str):
+        """Entfernt ein Dokument wieder (text muss dem indizierten Text entsprechen)"""
+        count = self.refcounts.get(key)
+        if count is None:
+            return
+        if count > 1:
+            self.refcounts[key] = count - 1
+            return
+        del self.refcounts[key]
+        self._total_length -= self.lengths.pop(key)
+        for token in set(tokenize(text)):
+            docs = self.postings.get(token)
+            if docs is None:
+                continue
+            docs.pop(key, None)
+            if not docs:
+                del self.postings[token]
+                self._sorted_terms = None
+
+    def _terms_with_prefix(self, prefix: str) -> List[str]:
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        terms = self._sorted_terms
+        start = bisect.bisect_left(terms, prefix)
+        end = start
+        while end < len(terms) and terms[end].startswith(prefix):
+            end += 1
+        return terms[start:end]
+
+    def _idf(self, doc_count: int) -> float:
+        total = len(self.lengths)
+        return math.log(1 + (total - doc_count + 0.5) / (doc_count + 0.5))
+
+    def _term_scores(self, term: str) -> Dict[str, float]:
+        docs = self.postings.get(term, {})
+        idf = self._idf(len(docs))
+        average = self._total_length / len(self.lengths) if self.lengths else 1
+        scores = {}
+        for key, positions in docs.items():
+            tf = len(positions)
+            norm = _K1 * (1 - _B + _B * self.lengths[key] / average)
+            scores[key] = idf * tf * (_K1 + 1) / (tf + norm)
+        return scores
+
+    def _phrase_scores(self, words: List[str]) -> Dict[str, float]:
+        candidates = None
+        for word in words:
+            docs = set(self.postings.get(word, ()))
+            candidates = docs if candidates is None else candidates & docs
+        scores = {}
+        for key in candidates or ():
+            following = [set(self.postings[word][key]) for word in words[1:]]
+            matches = sum(
+                1 for start in self.postings[words[0]][key]
+                if all(start + offset in positions for offset, positions in enumerate(following, 1))
+            )
+            if matches:
+                scores[key] = matches
+        if scores:
+            # Phrasen wie ein seltenes, zusammengesetztes Wort gewichten
+            boost = sum(self._idf(len(self.postings[word])) for word in words)
+            scores = {key: boost * count for key, count in scores.items()}
+        return scores
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """Sucht nach query und gibt (Schlüssel, Punktzahl) absteigend sortiert zurück"""
+        result = None
+        for phrase, word in _QUERY_RE.findall(query):
+            if phrase:
+                words = tokenize(phrase)
+                if not words:
+                    continue
+                scores = self._phrase_scores(words) if len(words) > 1 else self._term_scores(words[0])
+            elif word.endswith("*"):
+                scores = {}
+                for prefix in tokenize(word[:-1])[:1]:
+                    for term in self._terms_with_prefix(prefix):
+                        for key, score in self._term_scores(term).items():
+                            scores[key] = scores.get(key, 0.0) + score
+            else:
+                words = tokenize(word)
+                if not words:
+                    continue
+                # Zusammengesetzte Eingaben wie "e-mail" als Phrase behandeln
+                scores = self._phrase_scores(words) if len(words) > 1 else self._term_scores(words[0])
+            if result is None:
+                result = scores
+            else:
+                result = {key: result[key] + score for key, score in scores.items() if key in result}
+        if not result:
+            return []
+        return sorted(result.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def save(self, filename: str):
+        """Speichert den Index als JSON-Datei"""
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump({
+                "version": self.VERSION,
+                "postings": self.postings,
+                "lengths": self.lengths,
+                "refcounts": self.refcounts,
+            }, f, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, filename: str) -> "SearchIndex":
+        """Lädt einen gespeicherten Index (ValueError bei falscher Version)"""
+        with open(filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != cls.VERSION:
+            raise ValueError(f"Nicht unterstützte Indexversion in {filename}")
+        index = cls()
+        index.postings = data["postings"]
+        index.lengths = data["lengths"]
+        index.refcounts = data["refcounts"]
+        index._total_length = sum(index.lengths.values())
+        return index
+
+    def retain(self, keys: Iterable[str]):
+        """Entfernt alle Dokumente, deren Schlüssel nicht in keys vorkommt"""
+        keep = set(keys)
+        stale = [key for key in self.lengths if key not in keep]
+        if not stale:
+            return
+        stale = set(stale)
+        for key in stale:
+            self._total_length -= self.lengths.pop(key)
+            del self.refcounts[key]
+        for token in list(self.postings):
+            docs = self.postings[token]
+            for key in stale.intersection(docs):
+                del docs[key]
+            if not docs:
+                del self.postings[token]
+        self._sorted_terms = None
+
+    def export_shard(self, fileobj, keys: List[str], titles: List[str]):
+        """
+        Schreibt einen kompakten Index für die Suche im Browser als JavaScript
+        (``window.BOOK_SEARCH = {...}``). keys[i] ist der Schlüssel von
+        Kapitel i + 1; gespeichert werden nur Kapitelnummer und Worthäufigkeit.
+        """
+        numbers: Dict[str, List[int]] = {}
+        for number, key in enumerate(keys, 1):
+            numbers.setdefault(key, []).append(number)
+        terms = sorted(self.postings)
+        postings = []
+        for term in terms:
+            flat = []
+            for key, positions in self.postings[term].items():
+                for number in numbers.get(key, ()):
+                    flat.extend((number, len(positions)))
+            postings.append(flat)
+        data = {"count": len(keys), "titles": titles, "terms": terms, "postings": postings}
+        fileobj.write("window.BOOK_SEARCH = ")
+        json.dump(data, fileobj, ensure_ascii=False, separators=(',', ':'))
+        fileobj.write(";\n")
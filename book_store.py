@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Kapitel in einer SQLite-Datenbank (.kidb) für Bücher, die nicht in den
+Arbeitsspeicher passen.
+
+Im Speicher liegen nur zwei kompakte Arrays: die Zeilen-ID und der
+Sortierschlüssel jedes Kapitels (16 Byte pro Kapitel). Titel, Texte und
+Bilder bleiben in der Datenbank; ``store[n]`` liest genau ein Kapitel,
+Iteration liest die Kapitel über einen Cursor der Reihe nach, sodass
+Exporte direkt aus der Datenbank streamen.
+
+Die Reihenfolge steht in der indizierten Spalte ``rank``. Neue Kapitel
+erhalten einen Rang mit Abstand (RANK_GAP) zu den Nachbarn, Einfügen und
+Verschieben ändern also nur eine Zeile; erst wenn eine Lücke aufgebraucht
+ist, werden alle Ränge in einer Transaktion neu verteilt. Viele Kapitel
+werden blockweise (batch_size) in einer einzigen Transaktion eingefügt.
+
+    store = ChapterStore("buch.kidb", chapter_factory=...)
+    store.extend(kapitel)          # eine Transaktion
+    for chapter in store: ...      # streamt aus der Datenbank
+"""
+
+import json
+import os
+import sqlite3
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableSequence, Sequence
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+SCHEMA_VERSION = 1
+# Abstand zwischen den Rängen benachbarter Kapitel
+RANK_GAP = 1 << 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS chapters (
+    rowid INTEGER PRIMARY KEY,
+    rank INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    image TEXT,
+    chapter_id TEXT,
+    choices TEXT,
+    digest TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chapters_rank ON chapters (rank);
+"""
+_COLUMNS = "title, content, image, chapter_id, choices, digest"
+_INSERT = "INSERT INTO chapters (rowid, rank, " + _COLUMNS + ") VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+
+def _row_values(chapter) -> tuple:
+    """Spaltenwerte eines Kapitels (ohne rowid und rank)"""
+    choices = json.dumps([list(choice) for choice in chapter.choices], ensure_ascii=False) if chapter.choices else None
+    return (chapter.title, chapter.content, chapter.image, chapter.id, choices, chapter.digest())
+
+
+def _default_factory(title: str, content: str, image: Optional[str], chapter_id: Optional[str],
+                     choices: tuple, digest: str) -> Dict:
+    return {"title": title, "content": content, "image": image, "id": chapter_id, "choices": choices}
+
+
+def _configure(db: sqlite3.Connection):
+    # WAL: Leser (z.B. ein Export im Hintergrund) sehen einen festen Stand,
+    # während weiter geschrieben wird
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+
+
+class StoreView(Sequence):
+    """
+    Lesender Zugriff auf die Kapitel einer Datenbank. ``chapter_factory``
+    erhält (Titel, Inhalt, Bild, ID, Auswahl, Hash) und erzeugt das
+    Kapitel-Objekt; ohne Factory werden Dictionaries geliefert.
+    """
+
+    def __init__(self, db: sqlite3.Connection, rows: array, ranks: array,
+                 chapter_factory: Callable = None, cache_size: int = 64):
+        self._db = db
+        self._rows = rows
+        self._ranks = ranks
+        self._factory = chapter_factory or _default_factory
+        self._cache: "OrderedDict[int, object]" = OrderedDict()
+        self.cache_size = cache_size
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _make(self, row: tuple):
+        title, content, image, chapter_id, choices, digest = row
+        choices = tuple(tuple(choice) for choice in json.loads(choices)) if choices else ()
+        return self._factory(title, content, image, chapter_id, choices, digest)
+
+    def _load(self, rowid: int):
+        """Liest ein Kapitel (zuletzt gelesene aus einem kleinen LRU-Cache)"""
+        chapter = self._cache.get(rowid)
+        if chapter is not None:
+            self._cache.move_to_end(rowid)
+            return chapter
+        row = self._db.execute("SELECT " + _COLUMNS + " FROM chapters WHERE rowid = ?", (rowid,)).fetchone()
+        chapter = self._make(row)
+        self._cache[rowid] = chapter
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return chapter
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._rows))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return list(self.iter_from(start, stop))
+        return self._load(self._rows[index])
+
+    def __iter__(self) -> Iterator:
+        return self.iter_from(0)
+
+    def iter_from(self, start: int, stop: int = None) -> Iterator:
+        """Streamt die Kapitel start..stop über einen Cursor in Rang-Reihenfolge"""
+        stop = len(self._rows) if stop is None else min(stop, len(self._rows))
+        if start >= stop:
+            return
+        cursor = self._db.execute(
+            "SELECT " + _COLUMNS + " FROM chapters WHERE rank >= ? ORDER BY rank LIMIT ?",
+            (self._ranks[start], stop - start),
+        )
+        make = self._make
+        for row in cursor:
+            yield make(row)
+
+    def _column(self, name: str) -> Iterator:
+        for (value,) in self._db.execute(f"SELECT {name} FROM chapters ORDER BY rank"):
+            yield value
+
+    def titles(self) -> Iterator[str]:
+        """Alle Kapiteltitel in Reihenfolge, ohne die Texte zu lesen"""
+        return self._column("title")
+
+    def digests(self) -> Iterator[str]:
+        """Alle Inhalts-Hashes in Reihenfolge, ohne die Texte zu lesen"""
+        return self._column("digest")
+
+    def ids(self) -> Iterator[Optional[str]]:
+        """Alle Kapitel-IDs (verzweigte Geschichten) in Reihenfolge"""
+        return self._column("chapter_id")
+
+    def close(self):
+        """Schließt die Verbindung (bei einem Snapshot endet damit die Lesetransaktion)"""
+        self._db.close()
+
+    def __enter__(self) -> "StoreView":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ChapterStore(StoreView, MutableSequence):
+    """
+    Veränderbare Kapitelliste in einer SQLite-Datei. Jede Änderung ist
+    sofort dauerhaft gespeichert (eine Transaktion pro Aufruf).
+
+    Gelesene Kapitel sind Kopien: ein direkt geändertes Kapitel-Objekt muss
+    per ``store[n] = kapitel`` zurückgeschrieben werden.
+    """
+
+    def __init__(self, path: str, chapter_factory: Callable = None, cache_size: int = 64,
+                 batch_size: int = 1000):
+        self.path = path
+        self.batch_size = batch_size
+        db = sqlite3.connect(path)
+        try:
+            _configure(db)
+            with db:
+                db.executescript(_SCHEMA)
+                version = db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+                if version is None:
+                    db.execute("INSERT INTO meta VALUES ('version', ?)", (str(SCHEMA_VERSION),))
+        except sqlite3.DatabaseError:
+            db.close()
+            raise ValueError(f"Keine gültige Buch-Datenbank: {path}")
+        if version is not None and int(version[0]) != SCHEMA_VERSION:
+            db.close()
+            raise ValueError(f"Nicht unterstützte Buch-Datenbank (Version {version[0]}): {path}")
+        rows = array("q")
+        ranks = array("q")
+        for rowid, rank in db.execute("SELECT rowid, rank FROM chapters ORDER BY rank"):
+            rows.append(rowid)
+            ranks.append(rank)
+        super().__init__(db, rows, ranks, chapter_factory, cache_size)
+        self._next_rowid = (max(rows) if rows else 0) + 1
+
+    # --- Metadaten (Titel, Autor, ...) ---
+
+    def get_meta(self, key: str, default: str = None) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, **values: str):
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", values.items())
+
+    # --- Änderungen ---
+
+    def _rank_at(self, index: int) -> Tuple[int, Optional[array]]:
+        """
+        Rang für ein neues Kapitel vor Position index. Ist die Lücke voll,
+        werden alle Ränge neu verteilt; die neuen Ränge werden dann mit
+        zurückgegeben. Muss in der Transaktion des Aufrufers laufen, damit
+        Neuverteilung und Schreiben des Kapitels gemeinsam gelingen.
+        """
+        ranks = self._ranks
+        if index >= len(ranks):
+            return (ranks[-1] if ranks else 0) + RANK_GAP, None
+        if index == 0:
+            return ranks[0] - RANK_GAP, None
+        low, high = ranks[index - 1], ranks[index]
+        if high - low >= 2:
+            return (low + high) // 2, None
+        ranks = self._respace()
+        return (ranks[index - 1] + ranks[index]) // 2, ranks
+
+    def _respace(self) -> array:
+        """Verteilt alle Ränge gleichmäßig neu (selten: erst wenn eine Lücke voll ist)"""
+        ranks = array("q", range(RANK_GAP, (len(self._rows) + 1) * RANK_GAP, RANK_GAP))
+        self._db.executemany("UPDATE chapters SET rank = ? WHERE rowid = ?", zip(ranks, self._rows))
+        return ranks
+
+    def insert(self, index: int, chapter):
+        size = len(self._rows)
+        # Wie list.insert: Positionen außerhalb werden an den Rand gelegt
+        index = min(max(index + size if index < 0 else index, 0), size)
+        rowid = self._next_rowid
+        with self._db:
+            rank, respaced = self._rank_at(index)
+            self._db.execute(_INSERT, (rowid, rank) + _row_values(chapter))
+        # Erst nach dem Commit übernehmen, damit ein Fehler nichts halb ändert
+        if respaced is not None:
+            self._ranks = respaced
+        self._next_rowid += 1
+        self._rows.insert(index, rowid)
+        self._ranks.insert(index, rank)
+
+    def append(self, chapter):
+        self.insert(len(self._rows), chapter)
+
+    def extend(self, chapters: Iterable):
+        """
+        Hängt viele Kapitel in einer einzigen Transaktion an. Die Eingabe
+        wird blockweise (batch_size) gelesen und mit executemany geschrieben,
+        ein Generator wird also nie vollständig im Speicher gehalten.
+        """
+        if chapters is self:
+            chapters = list(chapters)
+        rowid = self._next_rowid
+        rank = self._ranks[-1] if self._ranks else 0
+        new_rows = array("q")
+        new_ranks = array("q")
+        iterator = iter(chapters)
+        with self._db:
+            while True:
+                batch = []
+                for chapter in islice(iterator, self.batch_size):
+                    rank += RANK_GAP
+                    batch.append((rowid, rank) + _row_values(chapter))
+                    new_rows.append(rowid)
+                    new_ranks.append(rank)
+                    rowid += 1
+                if not batch:
+                    break
+                self._db.executemany(_INSERT, batch)
+        # Erst nach dem Commit übernehmen, damit ein Fehler nichts halb ändert
+        self._next_rowid = rowid
+        self._rows.extend(new_rows)
+        self._ranks.extend(new_ranks)
+
+    def __setitem__(self, index, chapter):
+        if isinstance(index, slice):
+            raise TypeError("ChapterStore unterstützt keine Zuweisung an Bereiche")
+        rowid = self._rows[index]
+        with self._db:
+            self._db.execute("UPDATE chapters SET title = ?, content = ?, image = ?, chapter_id = ?, "
+                             "choices = ?, digest = ? WHERE rowid = ?", _row_values(chapter) + (rowid,))
+        self._cache.pop(rowid, None)
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._rows))
+            positions = range(start, stop, step)
+        else:
+            positions = [range(len(self._rows))[index]]
+        rowids = [self._rows[i] for i in positions]
+        if not rowids:
+            return
+        with self._db:
+            self._db.executemany("DELETE FROM chapters WHERE rowid = ?", ((rowid,) for rowid in rowids))
+        for rowid in rowids:
+            self._cache.pop(rowid, None)
+        if isinstance(index, slice):
+            del self._rows[index]
+            del self._ranks[index]
+        else:
+            del self._rows[positions[0]]
+            del self._ranks[positions[0]]
+
+    def move(self, source: int, target: int):
+        """Verschiebt ein Kapitel, indem nur sein Rang geändert wird (Inhalt bleibt liegen)"""
+        source = range(len(self._rows))[source]
+        rowid = self._rows.pop(source)
+        old_rank = self._ranks.pop(source)
+        size = len(self._rows)
+        target = min(max(target + size if target < 0 else target, 0), size)
+        try:
+            with self._db:
+                rank, respaced = self._rank_at(target)
+                self._db.execute("UPDATE chapters SET rank = ? WHERE rowid = ?", (rank, rowid))
+        except BaseException:
+            # Transaktion zurückgerollt: alte Position wiederherstellen
+            self._rows.insert(source, rowid)
+            self._ranks.insert(source, old_rank)
+            raise
+        if respaced is not None:
+            self._ranks = respaced
+        self._rows.insert(target, rowid)
+        self._ranks.insert(target, rank)
+
+    def clear(self):
+        with self._db:
+            self._db.execute("DELETE FROM chapters")
+        self._rows = array("q")
+        self._ranks = array("q")
+        self._cache.clear()
+
+    def snapshot(self) -> Sequence:
+        """
+        Unveränderlicher Stand für Exporte in einem anderen Thread: eine
+        eigene Verbindung in einer offenen Lesetransaktion, die spätere
+        Änderungen nicht sieht. Bei ``:memory:`` wird eine Liste kopiert.
+
+        Der Snapshot muss mit close() (oder als Kontextmanager) geschlossen
+        werden: solange die Lesetransaktion offen ist, kann SQLite das WAL
+        nicht zurückschreiben und die ``-wal``-Datei wächst weiter.
+        """
+        if self.path == ":memory:":
+            return list(self)
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        _configure(db)
+        db.execute("BEGIN")
+        # Erst das erste Lesen legt den Stand der Transaktion fest
+        db.execute("SELECT COUNT(*) FROM chapters").fetchone()
+        return StoreView(db, array("q", self._rows), array("q", self._ranks), self._factory, self.cache_size)
+
+    def __repr__(self) -> str:
+        return f"ChapterStore({self.path!r}, {len(self)} Kapitel)"
+
+
+def write_store(filename: str, meta: Dict[str, str], chapters: Iterable, batch_size: int = 1000) -> int:
+    """
+    Schreibt Kapitel in eine neue Datenbank (ersetzt eine vorhandene erst
+    nach Erfolg). Gibt die Anzahl der Kapitel zurück.
+    """
+    part = filename + ".part"
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(part + suffix):
+            os.remove(part + suffix)
+    store = ChapterStore(part, batch_size=batch_size)
+    try:
+        store.set_meta(**meta)
+        store.extend(chapters)
+        count = len(store)
+    finally:
+        # Beim Schließen wird das WAL in die Datei übernommen und gelöscht
+        store.close()
+    # Ein WAL der alten Datei darf nicht auf die neue angewendet werden
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(filename + suffix):
+            os.remove(filename + suffix)
+    os.replace(part, filename)
+    return count
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Verzweigte Geschichten: Auswahl-Links zwischen Kapiteln als gerichteter Graph.
+
+Jedes Kapitel einer verzweigten Geschichte hat eine feste ``id`` und eine
+Liste von Auswahlmöglichkeiten ``(Beschriftung, Ziel-ID)``. ``StoryGraph``
+ist ein Index über diese Links (wie ``SearchIndex`` für den Text): er wird
+beim Hinzufügen, Ändern und Entfernen von Kapiteln laufend nachgeführt und
+hält Vorwärts- und Rückwärts-Adjazenzen.
+
+Abgeleitete Daten werden vorberechnet und inkrementell gepflegt:
+
+    - die vom Start aus erreichbaren Kapitel (neue Links erweitern die Menge
+      per Breitensuche nur um die neu erreichten Kapitel),
+    - die Anzahl der Enden (Kapitel ohne Auswahl), gesamt und erreichbar,
+    - die Tiefe jedes erreichbaren Kapitels auf dem längsten Weg vom Start
+      (neue Links werden per Relaxation eingearbeitet; ein dabei entstehender
+      Zyklus wird sofort erkannt).
+
+Nur Änderungen, die Wege verkürzen können (Link oder erreichbares Kapitel
+entfernt), verwerfen diese Daten; sie werden dann bei der nächsten Abfrage
+in O(V+E) neu berechnet. ``validate()`` prüft den ganzen Graphen in O(V+E).
+"""
+
+from collections import deque
+from heapq import heappop, heappush
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# (Beschriftung, Ziel-ID)
+Choice = Tuple[str, str]
+
+
+class StoryGraph:
+    """Index der Auswahl-Links eines Buches"""
+
+    def __init__(self, start: Optional[str] = None):
+        self.start = start
+        # ID -> Anzahl der Kapitel mit dieser ID (mehr als 1 ist ein Fehler)
+        self.nodes: Dict[str, int] = {}
+        # ID -> Auswahlmöglichkeiten des Kapitels
+        self.choices: Dict[str, Tuple[Choice, ...]] = {}
+        # Ziel-ID -> {Quell-ID: Anzahl Links}; enthält auch Ziele, die es nicht gibt
+        self.incoming: Dict[str, Dict[str, int]] = {}
+        self.links = 0
+        self.endings = 0
+        # Vorberechnete Daten; None heißt "bei der nächsten Abfrage neu berechnen"
+        self._reachable: Optional[Set[str]] = None
+        self._reachable_endings = 0
+        self._depth: Optional[Dict[str, int]] = None
+        self._max_depth = -1
+        self._cyclic = False
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __contains__(self, node: str) -> bool:
+        return node in self.nodes
+
+    # --- Änderungen ---
+
+    def add(self, node: str, choices: Iterable[Choice] = ()):
+        """Nimmt ein Kapitel mit seinen Auswahlmöglichkeiten auf"""
+        count = self.nodes.get(node, 0)
+        self.nodes[node] = count + 1
+        if count:
+            # Doppelte ID: nur gezählt, validate() meldet sie
+            return
+        choices = tuple(choices)
+        self.choices[node] = choices
+        if not choices:
+            self.endings += 1
+        for _label, target in choices:
+            self._link(node, target)
+        # Neue Links eines unerreichbaren Kapitels ändern nichts
+        if self._reachable is not None and (
+                node == self.start or any(source in self._reachable for source in self.incoming.get(node, ()))):
+            self._extend(node)
+
+    def remove(self, node: str):
+        """Entfernt ein Kapitel (eingehende Links bleiben und zeigen dann ins Leere)"""
+        count = self.nodes.get(node, 0)
+        if count == 0:
+            raise KeyError(node)
+        if count > 1:
+            self.nodes[node] = count - 1
+            return
+        del self.nodes[node]
+        choices = self.choices.pop(node)
+        if not choices:
+            self.endings -= 1
+        for _label, target in choices:
+            self._unlink(node, target)
+        if self._reachable is not None and node in self._reachable:
+            self._invalidate()
+
+    def update(self, node: str, choices: Iterable[Choice]):
+        """Ersetzt die Auswahlmöglichkeiten eines Kapitels"""
+        old = self.choices[node]
+        choices = tuple(choices)
+        if choices == old:
+            return
+        self.choices[node] = choices
+        self.endings += (not choices) - (not old)
+        reachable = self._reachable is not None and node in self._reachable
+        if reachable:
+            self._reachable_endings += (not choices) - (not old)
+        for _label, target in choices:
+            self._link(node, target)
+        for _label, target in old:
+            self._unlink(node, target)
+        if not reachable:
+            return
+        for _label, target in old:
+            if target in self.nodes and not self._has_link(node, target):
+                # Ein Weg kann weggefallen sein; nur ohne Zyklen ist ein
+                # erreichbarer Vorgänger sicher nicht erst über target erreichbar
+                if target != self.start and (self._depth is None or not any(
+                        source in self._reachable for source in self.incoming.get(target, ()))):
+                    self._invalidate()
+                    return
+                # oder kürzer geworden
+                if self._cyclic or self._depth is not None and self._depth.get(target) == self._depth[node] + 1:
+                    self._drop_depth()
+        self._extend(node)
+
+    def set_start(self, node: Optional[str]):
+        """Legt das Startkapitel fest"""
+        if node != self.start:
+            self.start = node
+            self._invalidate()
+
+    def _link(self, source: str, target: str):
+        sources = self.incoming.setdefault(target, {})
+        sources[source] = sources.get(source, 0) + 1
+        self.links += 1
+
+    def _unlink(self, source: str, target: str):
+        sources = self.incoming[target]
+        if sources[source] == 1:
+            del sources[source]
+            if not sources:
+                del self.incoming[target]
+        else:
+            sources[source] -= 1
+        self.links -= 1
+
+    def _has_link(self, source: str, target: str) -> bool:
+        return source in self.incoming.get(target, ())
+
+    def _invalidate(self):
+        self._reachable = None
+        self._drop_depth()
+
+    def _drop_depth(self):
+        self._depth = None
+        self._cyclic = False
+
+    # --- Inkrementelle Pflege ---
+
+    def _extend(self, node: str):
+        """Arbeitet neue Links von bzw. zu einem erreichbaren Kapitel ein"""
+        reached = self._spread(node)
+        if self._depth is None:
+            return
+        order = self._topological(reached)
+        if order is None:
+            self._depth = None
+            self._cyclic = True
+        else:
+            self._relax(node, order)
+
+    def _spread(self, node: str) -> List[str]:
+        """Markiert node und alles von dort Erreichbare als erreichbar; gibt die neuen zurück"""
+        reachable = self._reachable
+        reached = []
+        if node not in reachable:
+            reachable.add(node)
+            reached.append(node)
+            self._reachable_endings += not self.choices[node]
+        queue = deque([node])
+        while queue:
+            for _label, target in self.choices[queue.popleft()]:
+                if target in self.nodes and target not in reachable:
+                    reachable.add(target)
+                    reached.append(target)
+                    self._reachable_endings += not self.choices[target]
+                    queue.append(target)
+        return reached
+
+    def _topological(self, nodes: List[str]) -> Optional[List[str]]:
+        """Knoten in topologischer Reihenfolge (Kahn); None bei einem Zyklus darin"""
+        indegree = dict.fromkeys(nodes, 0)
+        for node in nodes:
+            for _label, target in self.choices[node]:
+                if target in indegree:
+                    indegree[target] += 1
+        order = [node for node, degree in indegree.items() if degree == 0]
+        for node in order:
+            for _label, target in self.choices[node]:
+                if target in indegree:
+                    indegree[target] -= 1
+                    if indegree[target] == 0:
+                        order.append(target)
+        return order if len(order) == len(nodes) else None
+
+    def _relax(self, origin: str, fresh: List[str]):
+        """
+        Arbeitet neue Links von bzw. zu origin in die Tiefen ein; fresh sind
+        die dabei neu erreichten Kapitel in topologischer Reihenfolge.
+
+        Die neuen Kapitel erhalten ihre Tiefe in dieser Reihenfolge. Danach
+        werden bestehende Kapitel, deren Tiefe steigt, nach ihrer alten Tiefe
+        abgearbeitet: Auf jedem alten Link steigt die alte Tiefe, jedes
+        Kapitel ist also endgültig, wenn es an der Reihe ist, und wird nur
+        einmal besucht. Jeder neue Zyklus läuft über origin; erreicht die
+        Relaxation origin, sind die Tiefen ungültig.
+        """
+        depth = self._depth
+        for node in fresh:
+            best = 0 if node == self.start else -1
+            for source in self.incoming.get(node, ()):
+                if source in depth and depth[source] >= best:
+                    best = depth[source] + 1
+            depth[node] = best
+            if best > self._max_depth:
+                self._max_depth = best
+        fresh_set = set(fresh)
+        old: Dict[str, int] = {}
+        heap: List[Tuple[int, str]] = []
+        sources = fresh if origin in fresh_set else [origin] + fresh
+        while True:
+            for node in sources:
+                candidate = depth[node] + 1
+                for _label, target in self.choices[node]:
+                    if target == origin and depth[origin] < candidate:
+                        self._depth = None
+                        self._cyclic = True
+                        return
+                    if target in fresh_set or target not in self.nodes or depth[target] >= candidate:
+                        continue
+                    if target not in old:
+                        old[target] = depth[target]
+                        heappush(heap, (old[target], target))
+                    depth[target] = candidate
+                    if candidate > self._max_depth:
+                        self._max_depth = candidate
+            if not heap:
+                return
+            sources = [heappop(heap)[1]]
+
+    def _rebuild(self):
+        """Berechnet Erreichbarkeit und Tiefen neu (O(V+E))"""
+        reachable: Set[str] = set()
+        self._reachable = reachable
+        self._reachable_endings = 0
+        if self.start in self.nodes:
+            self._spread(self.start)
+        # Tiefen in topologischer Reihenfolge (Kahn) über den erreichbaren Teil
+        indegree = {node: 0 for node in reachable}
+        for node in reachable:
+            for _label, target in self.choices[node]:
+                if target in indegree:
+                    indegree[target] += 1
+        depth = {node: 0 for node, degree in indegree.items() if degree == 0}
+        queue = deque(depth)
+        processed = 0
+        while queue:
+            node = queue.popleft()
+            processed += 1
+            for _label, target in self.choices[node]:
+                if target in indegree:
+                    if depth[node] + 1 > depth.get(target, -1):
+                        depth[target] = depth[node] + 1
+                    indegree[target] -= 1
+                    if indegree[target] == 0:
+                        queue.append(target)
+        self._cyclic = processed < len(reachable)
+        self._depth = None if self._cyclic else depth
+        self._max_depth = max(depth.values(), default=-1) if not self._cyclic else -1
+
+    def _ensure(self):
+        if self._reachable is None or (self._depth is None and not self._cyclic):
+            self._rebuild()
+
+    # --- Abfragen ---
+
+    def reachable(self) -> Set[str]:
+        """IDs aller vom Start aus erreichbaren Kapitel"""
+        if self._reachable is None:
+            self._rebuild()
+        return self._reachable
+
+    def is_reachable(self, node: str) -> bool:
+        return node in self.reachable()
+
+    def ending_count(self, reachable_only: bool = True) -> int:
+        """Anzahl der Enden (Kapitel ohne Auswahl), standardmäßig nur erreichbare"""
+        if not reachable_only:
+            return self.endings
+        self.reachable()
+        return self._reachable_endings
+
+    def has_cycle(self) -> bool:
+        """True, wenn der vom Start erreichbare Teil einen Zyklus enthält"""
+        self._ensure()
+        return self._cyclic
+
+    def longest_path_length(self) -> Optional[int]:
+        """Kapitel auf dem längsten Weg vom Start (None bei Zyklen)"""
+        self._ensure()
+        if self._cyclic:
+            return None
+        return self._max_depth + 1
+
+    def longest_path(self) -> Optional[List[str]]:
+        """Der längste Weg vom Start als Liste von IDs (None bei Zyklen)"""
+        self._ensure()
+        if self._cyclic:
+            return None
+        depth = self._depth
+        if not depth:
+            return []
+        node = max(depth, key=depth.get)
+        path = [node]
+        while depth[node] > 0:
+            node = next(source for source in self.incoming[node]
+                        if depth.get(source) == depth[node] - 1 and source in self.nodes)
+            path.append(node)
+        path.reverse()
+        return path
+
+    def validate(self) -> Dict[str, list]:
+        """
+        Prüft den ganzen Graphen in O(V+E) und gibt die Probleme zurück:
+
+            dangling     Links auf nicht vorhandene Kapitel (Quelle, Beschriftung, Ziel)
+            unreachable  Kapitel, die vom Start aus nicht erreichbar sind
+            dead_ends    Kapitel mit Auswahl, von denen aus kein Ende erreichbar ist
+            cycles       Zyklen (je eine Liste von IDs einer starken Zusammenhangskomponente)
+            duplicates   IDs, die mehrfach vergeben sind
+        """
+        dangling = [
+            (source, label, target)
+            for source, choices in self.choices.items()
+            for label, target in choices
+            if target not in self.nodes
+        ]
+        reachable = self.reachable()
+        unreachable = [node for node in self.nodes if node not in reachable]
+
+        # Rückwärts von allen Enden: wer ein Ende erreicht, ist keine Sackgasse
+        finishes = {node for node, choices in self.choices.items() if not choices}
+        queue = deque(finishes)
+        while queue:
+            for source in self.incoming.get(queue.popleft(), ()):
+                if source in self.nodes and source not in finishes:
+                    finishes.add(source)
+                    queue.append(source)
+        dead_ends = [node for node in self.nodes if node not in finishes]
+
+        return {
+            "dangling": dangling,
+            "unreachable": unreachable,
+            "dead_ends": dead_ends,
+            "cycles": self._cycles(),
+            "duplicates": [node for node, count in self.nodes.items() if count > 1],
+        }
+
+    def _cycles(self) -> List[List[str]]:
+        """Starke Zusammenhangskomponenten mit Zyklus (iterativer Tarjan)"""
+        index: Dict[str, int] = {}
+        low: Dict[str, int] = {}
+        stack: List[str] = []
+        on_stack: Set[str] = set()
+        cycles = []
+        counter = 0
+        for root in self.nodes:
+            if root in index:
+                continue
+            work = [(root, iter(self.choices[root]))]
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, children = work[-1]
+                for _label, target in children:
+                    if target not in self.nodes:
+                        continue
+                    if target not in index:
+                        index[target] = low[target] = counter
+                        counter += 1
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(self.choices[target])))
+                        break
+                    if target in on_stack:
+                        low[node] = min(low[node], index[target])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        if len(component) > 1 or any(t == node for _l, t in self.choices[node]):
+                            component.reverse()
+                            cycles.append(component)
+        return cycles
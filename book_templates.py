@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Vorlagen und Themes für den HTML-Export.
+
+Vorlagen verwenden Platzhalter im Stil von ``string.Template`` (``$title``,
+``${title}``, ``$$`` für ein Dollarzeichen), damit CSS und HTML ohne
+doppelte Klammern auskommen. Jede Vorlage wird nur einmal in ein
+Format-Muster für ``str.format_map`` übersetzt; das Rendern eines Kapitels
+ist danach ein einzelner Aufruf in C. Übersetzte Vorlagen werden über ihren
+Inhalts-Hash zwischengespeichert und von allen Büchern und Themes geteilt,
+Vorlagen-Dateien zusätzlich über Änderungszeit und Größe.
+
+Ein Theme ist eine Sammlung benannter Vorlagen. Eigene Themes können aus
+einem Verzeichnis geladen werden (``<name>.html`` bzw. ``<name>.css``);
+fehlende Vorlagen werden aus dem Standard-Theme übernommen.
+"""
+
+import hashlib
+import os
+import string
+from typing import Dict, Union
+
+_PATTERN = string.Template.pattern
+
+DEFAULT_TEMPLATES: Dict[str, str] = {
+    "style": """        body {
+            font-family: 'Georgia', serif;
+            max-width: 800px;
+            margin: 0 auto;
+            padding: 20px;
+            background-color: #f5f5f5;
+        }
+        .book-container {
+            background-color: white;
+            padding: 40px;
+            box-shadow: 0 0 10px rgba(0,0,0,0.1);
+        }
+        h1 {
+            color: #333;
+            border-bottom: 3px solid #4CAF50;
+            padding-bottom: 10px;
+        }
+        .author {
+            color: #666;
+            font-style: italic;
+            margin-bottom: 30px;
+        }
+        .chapter {
+            margin-bottom: 40px;
+            padding: 20px;
+            border-left: 4px solid #4CAF50;
+            background-color: #fafafa;
+        }
+        .chapter h2 {
+            color: #4CAF50;
+            margin-top: 0;
+        }
+        .chapter img {
+            max-width: 100%;
+            height: auto;
+            margin: 20px 0;
+            border-radius: 5px;
+        }
+        .chapter-content {
+            line-height: 1.6;
+            color: #333;
+        }
+""",
+    # Zusätzliche Regeln für den mehrseitigen Export (Navigation, Inhaltsverzeichnis)
+    "pages_style": """        .nav {
+            display: flex;
+            justify-content: space-between;
+            margin: 20px 0;
+        }
+        .nav a {
+            color: #4CAF50;
+            text-decoration: none;
+        }
+        .toc li {
+            margin-bottom: 6px;
+        }
+""",
+    # Suchfeld im HTML-Export (save_to_html mit search=True)
+    "search_style": """        .search input {
+            width: 100%;
+            padding: 8px;
+            font-size: 1em;
+            box-sizing: border-box;
+        }
+        .search ol {
+            margin: 10px 0 30px;
+        }
+""",
+    # Nachladender Leser (save_to_html_reader)
+    "reader_style": """        .reader-toc summary {
+            cursor: pointer;
+            color: #4CAF50;
+            margin-bottom: 20px;
+        }
+        .reader-more {
+            min-height: 1px;
+            text-align: center;
+            color: #666;
+        }
+        .chapter img[width] {
+            max-width: 100%;
+            height: auto;
+        }
+""",
+    "head": """<!DOCTYPE html>
+<html lang="de">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>$title</title>
+    <style>
+$style    </style>
+</head>
+""",
+    # Kopf mit verlinktem, gemeinsam genutztem Stylesheet (siehe book_bundle)
+    "head_linked": """<!DOCTYPE html>
+<html lang="de">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>$title</title>
+    <link rel="stylesheet" href="$href">
+</head>
+""",
+    "book_open": """<body>
+    <div class="book-container">
+        <h1>$title</h1>
+        <p class="author">von $author</p>
+""",
+    "search_box": """        <div class="search">
+            <input type="search" id="book-search" placeholder="Im Buch suchen ...">
+            <ol id="book-search-results"></ol>
+        </div>
+""",
+    "chapter": """
+        <div class="chapter" id="kapitel-$number">
+            <h2>Kapitel $number: $title</h2>
+            <div class="chapter-content">
+$content            </div>
+$image        </div>
+""",
+    "chapter_image": """            <img src="$src" alt="$title">
+""",
+    "choices": """            <ul class="choices">
+$items            </ul>
+""",
+    "choice": """                <li><a href="$href">$label</a></li>
+""",
+    "book_close": """    </div>
+""",
+    "document_close": """</body>
+</html>""",
+    "reader_open": """        <details class="reader-toc" id="book-toc-panel">
+            <summary>Inhalt</summary>
+            <ol class="toc" id="book-toc"></ol>
+        </details>
+        <button type="button" id="book-prev" hidden>Frühere Kapitel laden</button>
+        <div id="book-chapters"></div>
+        <div class="reader-more" id="book-more">Kapitel werden geladen ...</div>
+""",
+    "reader_image": """            <img src="$src" alt="$title" loading="lazy" decoding="async"$size>
+""",
+    # Lädt Kapitel-Blöcke per <script> (funktioniert auch über file://)
+    "reader_script": """    <script>window.BOOK_READER = $config;</script>
+    <script>
+(function () {
+    var config = window.BOOK_READER, list = document.getElementById("book-chapters"),
+        more = document.getElementById("book-more"), prev = document.getElementById("book-prev"),
+        toc = document.getElementById("book-toc"), panel = document.getElementById("book-toc-panel"),
+        chunks = Math.ceil(config.count / config.chunk), first = 0, next = 0, busy = false,
+        generation = 0, waiting = {};
+    window.BOOK_CHUNK = function (chunk, chapters) {
+        var done = waiting[chunk];
+        delete waiting[chunk];
+        if (done) { done(chapters); }
+    };
+    function load(chunk, done) {
+        var script = document.createElement("script"), current = generation;
+        waiting[chunk] = function (chapters) { if (current === generation) { done(chapters); } };
+        script.src = config.prefix + String(chunk + 1).padStart(config.width, "0") + ".js";
+        script.onload = script.onerror = function () {
+            document.head.removeChild(script);
+            if (chunk in waiting) { delete waiting[chunk]; busy = false; }
+        };
+        document.head.appendChild(script);
+    }
+    function update() {
+        prev.hidden = first === 0;
+        more.textContent = next < chunks ? "Kapitel werden geladen ..." : "";
+    }
+    function check() {
+        if (!busy && next < chunks && more.getBoundingClientRect().top < window.innerHeight * 2) {
+            busy = true;
+            load(next, function (chapters) {
+                list.insertAdjacentHTML("beforeend", chapters.join(""));
+                next += 1;
+                busy = false;
+                update();
+                check();
+            });
+        }
+    }
+    function jump() {
+        var match = /^#kapitel-(\d+)$$/.exec(location.hash), number, target;
+        if (!match) { return; }
+        number = parseInt(match[1], 10);
+        target = document.getElementById("kapitel-" + number);
+        if (target) { target.scrollIntoView(); return; }
+        if (number < 1 || number > config.count) { return; }
+        generation += 1;
+        list.innerHTML = "";
+        first = next = Math.floor((number - 1) / config.chunk);
+        busy = true;
+        load(next, function (chapters) {
+            list.innerHTML = chapters.join("");
+            next += 1;
+            busy = false;
+            update();
+            document.getElementById("kapitel-" + number).scrollIntoView();
+            check();
+        });
+    }
+    prev.addEventListener("click", function () {
+        if (busy || first === 0) { return; }
+        busy = true;
+        load(first - 1, function (chapters) {
+            var height = document.documentElement.scrollHeight;
+            list.insertAdjacentHTML("afterbegin", chapters.join(""));
+            window.scrollBy(0, document.documentElement.scrollHeight - height);
+            first -= 1;
+            busy = false;
+            update();
+        });
+    });
+    window.BOOK_TOC = function (titles) {
+        var html = [];
+        titles.forEach(function (title, i) {
+            html.push('<li><a href="#kapitel-' + (i + 1) + '"></a></li>');
+        });
+        toc.innerHTML = html.join("");
+        Array.prototype.forEach.call(toc.getElementsByTagName("a"), function (link, i) {
+            link.textContent = titles[i];
+        });
+    };
+    panel.addEventListener("toggle", function () {
+        if (panel.open && !toc.firstChild) {
+            var script = document.createElement("script");
+            script.src = config.toc;
+            document.head.appendChild(script);
+        }
+    });
+    window.addEventListener("scroll", check, { passive: true });
+    window.addEventListener("resize", check);
+    window.addEventListener("hashchange", jump);
+    update();
+    if (/^#kapitel-\d+$$/.test(location.hash)) { jump(); } else { check(); }
+})();
+    </script>
+""",
+    "page_open": """<body>
+    <div class="book-container">
+""",
+    "nav": """        <nav class="nav">
+            $prev
+            <a href="index.html">Inhalt</a>
+            $next
+        </nav>
+""",
+    "nav_prev": """<a href="$href">&laquo; Zurück</a>""",
+    "nav_next": """<a href="$href">Weiter &raquo;</a>""",
+    "nav_none": """<span></span>""",
+    "toc_open": """        <ol class="toc">
+""",
+    "toc_item": """            <li><a href="$href">$title</a></li>
+""",
+    "toc_close": """        </ol>
+""",
+}
+
+# Dateiendungen der Vorlagen in Theme-Verzeichnissen
+_CSS_TEMPLATES = {"style", "pages_style", "search_style", "reader_style"}
+# Reihenfolge im gemeinsamen Stylesheet (Theme.stylesheet)
+_STYLESHEET_ORDER = ("style", "pages_style", "search_style", "reader_style")
+
+
+class CompiledTemplate:
+    """Eine einmal übersetzte Vorlage"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.fields = []
+        parts = []
+        position = 0
+        for match in _PATTERN.finditer(source):
+            parts.append(_escape_braces(source[position:match.start()]))
+            position = match.end()
+            name = match.group("named") or match.group("braced")
+            if name is not None:
+                parts.append("{" + name + "}")
+                self.fields.append(name)
+            elif match.group("escaped") is not None:
+                parts.append("$")
+            else:
+                raise ValueError(f"Ungültiger Platzhalter in Vorlage an Position {match.start()}")
+        parts.append(_escape_braces(source[position:]))
+        self._format = "".join(parts).format_map
+
+    def render(self, **fields) -> str:
+        return self._format(fields)
+
+    def render_map(self, fields: Dict[str, str]) -> str:
+        return self._format(fields)
+
+    def __getstate__(self):
+        return self.source
+
+    def __setstate__(self, source):
+        self.__init__(source)
+
+
+def _escape_braces(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+# Inhalts-Hash -> übersetzte Vorlage (gemeinsam für alle Themes und Bücher)
+_compiled: Dict[str, CompiledTemplate] = {}
+# Dateipfad -> (mtime_ns, Größe, übersetzte Vorlage)
+_files: Dict[str, tuple] = {}
+
+
+def compile_template(source: str) -> CompiledTemplate:
+    """Übersetzt eine Vorlage oder liefert die bereits übersetzte Fassung"""
+    key = hashlib.sha1(source.encode("utf-8")).hexdigest()
+    template = _compiled.get(key)
+    if template is None:
+        template = _compiled[key] = CompiledTemplate(source)
+    return template
+
+
+def load_template(path: str) -> CompiledTemplate:
+    """Lädt eine Vorlagen-Datei; neu gelesen wird nur nach einer Änderung"""
+    stat = os.stat(path)
+    cached = _files.get(path)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    with open(path, 'r', encoding='utf-8') as f:
+        template = compile_template(f.read())
+    _files[path] = (stat.st_mtime_ns, stat.st_size, template)
+    return template
+
+
+class Theme:
+    """Benannte Sammlung von Vorlagen für den HTML-Export"""
+
+    def __init__(self, name: str, templates: Dict[str, str] = None, directory: str = None):
+        self.name = name
+        self.directory = directory
+        self._overrides = dict(templates or {})
+        self.templates: Dict[str, CompiledTemplate] = {}
+        self.fingerprint = ""
+        self.refresh()
+
+    @classmethod
+    def from_directory(cls, directory: str, name: str = None) -> "Theme":
+        """Lädt ein Theme aus einem Verzeichnis mit Vorlagen-Dateien"""
+        return cls(name or os.path.basename(os.path.normpath(directory)), directory=directory)
+
+    def _path(self, name: str) -> str:
+        extension = ".css" if name in _CSS_TEMPLATES else ".html"
+        return os.path.join(self.directory, name + extension)
+
+    def refresh(self) -> bool:
+        """
+        Prüft Vorlagen-Dateien auf Änderungen (einmal pro Export genügt).
+        Gibt True zurück, wenn sich das Theme geändert hat.
+        """
+        templates = {}
+        for name, source in DEFAULT_TEMPLATES.items():
+            if name in self._overrides:
+                templates[name] = compile_template(self._overrides[name])
+            elif self.directory and os.path.exists(self._path(name)):
+                templates[name] = load_template(self._path(name))
+            else:
+                templates[name] = compile_template(source)
+        digest = hashlib.sha1()
+        for name in sorted(templates):
+            digest.update(name.encode("utf-8") + b"\0" + templates[name].source.encode("utf-8") + b"\0")
+        fingerprint = digest.hexdigest()[:16]
+        changed = fingerprint != self.fingerprint
+        self.templates = templates
+        self.fingerprint = fingerprint
+        return changed
+
+    def render(self, name: str, **fields) -> str:
+        return self.templates[name].render_map(fields)
+
+    def head(self, title: str, extra_style: str = None, stylesheet: str = None) -> str:
+        """
+        HTML-Kopf mit dem Stylesheet des Themes (und optional zusätzlichen
+        Regeln). Mit stylesheet (relativer Pfad) wird stattdessen auf eine
+        externe Datei mit allen Regeln verwiesen (siehe stylesheet()).
+        """
+        if stylesheet:
+            return self.render("head_linked", title=title, href=stylesheet)
+        style = self.templates["style"].source
+        if extra_style:
+            style += self.templates[extra_style].source
+        return self.render("head", title=title, style=style)
+
+    def stylesheet(self) -> str:
+        """Alle CSS-Vorlagen des Themes als eine Datei (für jede Exportart gleich)"""
+        return "".join(self.templates[name].source for name in _STYLESHEET_ORDER)
+
+    def __getstate__(self):
+        # Für Prozess-Pools: Vorlagen werden im Arbeiter neu übersetzt
+        return {"name": self.name, "directory": self.directory, "overrides": self._overrides}
+
+    def __setstate__(self, state):
+        self.__init__(state["name"], state["overrides"], state["directory"])
+
+
+THEMES: Dict[str, Theme] = {"default": Theme("default")}
+
+
+def register_theme(theme: Theme) -> Theme:
+    """Registriert ein Theme unter seinem Namen"""
+    THEMES[theme.name] = theme
+    return theme
+
+
+def get_theme(theme: Union[str, Theme, None]) -> Theme:
+    """Liefert ein Theme-Objekt zu einem Namen (oder das Objekt selbst)"""
+    if theme is None:
+        return THEMES["default"]
+    if isinstance(theme, Theme):
+        return theme
+    try:
+        return THEMES[theme]
+    except KeyError:
+        raise ValueError(f"Unbekanntes Theme: {theme}")
@@ -1,4 +1,7 @@
 #!/usr/bin/env bash
 set -euo pipefail
 
+# Fail the build when cold start regresses (see benchmarks/startup_budget.json)
+python3 benchmarks/startup_time.py
+
 pyinstaller --onefile --name book_builder_gui gui_app.py
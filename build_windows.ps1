@@ -1 +1,4 @@
+python benchmarks/startup_time.py
+if ($LASTEXITCODE -ne 0) { exit $LASTEXITCODE }
+
 pyinstaller --onefile --name book_builder_gui gui_app.py
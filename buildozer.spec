@@ -18,6 +18,9 @@ entrypoint = kivy_app.py
 # (list) Source files to include (let's include all py)
 source.include_exts = py,png,jpg,jpeg,gif,webp
 
+# (list) List of directory to exclude (let empty to not exclude anything)
+source.exclude_dirs = benchmarks,bin
+
 # (list) Requirements
 requirements = python3,kivy
 
@@ -3,10 +3,16 @@
 Tkinter GUI for the Interactive Book Builder.
 """
 
+import os
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import messagebox, ttk
 
-from book_builder import InteractiveBook
+from book_builder import ExportJob, InteractiveBook
+
+PROGRESS_POLL_MS = 100
+AUTOSAVE_SYNC_MS = 1000
+UNDO_DEPTH = 200
+AUTOSAVE_PATH = os.path.join(os.path.expanduser("~"), ".interactive_book_builder", "autosave")
 
 
 class BookBuilderGUI(tk.Tk):
@@ -17,10 +23,19 @@ class BookBuilderGUI(tk.Tk):
         self.geometry("900x600")
         self.resizable(True, True)
 
-        self.book = None
-        self.chapters = []
+        # Every edit is appended to the autosave journal; a crashed session
+        # is restored from it on the next start.
+        self.book = InteractiveBook.open_journaled(AUTOSAVE_PATH)
+        self.book.enable_history(depth=UNDO_DEPTH)
+        self.export_job = None
+        self.preview = None
 
         self._build_ui()
+        self._show_recovered_book()
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.bind("<Control-z>", lambda _event: self._undo())
+        self.bind("<Control-y>", lambda _event: self._redo())
+        self.after(AUTOSAVE_SYNC_MS, self._autosave_tick)
 
     def _build_ui(self):
         # Top: book meta
@@ -66,6 +81,13 @@ class BookBuilderGUI(tk.Tk):
         list_frame = tk.LabelFrame(self, text="Chapters")
         list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=8)
 
+        search_row = tk.Frame(list_frame)
+        search_row.pack(fill=tk.X, padx=6, pady=(6, 0))
+        self.search_entry = tk.Entry(search_row, width=40)
+        self.search_entry.pack(side=tk.LEFT, padx=(0, 4))
+        self.search_entry.bind("<Return>", lambda _event: self._search())
+        tk.Button(search_row, text="Search", command=self._search).pack(side=tk.LEFT)
+
         self.chapter_list = tk.Listbox(list_frame, height=6)
         self.chapter_list.pack(fill=tk.BOTH, expand=True, padx=6, pady=6)
 
@@ -73,15 +95,125 @@ class BookBuilderGUI(tk.Tk):
         action_frame = tk.Frame(self)
         action_frame.pack(fill=tk.X, padx=10, pady=8)
 
-        tk.Button(action_frame, text="Export JSON", command=self._export_json).pack(side=tk.LEFT, padx=4)
-        tk.Button(action_frame, text="Export HTML", command=self._export_html).pack(side=tk.LEFT, padx=4)
+        self.export_buttons = [
+            tk.Button(action_frame, text="Export JSON", command=self._export_json),
+            tk.Button(action_frame, text="Export HTML", command=self._export_html),
+        ]
+        tk.Button(action_frame, text="Preview", command=self._preview).pack(side=tk.LEFT, padx=4)
+        for button in self.export_buttons:
+            button.pack(side=tk.LEFT, padx=4)
+        self.undo_button = tk.Button(action_frame, text="Undo", command=self._undo, state=tk.DISABLED)
+        self.undo_button.pack(side=tk.LEFT, padx=4)
+        self.redo_button = tk.Button(action_frame, text="Redo", command=self._redo, state=tk.DISABLED)
+        self.redo_button.pack(side=tk.LEFT, padx=4)
         tk.Button(action_frame, text="Reset", command=self._reset).pack(side=tk.LEFT, padx=4)
+        tk.Button(action_frame, text="Open database", command=self._open_database).pack(side=tk.LEFT, padx=4)
+
+        self.progress_bar = ttk.Progressbar(action_frame, length=160, mode="determinate")
+        self.progress_bar.pack(side=tk.LEFT, padx=4)
+        self.cancel_button = tk.Button(action_frame, text="Cancel", command=self._cancel_export, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=4)
 
         self.status_var = tk.StringVar(value="Ready")
         status_label = tk.Label(action_frame, textvariable=self.status_var, anchor="w")
         status_label.pack(side=tk.RIGHT, fill=tk.X, expand=True)
 
+    def _show_recovered_book(self):
+        if not self.book.chapters and not self.book.title and not self.book.author:
+            return
+        self._show_book()
+        self.status_var.set(f"Recovered {len(self.book.chapters)} chapter(s) from autosave")
+
+    def _show_book(self):
+        self.title_entry.delete(0, tk.END)
+        self.title_entry.insert(0, self.book.title)
+        self.author_entry.delete(0, tk.END)
+        self.author_entry.insert(0, self.book.author)
+        self.chapter_list.delete(0, tk.END)
+        # Titles only: a database-backed book does not load chapter texts here
+        for title in self.book.chapter_titles():
+            self.chapter_list.insert(tk.END, title)
+        self._update_undo_buttons()
+
+    def _update_undo_buttons(self):
+        self.undo_button.config(state=tk.NORMAL if self.book.can_undo() else tk.DISABLED)
+        self.redo_button.config(state=tk.NORMAL if self.book.can_redo() else tk.DISABLED)
+
+    def _undo(self):
+        label = self.book.undo()
+        if label:
+            self._show_book()
+            self.status_var.set(f"Undone: {label}")
+
+    def _redo(self):
+        label = self.book.redo()
+        if label:
+            self._show_book()
+            self.status_var.set(f"Redone: {label}")
+
+    def _autosave_tick(self):
+        # A database-backed book commits every edit itself
+        if self.book.journal is not None:
+            self.book.journal.sync()
+        self.after(AUTOSAVE_SYNC_MS, self._autosave_tick)
+
+    def _close_book(self):
+        self.book.set_meta(self.title_entry.get().strip(), self.author_entry.get().strip())
+        if self.book.journal is not None:
+            self.book.compact()
+            self.book.journal.close()
+        self.book.close()
+
+    def _on_close(self):
+        if self.preview is not None:
+            self.preview.stop()
+        self._close_book()
+        self.destroy()
+
+    def _preview(self):
+        # Pages are rendered on request from the book in memory, so this is
+        # instant for any book size; open pages reload themselves on edits.
+        import webbrowser
+
+        self.book.set_meta(self.title_entry.get().strip(), self.author_entry.get().strip())
+        if self.preview is None:
+            from book_preview import PreviewServer
+
+            self.preview = PreviewServer(self.book).start()
+        webbrowser.open(self.preview.url)
+        self.status_var.set(f"Preview running at {self.preview.url}")
+
+    def _open_database(self):
+        # Very large books live in an SQLite file (.kidb); only chapter ids
+        # and order stay in memory and texts are read on demand.
+        if self.export_job is not None:
+            messagebox.showerror("Export running", "Please wait for the export to finish.")
+            return
+        from tkinter import filedialog
+
+        path = filedialog.asksaveasfilename(
+            title="Open or create book database",
+            defaultextension=".kidb",
+            filetypes=[("Book database", "*.kidb")],
+            confirmoverwrite=False,
+        )
+        if not path:
+            return
+        try:
+            book = InteractiveBook.open_store(path)
+        except ValueError as e:
+            messagebox.showerror("Cannot open database", str(e))
+            return
+        self._close_book()
+        self.book = book
+        if self.preview is not None:
+            self.preview.book = book
+        self._show_book()
+        self.status_var.set(f"Opened database: {path} ({len(self.book.chapters)} chapter(s), undo disabled)")
+
     def _browse_image(self):
+        from tkinter import filedialog
+
         path = filedialog.askopenfilename(
             title="Select image",
             filetypes=[("Image files", "*.png *.jpg *.jpeg *.gif *.webp"), ("All files", "*")],
@@ -92,7 +224,7 @@ class BookBuilderGUI(tk.Tk):
 
     def _add_chapter(self):
         title = self.chapter_title_entry.get().strip()
-        content = self.chapter_content_text.get("1.0", tk.END).strip()
+        content = self._editor_content()
         image = self.image_path_entry.get().strip() or None
 
         if not title:
@@ -102,23 +234,49 @@ class BookBuilderGUI(tk.Tk):
             messagebox.showerror("Missing content", "Please enter chapter content.")
             return
 
-        self.chapters.append({"title": title, "content": content, "image": image})
+        self.book.set_meta(self.title_entry.get().strip(), self.author_entry.get().strip())
+        self.book.add_chapter(title, content, image)
         self.chapter_list.insert(tk.END, title)
 
         self.chapter_title_entry.delete(0, tk.END)
         self.chapter_content_text.delete("1.0", tk.END)
         self.image_path_entry.delete(0, tk.END)
 
+        self._update_undo_buttons()
         self.status_var.set(f"Added chapter: {title}")
 
+    def _editor_content(self) -> str:
+        text = self.chapter_content_text
+        # Locate the first and last non-blank characters in Tk instead of
+        # copying the whole buffer (plus its trailing newline) and then a
+        # stripped second copy; only the chapter text itself is copied once
+        start = text.search(r"\S", "1.0", stopindex=tk.END, regexp=True)
+        if not start:
+            return ""
+        end = text.search(r"\S", tk.END, stopindex="1.0", regexp=True, backwards=True)
+        return text.get(start, f"{end} + 1 chars")
+
     def _remove_selected(self):
         selection = self.chapter_list.curselection()
         if not selection:
             return
         index = selection[0]
-        removed = self.chapters.pop(index)
+        removed = self.book.remove_chapter(index)
         self.chapter_list.delete(index)
-        self.status_var.set(f"Removed chapter: {removed['title']}")
+        self._update_undo_buttons()
+        self.status_var.set(f"Removed chapter: {removed.title}")
+
+    def _search(self):
+        query = self.search_entry.get().strip()
+        self.chapter_list.selection_clear(0, tk.END)
+        if not query:
+            return
+        results = self.book.search(query)
+        for index, _chapter in results:
+            self.chapter_list.selection_set(index)
+        if results:
+            self.chapter_list.see(results[0][0])
+        self.status_var.set(f"Found {len(results)} chapter(s) for: {query}")
 
     def _create_book(self):
         title = self.title_entry.get().strip()
@@ -128,19 +286,20 @@ class BookBuilderGUI(tk.Tk):
             messagebox.showerror("Missing data", "Please enter both title and author.")
             return None
 
-        if not self.chapters:
+        if not self.book.chapters:
             messagebox.showerror("No chapters", "Please add at least one chapter.")
             return None
 
-        book = InteractiveBook(title=title, author=author)
-        for chapter in self.chapters:
-            book.add_chapter(chapter["title"], chapter["content"], chapter.get("image"))
-        return book
+        self.book.set_meta(title, author)
+        self._update_undo_buttons()
+        return self.book
 
     def _export_json(self):
         book = self._create_book()
         if not book:
             return
+        from tkinter import filedialog
+
         path = filedialog.asksaveasfilename(
             title="Save JSON",
             defaultextension=".json",
@@ -148,13 +307,16 @@ class BookBuilderGUI(tk.Tk):
         )
         if not path:
             return
-        book.save_to_json(path)
-        self.status_var.set(f"Saved JSON: {path}")
+        self._start_export(
+            book, lambda snapshot, progress: snapshot.export("json", path, progress=progress), f"Saved JSON: {path}"
+        )
 
     def _export_html(self):
         book = self._create_book()
         if not book:
             return
+        from tkinter import filedialog
+
         path = filedialog.asksaveasfilename(
             title="Save HTML",
             defaultextension=".html",
@@ -162,17 +324,69 @@ class BookBuilderGUI(tk.Tk):
         )
         if not path:
             return
-        book.save_to_html(path)
-        self.status_var.set(f"Saved HTML: {path}")
+        self._start_export(
+            book, lambda snapshot, progress: snapshot.export("html", path, progress=progress), f"Saved HTML: {path}"
+        )
+
+    def _start_export(self, book, export, done_message):
+        # Export a snapshot on a worker thread so the window stays responsive
+        # and later edits do not interfere with the running export.
+        snapshot = book.copy()
+        self.export_job = ExportJob(lambda progress: export(snapshot, progress), snapshot).start()
+        for button in self.export_buttons:
+            button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.progress_bar["value"] = 0
+        self.status_var.set("Exporting ...")
+        self.after(PROGRESS_POLL_MS, self._poll_export, done_message)
+
+    def _poll_export(self, done_message):
+        job = self.export_job
+        done, total = job.progress
+        self.progress_bar["maximum"] = max(total, 1)
+        self.progress_bar["value"] = done
+        if not job.done:
+            self.after(PROGRESS_POLL_MS, self._poll_export, done_message)
+            return
+
+        self.export_job = None
+        for button in self.export_buttons:
+            button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        if job.cancelled:
+            self.progress_bar["value"] = 0
+            self.status_var.set("Export cancelled")
+        elif job.error is not None:
+            self.progress_bar["value"] = 0
+            self.status_var.set("Export failed")
+            messagebox.showerror("Export failed", str(job.error))
+        else:
+            self.status_var.set(done_message)
+
+    def _cancel_export(self):
+        if self.export_job is not None:
+            self.export_job.cancel()
+            self.status_var.set("Cancelling ...")
 
     def _reset(self):
+        store = self.book.store
+        if store is not None and not messagebox.askyesno(
+            "Reset database",
+            f"This permanently deletes all chapters, the title and the author in\n{store.path}.\n\n"
+            "Database-backed books have no undo. Continue?",
+            icon=messagebox.WARNING,
+        ):
+            return
         self.title_entry.delete(0, tk.END)
         self.author_entry.delete(0, tk.END)
         self.chapter_title_entry.delete(0, tk.END)
         self.chapter_content_text.delete("1.0", tk.END)
         self.image_path_entry.delete(0, tk.END)
         self.chapter_list.delete(0, tk.END)
-        self.chapters.clear()
+        # For journaled books clearing is recorded like any other edit and can
+        # be undone; a database-backed book is emptied for good (confirmed above).
+        self.book.clear()
+        self._update_undo_buttons()
         self.status_var.set("Ready")
 
 
@@ -6,28 +6,124 @@ Kivy GUI for Android (and desktop) to build interactive books.
 import os
 
 from kivy.app import App
-from kivy.core.window import Window
+from kivy.clock import Clock
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
-from kivy.uix.filechooser import FileChooserListView
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.label import Label
 from kivy.uix.popup import Popup
-from kivy.uix.scrollview import ScrollView
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 from kivy.uix.textinput import TextInput
-import webbrowser
 
-from book_builder import InteractiveBook
+from book_builder import ExportJob, InteractiveBook
+
+PROGRESS_POLL_SECONDS = 0.1
+AUTOSAVE_SYNC_SECONDS = 1.0
+UNDO_DEPTH = 200
+
+
+class ChapterRow(RecycleDataViewBehavior, Label):
+    """Recycled row of the chapter list; the number comes from the row index."""
+
+    def refresh_view_attrs(self, rv, index, data):
+        super().refresh_view_attrs(rv, index, data)
+        self.text = f"{index + 1}. {data['title']}"
+
+
+class ChapterListView(RecycleView):
+    """Virtualized chapter list: only the visible rows exist as widgets."""
+
+    ROW_HEIGHT = 24
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.viewclass = ChapterRow
+        layout = RecycleBoxLayout(
+            orientation="vertical",
+            spacing=4,
+            size_hint_y=None,
+            default_size=(None, self.ROW_HEIGHT),
+            default_size_hint=(1, None),
+        )
+        layout.bind(minimum_height=layout.setter("height"))
+        self.add_widget(layout)
+
+    def set_chapters(self, chapters):
+        self.data = [{"title": chapter.title} for chapter in chapters]
+
+    def append_chapter(self, chapter):
+        self.data.append({"title": chapter.title})
+
+    def remove_chapter(self, index):
+        self.data.pop(index)
+
+    def apply_operations(self, operations, chapters):
+        """
+        Patch only the rows touched by journal operations (as recorded by
+        the book history) after they were applied to chapters. Operations
+        that cannot be mapped to rows (None) rebuild the list.
+        """
+        if operations is None:
+            self.set_chapters(chapters)
+            return
+        data = self.data
+        for operation in operations:
+            op = operation["op"]
+            if op in ("add", "add_many"):
+                start = len(data)
+                data.extend({"title": chapter.title} for chapter in chapters[start:])
+            elif op == "insert":
+                index = operation["index"]
+                data.insert(index, {"title": chapters[index].title})
+            elif op == "remove":
+                data.pop(operation["index"])
+            elif op == "truncate":
+                del data[operation["length"]:]
+            elif op in ("edit", "replace"):
+                index = operation["index"]
+                data[index] = {"title": chapters[index].title}
+            elif op == "move":
+                data.insert(operation["to"], data.pop(operation["from"]))
+            elif op == "clear":
+                data.clear()
 
 
 class BookBuilderRoot(BoxLayout):
     def __init__(self, **kwargs):
         super().__init__(orientation="vertical", **kwargs)
+        # Importing the window module creates the window; only do that once
+        # the app is actually running, not when the module is imported.
+        from kivy.core.window import Window
+
         Window.minimum_width = 720
         Window.minimum_height = 640
 
-        self.chapters = []
+        # Every edit is appended to the autosave journal; a crashed session
+        # is restored from it on the next start.
+        data_dir = App.get_running_app().user_data_dir or os.getcwd()
+        self.book = InteractiveBook.open_journaled(os.path.join(data_dir, "autosave"))
+        self.book.enable_history(depth=UNDO_DEPTH)
+        self.preview = None
         self._build_ui()
+        self._show_recovered_book()
+        Clock.schedule_interval(self._autosave_tick, AUTOSAVE_SYNC_SECONDS)
+
+    def _show_recovered_book(self):
+        self.title_input.text = self.book.title
+        self.author_input.text = self.book.author
+        self._refresh_chapter_list()
+
+    def _autosave_tick(self, _dt):
+        self.book.journal.sync()
+
+    def close_journal(self):
+        if self.preview is not None:
+            self.preview.stop()
+        self.book.set_meta(self.title_input.text.strip(), self.author_input.text.strip())
+        self.book.compact()
+        self.book.journal.close()
 
     def _build_ui(self):
         # Book meta
@@ -72,16 +168,26 @@ class BookBuilderRoot(BoxLayout):
         actions.add_widget(Button(text="Reset", on_release=self._reset))
         self.add_widget(actions)
 
+        history_actions = BoxLayout(orientation="horizontal", padding=8, spacing=6, size_hint_y=None, height=44)
+        self.undo_button = Button(text="Undo", on_release=self._undo, disabled=True)
+        self.redo_button = Button(text="Redo", on_release=self._redo, disabled=True)
+        history_actions.add_widget(self.undo_button)
+        history_actions.add_widget(self.redo_button)
+        self.add_widget(history_actions)
+
         # Chapter list
-        list_label = Label(text="Chapters", size_hint_y=None, height=24)
-        self.add_widget(list_label)
+        self.list_label = Label(text="No chapters yet", size_hint_y=None, height=24)
+        self.add_widget(self.list_label)
 
-        self.chapters_list = GridLayout(cols=1, spacing=4, size_hint_y=None)
-        self.chapters_list.bind(minimum_height=self.chapters_list.setter("height"))
+        search_row = BoxLayout(orientation="horizontal", padding=8, spacing=6, size_hint_y=None, height=44)
+        self.search_input = TextInput(multiline=False, hint_text="Search chapters")
+        self.search_input.bind(on_text_validate=self._search)
+        search_row.add_widget(self.search_input)
+        search_row.add_widget(Button(text="Search", size_hint_x=0.3, on_release=self._search))
+        self.add_widget(search_row)
 
-        scroll = ScrollView(size_hint=(1, 1))
-        scroll.add_widget(self.chapters_list)
-        self.add_widget(scroll)
+        self.chapters_list = ChapterListView(size_hint=(1, 1))
+        self.add_widget(self.chapters_list)
 
         # Export actions
         export_actions = BoxLayout(orientation="horizontal", padding=8, spacing=6, size_hint_y=None, height=44)
@@ -91,6 +197,9 @@ class BookBuilderRoot(BoxLayout):
         self.add_widget(export_actions)
 
     def _browse_image(self, _instance):
+        # The file chooser pulls in a lot of modules; load it on first use.
+        from kivy.uix.filechooser import FileChooserListView
+
         chooser = FileChooserListView(filters=["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp"], path="/")
 
         def select_path(_btn):
@@ -120,18 +229,23 @@ class BookBuilderRoot(BoxLayout):
             self._show_message("Missing content", "Please enter chapter content.")
             return
 
-        self.chapters.append({"title": title, "content": content, "image": image})
-        self._refresh_chapter_list()
+        self.book.set_meta(self.title_input.text.strip(), self.author_input.text.strip())
+        chapter = self.book.add_chapter(title, content, image)
+        self.chapters_list.append_chapter(chapter)
+        self._update_list_label()
+        self._update_undo_buttons()
 
         self.chapter_title_input.text = ""
         self.chapter_content_input.text = ""
         self.image_path_input.text = ""
 
     def _remove_last(self, _instance):
-        if not self.chapters:
+        if not self.book.chapters:
             return
-        self.chapters.pop()
-        self._refresh_chapter_list()
+        self.book.remove_chapter(-1)
+        self.chapters_list.remove_chapter(-1)
+        self._update_list_label()
+        self._update_undo_buttons()
 
     def _reset(self, _instance):
         self.title_input.text = ""
@@ -139,17 +253,56 @@ class BookBuilderRoot(BoxLayout):
         self.chapter_title_input.text = ""
         self.chapter_content_input.text = ""
         self.image_path_input.text = ""
-        self.chapters = []
-        self._refresh_chapter_list()
+        # Clearing is recorded in the journal like any other edit and can be undone
+        self.book.clear()
+        self.chapters_list.apply_operations([{"op": "clear"}], self.book.chapters)
+        self._update_list_label()
+        self._update_undo_buttons()
+
+    def _undo(self, _instance):
+        # The version being undone carries the inverse journal operations;
+        # only the rows they touch are updated.
+        history = self.book.history
+        operations = history.current.inverse if history.can_undo() else None
+        if self.book.undo():
+            self._show_history_step(operations)
+
+    def _redo(self, _instance):
+        history = self.book.history
+        operations = history.versions[history.position + 1].forward if history.can_redo() else None
+        if self.book.redo():
+            self._show_history_step(operations)
+
+    def _show_history_step(self, operations):
+        self.title_input.text = self.book.title
+        self.author_input.text = self.book.author
+        self.chapters_list.apply_operations(operations, self.book.chapters)
+        self._update_list_label()
+        self._update_undo_buttons()
 
     def _refresh_chapter_list(self):
-        self.chapters_list.clear_widgets()
-        if not self.chapters:
-            self.chapters_list.add_widget(Label(text="No chapters yet", size_hint_y=None, height=24))
+        self.chapters_list.set_chapters(self.book.chapters)
+        self._update_list_label()
+        self._update_undo_buttons()
+
+    def _update_list_label(self):
+        count = len(self.book.chapters)
+        self.list_label.text = f"Chapters ({count})" if count else "No chapters yet"
+
+    def _update_undo_buttons(self):
+        self.undo_button.disabled = not self.book.can_undo()
+        self.redo_button.disabled = not self.book.can_redo()
+
+    def _search(self, _instance):
+        query = self.search_input.text.strip()
+        if not query:
             return
-        for index, chapter in enumerate(self.chapters, 1):
-            label = Label(text=f"{index}. {chapter['title']}", size_hint_y=None, height=24)
-            self.chapters_list.add_widget(label)
+        results = self.book.search(query)
+        if not results:
+            self._show_message("Search", f"No chapters found for: {query}")
+            return
+        lines = [f"{index + 1}. {chapter.title}" for index, chapter in results]
+        self._show_message("Search", "\n".join(lines))
 
     def _create_book(self):
         title = self.title_input.text.strip()
@@ -158,16 +311,16 @@ class BookBuilderRoot(BoxLayout):
         if not title or not author:
             self._show_message("Missing data", "Please enter both title and author.")
             return None
-        if not self.chapters:
+        if not self.book.chapters:
             self._show_message("No chapters", "Please add at least one chapter.")
             return None
 
-        book = InteractiveBook(title=title, author=author)
-        for chapter in self.chapters:
-            book.add_chapter(chapter["title"], chapter["content"], chapter.get("image"))
-        return book
+        self.book.set_meta(title, author)
+        return self.book
 
     def _choose_save_path(self, title, default_name, extension, on_save):
+        from kivy.uix.filechooser import FileChooserListView
+
         start_dir = App.get_running_app().user_data_dir or os.getcwd()
         chooser = FileChooserListView(path=start_dir)
         filename_input = TextInput(text=default_name, multiline=False, size_hint_y=None, height=36)
@@ -249,24 +402,68 @@ class BookBuilderRoot(BoxLayout):
         )
 
     def _preview_html(self, _instance):
+        # A local server renders each page on request from the book in
+        # memory instead of exporting the whole book on every click; open
+        # pages reload themselves when their chapter changes.
         book = self._create_book()
         if not book:
             return
-        out_dir = App.get_running_app().user_data_dir or os.getcwd()
-        path = os.path.join(out_dir, "preview_book.html")
-        book.save_to_html(path)
+        import webbrowser
+
         try:
-            webbrowser.open(f"file://{path}")
-            self._show_message("Preview", f"Opened preview:\n{path}")
+            if self.preview is None:
+                from book_preview import PreviewServer
+
+                self.preview = PreviewServer(book).start()
+            webbrowser.open(self.preview.url)
+            self._show_message("Preview", f"Preview running at:\n{self.preview.url}")
         except Exception as exc:
             self._show_message("Preview failed", str(exc))
 
     def _save_book(self, book, path, kind):
-        if kind == "json":
-            book.save_to_json(path)
-        else:
-            book.save_to_html(path)
-        self._show_message("Saved", f"Saved to: {path}")
+        def export(snapshot, progress):
+            snapshot.export(kind, path, progress=progress)
+
+        self._run_export(book, export, lambda: self._show_message("Saved", f"Saved to: {path}"))
+
+    def _run_export(self, book, export, on_done):
+        # Export a snapshot on a worker thread; progress is polled via Clock so
+        # that all widget updates stay on the UI thread.
+        snapshot = book.copy()
+        job = ExportJob(lambda progress: export(snapshot, progress), snapshot).start()
+
+        from kivy.uix.progressbar import ProgressBar
+
+        progress_bar = ProgressBar(max=1, value=0)
+        status = Label(text="Exporting ...")
+
+        def cancel(_btn):
+            job.cancel()
+            status.text = "Cancelling ..."
+
+        content = BoxLayout(orientation="vertical", padding=8, spacing=6)
+        content.add_widget(status)
+        content.add_widget(progress_bar)
+        content.add_widget(Button(text="Cancel", size_hint_y=None, height=40, on_release=cancel))
+        popup = Popup(title="Export", content=content, size_hint=(0.8, 0.4), auto_dismiss=False)
+        popup.open()
+
+        def poll(_dt):
+            done, total = job.progress
+            progress_bar.max = max(total, 1)
+            progress_bar.value = done
+            if not job.done:
+                return True
+            popup.dismiss()
+            if job.cancelled:
+                self._show_message("Export cancelled", "The export was cancelled.")
+            elif job.error is not None:
+                self._show_message("Export failed", str(job.error))
+            else:
+                on_done()
+            return False
+
+        Clock.schedule_interval(poll, PROGRESS_POLL_SECONDS)
 
     def _show_message(self, title, message):
         content = BoxLayout(orientation="vertical", padding=8, spacing=6)
@@ -281,6 +478,9 @@ class BookBuilderApp(App):
         self.title = "Interactive Book Builder"
         return BookBuilderRoot()
 
+    def on_stop(self):
+        self.root.close_journal()
+
 
 def main():
     BookBuilderApp().run()
@@ -0,0 +1,138 @@
+"""Asset-Pipeline: Abmessungen, Deduplizierung, Cache, Varianten und beschädigte Bilder"""
+
+import os
+import struct
+import sys
+import types
+import zlib
+
+import pytest
+
+import book_assets
+from book_assets import AssetPipeline, detect_image_type, image_size
+from book_builder import InteractiveBook
+
+
+def _png(width: int, height: int) -> bytes:
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    raw = b"".join(b"\0" + b"\0\0\0" * width for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+def _write(path, data: bytes) -> str:
+    path.write_bytes(data)
+    return str(path)
+
+
+class _FakeImage:
+    """Genug von PIL.Image für _make_variants; liest die Größe aus dem PNG-Kopf"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if b"IEND" not in data:
+            raise OSError(f"cannot identify image file {path!r}")
+        self.width, self.height = image_size(path)
+        self.format = "PNG"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def resize(self, size):
+        return types.SimpleNamespace(save=lambda target, format: open(target, 'wb').write(_png(*size)))
+
+
+@pytest.fixture
+def fake_pillow(monkeypatch):
+    pil = types.ModuleType("PIL")
+    pil.Image = types.SimpleNamespace(open=_FakeImage)
+    monkeypatch.setitem(sys.modules, "PIL", pil)
+    return pil
+
+
+def test_image_size_and_type(tmp_path):
+    png = _write(tmp_path / "a.png", _png(30, 20))
+    gif = _write(tmp_path / "b.gif", b"GIF89a" + struct.pack("<HH", 7, 9) + b"\0" * 20)
+    assert image_size(png) == (30, 20)
+    assert image_size(gif) == (7, 9)
+    assert detect_image_type(png) == ".png"
+    assert detect_image_type(str(tmp_path / "fehlt.png")) is None
+    assert image_size("mit\0nullbyte.png") is None
+
+
+def test_identical_images_are_stored_once(tmp_path):
+    data = _png(4, 4)
+    first = _write(tmp_path / "eins.png", data)
+    second = _write(tmp_path / "zwei.png", data)
+    other = _write(tmp_path / "drei.png", _png(5, 5))
+    pipeline = AssetPipeline(str(tmp_path / "out"), variant_widths=())
+    mapping = pipeline.process([first, second, other, first, None])
+
+    assert mapping[first] == mapping[second] != mapping[other]
+    stored = [name for name in os.listdir(pipeline.assets_dir) if name.endswith(".png")]
+    assert len(stored) == 2
+    assert pipeline.sizes[mapping[other]] == (5, 5)
+
+
+def test_missing_and_unknown_images_are_skipped(tmp_path):
+    text = _write(tmp_path / "notiz.png", b"kein Bild")
+    pipeline = AssetPipeline(str(tmp_path / "out"))
+    mapping = pipeline.process([str(tmp_path / "fehlt.png"), text])
+    assert mapping == {}
+    assert len(pipeline.warnings) == 2
+
+
+def test_cache_skips_unchanged_images(tmp_path, monkeypatch):
+    image = _write(tmp_path / "bild.png", _png(4, 4))
+    output = str(tmp_path / "out")
+    first = AssetPipeline(output).process([image])
+
+    def no_hashing(path):
+        raise AssertionError("unverändertes Bild erneut gehasht")
+    monkeypatch.setattr(book_assets, "_hash_file", no_hashing)
+    assert AssetPipeline(output).process([image]) == first
+
+
+def test_variants_are_used_for_large_images(tmp_path, fake_pillow):
+    image = _write(tmp_path / "gross.png", _png(1000, 500))
+    pipeline = AssetPipeline(str(tmp_path / "out"), variant_widths=(400, 800, 2000), display_width=800)
+    mapping = pipeline.process([image])
+    assert mapping[image].endswith("_800.png")
+    assert pipeline.sizes[mapping[image]] == (800, 400)
+    assert os.path.exists(os.path.join(str(tmp_path / "out"), mapping[image].replace("_800", "_400")))
+
+
+def test_corrupt_image_falls_back_to_original(tmp_path, fake_pillow):
+    good = _write(tmp_path / "gut.png", _png(1000, 500))
+    # Signatur und Kopf stimmen, der Rest fehlt
+    corrupt = _write(tmp_path / "kaputt.png", _png(1000, 500)[:40])
+    pipeline = AssetPipeline(str(tmp_path / "out"), variant_widths=(400,))
+    mapping = pipeline.process([corrupt, good])
+
+    assert mapping[good].endswith("_400.png")
+    assert mapping[corrupt].endswith(".png") and "_" not in mapping[corrupt]
+    assert os.path.exists(os.path.join(str(tmp_path / "out"), mapping[corrupt]))
+    assert any("kaputt.png" in warning for warning in pipeline.warnings)
+    assert not [name for name in os.listdir(pipeline.assets_dir) if name.endswith(".tmp")]
+
+
+def test_corrupt_image_with_pillow(tmp_path):
+    pytest.importorskip("PIL")
+    corrupt = _write(tmp_path / "kaputt.png", _png(1000, 500)[:40])
+    pipeline = AssetPipeline(str(tmp_path / "out"), variant_widths=(400,))
+    assert corrupt in pipeline.process([corrupt])
+    assert pipeline.warnings
+
+
+def test_html_export_survives_corrupt_image(tmp_path, fake_pillow):
+    corrupt = _write(tmp_path / "kaputt.png", _png(1000, 500)[:40])
+    book = InteractiveBook("Titel", "Autor")
+    book.add_chapter("Eins", "Text", corrupt)
+    book.save_to_html(str(tmp_path / "buch.html"), assets=True)
+    html = (tmp_path / "buch.html").read_text(encoding="utf-8")
+    assert 'src="assets/' in html
@@ -0,0 +1,95 @@
+"""Stapel-Build: Manifest, inkrementelles Überspringen und Fehlerbehandlung"""
+
+import json
+import os
+
+from book_batch import MANIFEST_NAME, build_all, load_manifest, main
+
+
+def _spec(directory, name: str, chapters=1, **build):
+    data = {"title": name, "author": "Autor",
+            "chapters": [{"title": f"K{i}", "content": f"Text {i}"} for i in range(chapters)]}
+    if build:
+        data["build"] = build
+    path = directory / (name + ".json")
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return path
+
+
+def _statuses(results):
+    return {result["name"]: result["status"] for result in results}
+
+
+def test_unchanged_books_are_skipped(tmp_path):
+    specs, output = tmp_path / "specs", tmp_path / "dist"
+    specs.mkdir()
+    _spec(specs, "a")
+    _spec(specs, "b", formats=["json", "html"])
+    lines = []
+    first = build_all(str(specs), str(output), workers=1, report=lines.append)
+    assert _statuses(first) == {"a": "built", "b": "built"}
+    assert sorted(os.listdir(output)) == sorted([MANIFEST_NAME, "a.html", "b.html", "b.json"])
+    assert len(lines) == 2
+
+    manifest = load_manifest(str(output))
+    assert set(manifest) == {"a.json", "b.json"}
+    assert manifest["b.json"]["outputs"] == sorted([str(output / "b.html"), str(output / "b.json")])
+
+    assert _statuses(build_all(str(specs), str(output), workers=1, report=lambda line: None)) == {
+        "a": "skipped", "b": "skipped"}
+
+
+def test_changed_spec_or_missing_output_is_rebuilt(tmp_path):
+    specs, output = tmp_path / "specs", tmp_path / "dist"
+    specs.mkdir()
+    _spec(specs, "a")
+    _spec(specs, "b")
+    build_all(str(specs), str(output), workers=1, report=lambda line: None)
+
+    _spec(specs, "a", chapters=2)
+    os.remove(output / "b.html")
+    assert _statuses(build_all(str(specs), str(output), workers=1, report=lambda line: None)) == {
+        "a": "built", "b": "built"}
+    assert _statuses(build_all(str(specs), str(output), workers=1, force=True, report=lambda line: None)) == {
+        "a": "built", "b": "built"}
+
+
+def test_other_formats_change_the_hash(tmp_path):
+    specs, output = tmp_path / "specs", tmp_path / "dist"
+    specs.mkdir()
+    _spec(specs, "a")
+    build_all(str(specs), str(output), ["html"], workers=1, report=lambda line: None)
+    results = build_all(str(specs), str(output), ["html", "json"], workers=1, report=lambda line: None)
+    assert _statuses(results) == {"a": "built"}
+
+
+def test_failed_book_is_not_recorded(tmp_path):
+    specs, output = tmp_path / "specs", tmp_path / "dist"
+    (specs / "unter").mkdir(parents=True)
+    _spec(specs / "unter", "gut")
+    (specs / "kaputt.json").write_text('{"title": "x", "chapters": [', encoding="utf-8")
+    lines = []
+    results = build_all(str(specs), str(output), workers=1, report=lines.append)
+    assert _statuses(results) == {"kaputt": "failed", "unter__gut": "built"}
+    assert set(load_manifest(str(output))) == {"unter/gut.json"}
+    assert any("FEHLER" in line for line in lines)
+
+
+def test_outdated_manifest_version_is_ignored(tmp_path):
+    (tmp_path / MANIFEST_NAME).write_text(json.dumps({"version": -1, "books": {"a.json": {}}}), encoding="utf-8")
+    assert load_manifest(str(tmp_path)) == {}
+    (tmp_path / MANIFEST_NAME).write_text("kein json", encoding="utf-8")
+    assert load_manifest(str(tmp_path)) == {}
+
+
+def test_parallel_build_and_exit_code(tmp_path, capsys):
+    specs, output = tmp_path / "specs", tmp_path / "dist"
+    specs.mkdir()
+    for name in ("a", "b", "c"):
+        _spec(specs, name)
+    assert main([str(specs), "--output", str(output), "--workers", "2", "--formats", "json"]) == 0
+    assert "3 gebaut, 0 übersprungen, 0 fehlgeschlagen" in capsys.readouterr().out
+
+    (specs / "d.json").write_text("[]", encoding="utf-8")
+    assert main([str(specs), "--output", str(output), "--workers", "1", "--formats", "json"]) == 1
+    assert "0 gebaut, 3 übersprungen, 1 fehlgeschlagen" in capsys.readouterr().out
@@ -0,0 +1,87 @@
+"""Bündel-Export: HTML-/CSS-Minifizierer, gemeinsames Stylesheet und gzip-Dateien"""
+
+import gzip
+import os
+
+from book_builder import InteractiveBook
+from book_bundle import BundleReport, minify_css, minify_html, precompress, save_bundle, stylesheet_name
+
+
+def test_minify_html_collapses_whitespace_between_blocks():
+    html = "<div>\n    <p>  Ein   <em>kurzer</em>\n Text </p>\n</div>\n"
+    assert minify_html(html) == "<div><p>Ein <em>kurzer</em> Text</p></div>"
+
+
+def test_minify_html_keeps_inline_spacing_and_nbsp():
+    assert minify_html("<p><b>a</b> <i>b</i>  c</p>") == "<p><b>a</b> <i>b</i>  c</p>"
+    assert minify_html("a <span> b </span> c") == "a <span> b </span> c"
+
+
+def test_minify_html_leaves_raw_elements_alone():
+    html = "<div>\n<pre>  eingerückt\n    Code </pre>\n<script>var a  =  1;\n</script>\n<textarea> x  y </textarea></div>"
+    assert minify_html(html) == ("<div><pre>  eingerückt\n    Code </pre><script>var a  =  1;\n</script>"
+                                 "<textarea> x  y </textarea></div>")
+
+
+def test_minify_css():
+    css = """/* Kommentar */
+    body {
+        font-family: "Times  New Roman", serif;
+        margin : 0 ;
+    }
+    a > b , c { content: '  {;} ' }
+    """
+    assert minify_css(css) == 'body{font-family:"Times  New Roman",serif;margin :0}a>b,c{content:\'  {;} \'}'
+    assert minify_html("<style>\n p { color: red; }\n</style>\n<p>x</p>") == "<style>p{color:red}</style><p>x</p>"
+
+
+def test_precompress_is_reproducible(tmp_path):
+    path = tmp_path / "a.html"
+    path.write_text("<p>Hallo</p>" * 100, encoding="utf-8")
+    size = precompress(str(path))
+    first = (tmp_path / "a.html.gz").read_bytes()
+    assert size == len(first) < path.stat().st_size
+    precompress(str(path))
+    assert (tmp_path / "a.html.gz").read_bytes() == first
+    assert gzip.decompress(first) == path.read_bytes()
+
+
+def _book(title: str) -> InteractiveBook:
+    book = InteractiveBook(title, "Autor")
+    book.add_chapters([("Eins", "Erster   Absatz\n\nZweiter Absatz"), ("Zwei", "Text")])
+    return book
+
+
+def test_books_share_one_stylesheet(tmp_path, capsys):
+    report = BundleReport()
+    save_bundle(_book("A"), str(tmp_path / "a.min.html"), report=report)
+    save_bundle(_book("B"), str(tmp_path / "b.min.html"), report=report, search=True)
+    assert "Gespart:" in capsys.readouterr().out
+
+    styles = os.listdir(tmp_path / "styles")
+    assert len([name for name in styles if name.endswith(".css")]) == 1
+    css_name = next(name for name in styles if name.endswith(".css"))
+    assert css_name + ".gz" in styles
+    assert css_name == stylesheet_name((tmp_path / "styles" / css_name).read_text(encoding="utf-8"))
+
+    html = (tmp_path / "b.min.html").read_text(encoding="utf-8")
+    assert f'href="styles/{css_name}"' in html and "<style>" not in html
+    assert "Erster Absatz" in html and "\n    " not in html[:html.index("<script")]
+    # a.min.html, Stylesheet, b.min.html, Suchindex
+    assert len(report.files) == 4
+    assert report.size < report.original and report.compressed < report.size
+    assert (tmp_path / "b.min.search.js.gz").exists()
+
+
+def test_bundle_without_minify_and_compress(tmp_path, capsys):
+    report = save_bundle(_book("A"), str(tmp_path / "a.html"), minify=False, compress=False)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".gz")]
+    assert report.compressed == report.size
+    assert "Erster   Absatz" in (tmp_path / "a.html").read_text(encoding="utf-8")
+
+
+def test_bundle_exporter(tmp_path, capsys):
+    book = _book("A")
+    report = book.export("bundle", str(tmp_path / "a.min.html"))
+    assert isinstance(report, BundleReport)
+    assert (tmp_path / "a.min.html.gz").exists()
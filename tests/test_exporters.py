@@ -0,0 +1,47 @@
+"""Exporter-Registry: eingebaute Formate und Plugins über Entry-Points"""
+
+import importlib.metadata
+from types import SimpleNamespace
+
+import pytest
+
+import book_builder
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(book_builder, "EXPORTERS", dict(book_builder.EXPORTERS))
+    monkeypatch.setattr(book_builder, "_discovered", False)
+    return book_builder.EXPORTERS
+
+
+def _plugin():
+    return SimpleNamespace(name="plugin", value="plugin_modul:exportiere")
+
+
+def test_entry_points_with_group_keyword(registry, monkeypatch):
+    def entry_points(group=None):
+        return [_plugin()] if group == book_builder.EXPORTER_ENTRY_POINTS else []
+    monkeypatch.setattr(importlib.metadata, "entry_points", entry_points)
+    assert "plugin" in book_builder.available_exporters()
+    assert registry["plugin"].target == "plugin_modul:exportiere"
+
+
+def test_entry_points_dictionary_api(registry, monkeypatch):
+    # Python 3.8/3.9: kein group-Argument, Ergebnis nach Gruppen
+    def entry_points():
+        return {book_builder.EXPORTER_ENTRY_POINTS: (_plugin(),), "andere": ()}
+    monkeypatch.setattr(importlib.metadata, "entry_points", entry_points)
+    assert "plugin" in book_builder.available_exporters()
+
+
+def test_unknown_exporter(registry, monkeypatch):
+    monkeypatch.setattr(importlib.metadata, "entry_points", lambda: {})
+    with pytest.raises(ValueError):
+        book_builder.get_exporter("gibt_es_nicht")
+
+
+def test_builtin_exporters(registry):
+    for name in ("json", "html", "pages", "reader", "pack", "store", "bundle"):
+        assert name in registry
+    assert registry["bundle"].target == "book_bundle:save_bundle"
@@ -0,0 +1,88 @@
+"""Fragment-Cache des HTML-Exports: Wiederverwendung, Invalidierung und Persistenz"""
+
+from book_builder import Chapter, HtmlFragmentCache, InteractiveBook
+from book_templates import DEFAULT_TEMPLATES, Theme
+
+
+def _book(count: int = 5) -> InteractiveBook:
+    book = InteractiveBook("Titel", "Autor")
+    for i in range(count):
+        book.add_chapter(f"Kapitel {i}", f"Text *{i}*")
+    return book
+
+
+def _fresh_html(book: InteractiveBook, path) -> str:
+    """Export mit leerem Cache als Vergleich"""
+    copy = InteractiveBook(book.title, book.author)
+    copy.chapters = [chapter.replace() for chapter in book.chapters]
+    copy.theme = book.theme
+    copy.save_to_html(str(path))
+    return path.read_text(encoding="utf-8")
+
+
+def test_second_export_uses_cache(tmp_path):
+    book = _book()
+    output = tmp_path / "buch.html"
+    book.save_to_html(str(output))
+    first = output.read_text(encoding="utf-8")
+    assert book.fragment_cache.misses == 5 and book.dirty_chapters() == []
+
+    book.save_to_html(str(output))
+    assert book.fragment_cache.hits == 5 and book.fragment_cache.misses == 5
+    assert output.read_text(encoding="utf-8") == first
+
+
+def test_insert_and_edit_render_only_changed_chapters(tmp_path):
+    book = _book()
+    output = tmp_path / "buch.html"
+    book.save_to_html(str(output))
+
+    book.insert_chapter(0, Chapter("Neu", "Vorne eingefügt"))
+    book.edit_chapter(3, content="Geändert")
+    assert book.dirty_chapters() == [0, 3]
+    misses = book.fragment_cache.misses
+    book.save_to_html(str(output))
+    assert book.fragment_cache.misses == misses + 2
+    # Nummern stehen nicht im Fragment und stimmen trotz Wiederverwendung
+    assert output.read_text(encoding="utf-8") == _fresh_html(book, tmp_path / "frisch.html")
+
+
+def test_removed_chapters_are_pruned(tmp_path):
+    book = _book()
+    book.save_to_html(str(tmp_path / "buch.html"))
+    book.remove_chapter(0)
+    book.save_to_html(str(tmp_path / "buch.html"))
+    assert len(book.fragment_cache) == 4
+
+
+def test_theme_change_invalidates_fragments(tmp_path):
+    book = _book(2)
+    book.save_to_html(str(tmp_path / "buch.html"))
+    chapter = DEFAULT_TEMPLATES["chapter"].replace('class="chapter"', 'class="chapter anders"')
+    book.set_theme(Theme("anders", {"chapter": chapter}))
+    assert book.dirty_chapters() == [0, 1]
+    book.save_to_html(str(tmp_path / "buch.html"))
+    assert 'class="chapter anders"' in (tmp_path / "buch.html").read_text(encoding="utf-8")
+
+
+def test_persisted_cache_is_reused(tmp_path):
+    output = tmp_path / "buch.html"
+    _book().save_to_html(str(output), persist_cache=True)
+    assert (tmp_path / "buch.html.cache.json").exists()
+
+    book = _book()
+    book.save_to_html(str(output), persist_cache=True)
+    assert book.fragment_cache.hits == 5 and book.fragment_cache.misses == 0
+
+
+def test_cache_with_other_version_is_ignored(tmp_path, monkeypatch):
+    cache = HtmlFragmentCache()
+    cache.fragments["schluessel"] = "<div></div>"
+    filename = str(tmp_path / "cache.json")
+    cache.save(filename)
+
+    assert HtmlFragmentCache().load(filename)
+    monkeypatch.setattr(HtmlFragmentCache, "VERSION", HtmlFragmentCache.VERSION + 1)
+    other = HtmlFragmentCache()
+    assert not other.load(filename) and len(other) == 0
+    assert not HtmlFragmentCache().load(str(tmp_path / "fehlt.json"))
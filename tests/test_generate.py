@@ -0,0 +1,166 @@
+"""KI-Generierung: Reihenfolge, Nebenläufigkeit, Wiederholungen, Cache und HTTP-Backend"""
+
+import asyncio
+import http.server
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from book_builder import InteractiveBook
+from book_generate import (GenerationBackend, GenerationEngine, GenerationError, GenerationRequest,
+                           HttpBackend, PromptCache, StubBackend, TokenBucket, TransientGenerationError,
+                           expand_prompt, generate_chapters, get_backend)
+
+
+def _requests(count: int):
+    return [GenerationRequest(f"Kapitel {i}", f"Prompt {i}") for i in range(count)]
+
+
+class _CountingBackend(GenerationBackend):
+    name = "zaehler"
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+
+    async def generate(self, prompt: str) -> str:
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return prompt.upper()
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        GenerationBackend()
+    with pytest.raises(ValueError):
+        get_backend("gibt-es-nicht")
+
+
+def test_chapters_keep_request_order():
+    book = InteractiveBook("Titel", "Autor")
+    book.add_chapter("Vorwort", "schon da")
+    results = generate_chapters(book, _requests(8), StubBackend(delay=0.01), concurrency=8)
+    assert [c.title for c in book.chapters] == ["Vorwort"] + [f"Kapitel {i}" for i in range(8)]
+    assert all(result.ok for result in results)
+    assert book.chapters[1].content == asyncio.run(StubBackend().generate("Prompt 0"))
+
+
+def test_concurrency_limit():
+    backend = _CountingBackend()
+    generate_chapters(InteractiveBook("T", "A"), _requests(10), backend, concurrency=3)
+    assert backend.peak == 3
+
+
+def test_transient_errors_are_retried():
+    book = InteractiveBook("Titel", "Autor")
+    backend = StubBackend(failures=2)
+    results = generate_chapters(book, _requests(2), backend, retries=3, backoff=0.001)
+    assert [result.attempts for result in results] == [3, 3]
+    assert len(book.chapters) == 2
+
+    book = InteractiveBook("Titel", "Autor")
+    results = generate_chapters(book, _requests(2), StubBackend(failures=5), retries=1, backoff=0.001)
+    assert all(isinstance(result.error, TransientGenerationError) for result in results)
+    assert book.chapters == []
+
+
+def test_duplicate_prompts_are_sent_once():
+    backend = StubBackend(delay=0.01)
+    requests = [GenerationRequest("A", "gleich"), GenerationRequest("B", "gleich")]
+    book = InteractiveBook("Titel", "Autor")
+    results = generate_chapters(book, requests, backend)
+    assert backend.calls == 1
+    assert book.chapters[0].content == book.chapters[1].content
+    assert [result.cached for result in results] == [False, True]
+
+
+def test_cache_avoids_repeated_calls(tmp_path):
+    cache = PromptCache(str(tmp_path))
+    backend = StubBackend()
+    generate_chapters(InteractiveBook("T", "A"), _requests(3), backend, cache=cache)
+    assert backend.calls == 3 and len(cache) == 3
+
+    results = generate_chapters(InteractiveBook("T", "A"), _requests(3), backend, cache=PromptCache(str(tmp_path)))
+    assert backend.calls == 3 and all(result.cached for result in results)
+    # Anderes Backend (anderer Fingerabdruck) nutzt den Cache nicht
+    other = StubBackend(paragraphs=1)
+    generate_chapters(InteractiveBook("T", "A"), _requests(1), other, cache=PromptCache(str(tmp_path)))
+    assert other.calls == 1
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = PromptCache(str(tmp_path), max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert sorted(name[:-4] for name in os.listdir(tmp_path)) == ["a", "c"]
+
+    small = PromptCache(str(tmp_path / "klein"), max_bytes=10)
+    small.put("x", "12345678")
+    small.put("y", "12345678")
+    assert len(small) == 1 and small.get("y") == "12345678"
+
+
+def test_expand_replaces_content():
+    book = InteractiveBook("Titel", "Autor")
+    book.add_chapter("Eins", "kurz")
+    request = GenerationRequest("Eins", expand_prompt(book, 0), expand=0)
+    generate_chapters(book, [request])
+    assert len(book.chapters) == 1 and book.chapters[0].content != "kurz"
+
+
+def test_token_bucket_limits_rate():
+    async def run():
+        bucket = TokenBucket(rate=50, capacity=1)
+        started = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        return time.monotonic() - started
+    # Ein Token sofort, die übrigen fünf im Abstand von 20 ms
+    assert asyncio.run(run()) >= 0.09
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    status = 200
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        reply = json.dumps({"choices": [{"message": {"content": " Antwort: " + body["messages"][1]["content"]}}]})
+        self.send_response(self.status)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(reply.encode("utf-8"))
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.HTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    _Handler.status = 200
+
+
+def test_http_backend(server):
+    backend = HttpBackend(f"http://127.0.0.1:{server.server_port}/v1/chat/completions", "modell")
+    assert asyncio.run(backend.generate("Hallo")) == "Antwort: Hallo"
+
+    _Handler.status = 503
+    with pytest.raises(TransientGenerationError):
+        asyncio.run(backend.generate("Hallo"))
+    _Handler.status = 400
+    with pytest.raises(GenerationError) as info:
+        asyncio.run(backend.generate("Hallo"))
+    assert not isinstance(info.value, TransientGenerationError)
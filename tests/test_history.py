@@ -0,0 +1,161 @@
+"""Rückgängig/Wiederholen: persistenter Vektor, Verlauf und Abgleich von Suche und Journal"""
+
+import random
+
+import pytest
+
+from book_builder import Chapter, InteractiveBook
+from book_history import PersistentVector, VersionedList
+
+
+def _snapshot(book: InteractiveBook):
+    return book.title, book.author, [(c.title, c.content, c.image) for c in book.chapters]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_persistent_vector_matches_list(seed):
+    rng = random.Random(seed)
+    expected = list(range(rng.randint(0, 300)))
+    vector = PersistentVector(expected)
+    versions = [(vector, list(expected))]
+    for step in range(600):
+        action = rng.random()
+        if action < 0.4 or not expected:
+            index = rng.randint(-5, len(expected) + 5)
+            vector = vector.insert(index, step)
+            expected.insert(index, step)
+        elif action < 0.7:
+            index = rng.randrange(len(expected))
+            vector = vector.delete(index)
+            del expected[index]
+        elif action < 0.9:
+            index = rng.randrange(len(expected))
+            vector = vector.set(index, -step)
+            expected[index] = -step
+        else:
+            items = list(range(rng.randint(0, 150)))
+            vector = vector.extend(items)
+            expected.extend(items)
+        versions.append((vector, list(expected)))
+    # Alte Versionen bleiben unverändert gültig
+    for old, items in versions[::50]:
+        assert list(old) == items and len(old) == len(items)
+        if items:
+            start = len(items) // 3
+            assert list(old.iter_from(start)) == items[start:]
+            assert old[-1] == items[-1]
+
+
+def test_versioned_list_slices():
+    items = VersionedList(range(200))
+    assert items[10:15] == [10, 11, 12, 13, 14]
+    assert items[::50] == [0, 50, 100, 150]
+    del items[:100]
+    assert len(items) == 100 and items[0] == 100
+    with pytest.raises(IndexError):
+        items[100]
+
+
+def test_undo_redo_restores_every_step():
+    book = InteractiveBook("Titel", "Autor")
+    book.add_chapters([("A", "a"), ("B", "b")])
+    book.enable_history()
+    states = [_snapshot(book)]
+    book.add_chapter("C", "c")
+    states.append(_snapshot(book))
+    book.edit_chapter(0, content="neu")
+    states.append(_snapshot(book))
+    book.move_chapter(2, 0)
+    states.append(_snapshot(book))
+    book.remove_chapter(1)
+    states.append(_snapshot(book))
+    book.set_meta(title="Anders")
+    states.append(_snapshot(book))
+    book.clear()
+    states.append(_snapshot(book))
+
+    for state in reversed(states[:-1]):
+        assert book.undo() is not None
+        assert _snapshot(book) == state
+    assert book.undo() is None
+    for state in states[1:]:
+        book.redo()
+        assert _snapshot(book) == state
+    assert book.redo() is None
+
+
+def test_new_change_drops_redo_steps():
+    book = InteractiveBook("Titel", "Autor")
+    book.enable_history()
+    book.add_chapter("A", "a")
+    book.add_chapter("B", "b")
+    book.undo()
+    assert book.can_redo()
+    book.add_chapter("C", "c")
+    assert not book.can_redo()
+    assert [c.title for c in book.chapters] == ["A", "C"]
+
+
+def test_depth_and_memory_limits():
+    book = InteractiveBook("Titel", "Autor")
+    book.enable_history(depth=3)
+    for i in range(10):
+        book.add_chapter(str(i), "x")
+    assert sum(1 for _ in iter(book.undo, None)) == 3
+    assert len(book.chapters) == 7
+
+    book = InteractiveBook("Titel", "Autor")
+    book.enable_history(max_bytes=20_000)
+    for i in range(10):
+        book.add_chapter(str(i), "x" * 5000)
+    assert book.history.bytes <= 20_000
+    assert 0 < sum(1 for _ in iter(book.undo, None)) < 10
+
+
+def test_undo_keeps_search_index_in_sync():
+    book = InteractiveBook("Titel", "Autor")
+    book.enable_history()
+    book.add_chapter("A", "drache")
+    book.enable_search()
+    book.edit_chapter(0, content="einhorn")
+    assert book.search("drache") == [] and len(book.search("einhorn")) == 1
+    book.undo()
+    assert [i for i, _ in book.search("drache")] == [0]
+    assert book.search("einhorn") == []
+
+
+def test_history_cannot_change_old_chapters():
+    book = InteractiveBook("Titel", "Autor")
+    book.enable_history()
+    chapter = book.add_chapter("A", "alt")
+    book.edit_chapter(0, content="neu")
+    assert chapter.content == "alt"
+    book.undo()
+    assert book.chapters[0] is chapter
+
+
+def test_undo_is_written_to_the_journal(tmp_path):
+    path = str(tmp_path / "buch")
+    book = InteractiveBook.open_journaled(path, "Titel", "Autor")
+    book.enable_history()
+    book.add_chapters([("A", "a"), ("B", "b")])
+    book.edit_chapter(1, content="neu")
+    book.remove_chapter(0)
+    book.clear()
+    book.undo()
+    book.undo()
+    book.redo()
+    expected = _snapshot(book)
+    book.close()
+
+    reopened = InteractiveBook.open_journaled(path)
+    assert _snapshot(reopened) == expected
+    reopened.close()
+
+
+def test_chapter_list_type():
+    book = InteractiveBook("Titel", "Autor")
+    book.add_chapter("A", "a")
+    book.enable_history()
+    assert isinstance(book.chapters, VersionedList)
+    assert book.chapters == [Chapter("A", "a")]
@@ -0,0 +1,75 @@
+"""Massen-Import: add_chapters und das Einlesen eines Kapitel-Verzeichnisses"""
+
+import pytest
+
+from book_builder import Chapter, InteractiveBook
+from book_import import find_chapter_files, iter_chapter_files, parse_chapter_file
+
+
+def test_add_chapters_accepts_all_formats_without_output(capsys):
+    book = InteractiveBook("Titel", "Autor")
+    added = book.add_chapters([
+        Chapter("Eins", "a"),
+        {"title": "Zwei", "content": "b", "image": "bild.png"},
+        ("Drei", "c"),
+        ("Vier", "d", None),
+    ])
+    assert added == 4
+    assert [chapter.title for chapter in book.chapters] == ["Eins", "Zwei", "Drei", "Vier"]
+    assert book.chapters[1].image == "bild.png"
+    assert capsys.readouterr().out == ""
+
+
+def test_add_chapters_from_generator_with_history():
+    book = InteractiveBook("Titel", "Autor")
+    book.add_chapter("Vorher", "x")
+    book.enable_history()
+    assert book.add_chapters((f"K{i}", str(i)) for i in range(3)) == 3
+    assert len(book.chapters) == 4
+    book.undo()
+    assert [chapter.title for chapter in book.chapters] == ["Vorher"]
+
+
+def test_parse_markdown_title_and_image(tmp_path):
+    (tmp_path / "bilder").mkdir()
+    path = tmp_path / "01_start.md"
+    path.write_text("\n# Der Anfang #\n\n![Karte](bilder/karte.png)\n\nErster *Absatz*.\n", encoding="utf-8")
+    title, content, image = parse_chapter_file(str(path))
+    assert title == "Der Anfang"
+    assert content == "Erster *Absatz*."
+    assert image == str(tmp_path / "bilder" / "karte.png")
+
+
+def test_parse_text_file_uses_file_name(tmp_path):
+    path = tmp_path / "zweites_kapitel.txt"
+    path.write_text("﻿# keine Überschrift\nText", encoding="utf-8")
+    assert parse_chapter_file(str(path)) == ("zweites kapitel", "# keine Überschrift\nText", None)
+
+
+def test_remote_image_is_kept(tmp_path):
+    path = tmp_path / "a.md"
+    path.write_text("![x](https://example.org/a.png)\nText", encoding="utf-8")
+    assert parse_chapter_file(str(path))[2] == "https://example.org/a.png"
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_directory_import_keeps_file_order(tmp_path, workers):
+    for i in reversed(range(20)):
+        (tmp_path / f"{i:03d}.md").write_text(f"# Kapitel {i}\n\nText {i}", encoding="utf-8")
+    (tmp_path / "notizen.json").write_text("{}", encoding="utf-8")
+    (tmp_path / "unterordner.md").mkdir()
+
+    assert len(find_chapter_files(str(tmp_path))) == 20
+    chapters = list(iter_chapter_files(str(tmp_path), workers=workers, use_processes=False, batch_size=4))
+    assert [title for title, _, _ in chapters] == [f"Kapitel {i}" for i in range(20)]
+
+    book = InteractiveBook("Titel", "Autor")
+    assert book.import_directory(str(tmp_path), workers=workers, use_processes=False) == 20
+    assert book.chapters[7].content == "Text 7"
+
+
+def test_directory_import_with_processes(tmp_path):
+    for i in range(3):
+        (tmp_path / f"{i}.txt").write_text(f"Text {i}", encoding="utf-8")
+    chapters = list(iter_chapter_files(str(tmp_path), workers=2))
+    assert chapters == [(str(i), f"Text {i}", None) for i in range(3)]
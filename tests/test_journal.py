@@ -0,0 +1,197 @@
+"""Journal: Abspielen nach Neustart und Wiederherstellung nach Absturz"""
+
+import os
+
+import pytest
+
+from book_builder import Chapter, InteractiveBook
+
+
+def _state(book):
+    return book.title, book.author, [chapter.to_dict() for chapter in book.chapters]
+
+
+def _reopen(book, path):
+    book.journal.close()
+    return InteractiveBook.open_journaled(path)
+
+
+def test_replay_restores_every_operation(tmp_path):
+    path = str(tmp_path / "autosave")
+    book = InteractiveBook.open_journaled(path, title="Titel", author="Autor")
+    book.add_chapter("Eins", "Text eins", "bild.png")
+    book.add_chapters([("Zwei", "Text zwei"), ("Drei", "Text drei")])
+    book.insert_chapter(1, Chapter("Eingefügt", "neu"))
+    book.edit_chapter(0, content="geändert", image_path="")
+    book.move_chapter(3, 0)
+    book.remove_chapter(2)
+    book.set_meta("Neuer Titel", "Neuer Autor")
+    expected = _state(book)
+
+    restored = _reopen(book, path)
+    assert _state(restored) == expected
+    restored.journal.close()
+
+
+def test_replay_on_top_of_snapshot(tmp_path):
+    path = str(tmp_path / "autosave")
+    book = InteractiveBook.open_journaled(path)
+    book.add_chapters([(f"Kapitel {i}", f"Text {i}") for i in range(5)])
+    book.compact()
+    assert book.journal.entries == 0
+    book.remove_chapter(0)
+    book.edit_chapter(-1, chapter_title="Letztes")
+    expected = _state(book)
+
+    restored = _reopen(book, path)
+    assert _state(restored) == expected
+    restored.journal.close()
+
+
+def test_undo_and_redo_are_journaled(tmp_path):
+    path = str(tmp_path / "autosave")
+    book = InteractiveBook.open_journaled(path)
+    book.enable_history()
+    book.add_chapter("Eins", "a")
+    book.add_chapter("Zwei", "b")
+    book.move_chapter(1, 0)
+    book.undo()
+    book.undo()
+    book.redo()
+    expected = _state(book)
+
+    restored = _reopen(book, path)
+    assert _state(restored) == expected
+    restored.journal.close()
+
+
+def test_clear_is_replayed(tmp_path):
+    path = str(tmp_path / "autosave")
+    book = InteractiveBook.open_journaled(path, title="Titel")
+    book.add_chapter("Eins", "a")
+    book.clear()
+
+    restored = _reopen(book, path)
+    assert _state(restored) == ("", "", [])
+    restored.journal.close()
+
+
+def test_torn_last_line_is_discarded(tmp_path):
+    path = str(tmp_path / "autosave")
+    book = InteractiveBook.open_journaled(path)
+    book.add_chapter("Eins", "a")
+    book.add_chapter("Zwei", "b")
+    book.journal.close()
+    journal_path = book.journal.journal_path
+    intact = os.path.getsize(journal_path)
+    # Absturz mitten im Schreiben der dritten Zeile
+    with open(journal_path, 'a', encoding='utf-8') as f:
+        f.write('{"op":"add","title":"Dr')
+
+    restored = InteractiveBook.open_journaled(path)
+    assert [chapter.title for chapter in restored.chapters] == ["Eins", "Zwei"]
+    assert os.path.getsize(journal_path) == intact
+    # Weitere Einträge landen hinter der letzten vollständigen Zeile
+    restored.add_chapter("Drei", "c")
+    restored = _reopen(restored, path)
+    assert [chapter.title for chapter in restored.chapters] == ["Eins", "Zwei", "Drei"]
+    restored.journal.close()
+
+
+def test_corrupt_line_stops_replay(tmp_path):
+    path = str(tmp_path / "autosave")
+    book = InteractiveBook.open_journaled(path)
+    book.add_chapter("Eins", "a")
+    book.journal.close()
+    with open(book.journal.journal_path, 'a', encoding='utf-8') as f:
+        f.write('{"op": kaputt}\n{"op":"add","title":"Zwei","content":"b"}\n')
+
+    restored = InteractiveBook.open_journaled(path)
+    assert [chapter.title for chapter in restored.chapters] == ["Eins"]
+    restored.journal.close()
+
+
+def test_empty_journal_opens_empty_book(tmp_path):
+    path = str(tmp_path / "autosave")
+    book = InteractiveBook.open_journaled(path, title="Titel", author="Autor")
+    assert not book.journal.has_data()
+    assert _state(book) == ("Titel", "Autor", [])
+    book.journal.close()
+
+
+class _Crash(Exception):
+    pass
+
+
+def _crash_before_truncate(journal):
+    def crash():
+        raise _Crash()
+    journal._truncate_journal = crash
+
+
+def test_crash_between_snapshot_and_truncate(tmp_path):
+    path = str(tmp_path / "autosave")
+    book = InteractiveBook.open_journaled(path)
+    book.add_chapter("a", "1")
+    book.add_chapter("b", "2")
+    book.move_chapter(1, 0)
+    book.remove_chapter(1)
+    expected = _state(book)
+    _crash_before_truncate(book.journal)
+    # Snapshot liegt schon, das Journal enthält noch dieselben Einträge
+    with pytest.raises(_Crash):
+        book.compact()
+    book.journal._file.close()
+
+    restored = InteractiveBook.open_journaled(path)
+    assert _state(restored) == expected
+    # Das veraltete Journal wurde verworfen; neue Einträge gelten wieder
+    restored.add_chapter("c", "3")
+    expected = _state(restored)
+    restored = _reopen(restored, path)
+    assert _state(restored) == expected
+    restored.journal.close()
+
+
+def test_crash_after_later_snapshot(tmp_path):
+    path = str(tmp_path / "autosave")
+    book = InteractiveBook.open_journaled(path)
+    book.add_chapters([("a", "1"), ("b", "2")])
+    book.compact()
+    book.edit_chapter(0, chapter_title="A")
+    book.compact()
+    book.add_chapter("c", "3")
+    expected = _state(book)
+    _crash_before_truncate(book.journal)
+    with pytest.raises(_Crash):
+        book.compact()
+    book.journal._file.close()
+
+    restored = InteractiveBook.open_journaled(path)
+    assert _state(restored) == expected
+    restored.journal.close()
+
+
+def test_journal_without_header_is_replayed(tmp_path):
+    # Journale aus Versionen ohne Generation gelten als Generation 0
+    path = str(tmp_path / "autosave")
+    with open(path + ".journal", 'w', encoding='utf-8') as f:
+        f.write('{"op":"add","title":"a","content":"1"}\n{"op":"meta","title":"T","author":null}\n')
+    book = InteractiveBook.open_journaled(path)
+    assert (book.title, [chapter.title for chapter in book.chapters]) == ("T", ["a"])
+    book.journal.close()
+
+
+def test_clear_discards_snapshot_and_journal(tmp_path):
+    path = str(tmp_path / "autosave")
+    book = InteractiveBook.open_journaled(path)
+    book.add_chapter("a", "1")
+    book.compact()
+    book.add_chapter("b", "2")
+    book.journal.clear()
+    assert not book.journal.has_data()
+    book.add_chapter("c", "3")
+
+    restored = _reopen(book, path)
+    assert [chapter.title for chapter in restored.chapters] == ["c"]
+    restored.journal.close()
@@ -0,0 +1,68 @@
+"""Streamendes Lesen der Buch-JSON: Gleichheit mit json.loads, lineare Laufzeit, frühe Fehler"""
+
+import io
+import json
+import random
+import time
+
+import pytest
+
+import book_builder
+from book_builder import iter_json_chapters
+
+
+def _book(seed: int) -> dict:
+    rng = random.Random(seed)
+    return {
+        "title": "Titel ä",
+        "author": "Autor",
+        "extra": [1.5e10, -3, None, True, "\\u00e9"],
+        "chapters": [{"title": str(i),
+                      "content": rng.choice(["éx", "\n" * 30, "  " * 40, "ab\"c"]) * rng.randint(0, 50),
+                      "wert": -12345.678e-3}
+                     for i in range(rng.randint(0, 5))],
+    }
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_matches_json_loads_with_tiny_chunks(seed, monkeypatch):
+    monkeypatch.setattr(book_builder, "_JSON_CHUNK_SIZE", 7)
+    data = _book(seed)
+    text = json.dumps(data, indent=random.Random(seed).choice([None, 2, 40]), ensure_ascii=seed % 2 == 0)
+    meta = {}
+    assert list(iter_json_chapters(io.StringIO(text), meta)) == data["chapters"]
+    assert meta == {key: value for key, value in data.items() if key != "chapters"}
+
+
+def test_long_chapter_is_decoded_in_linear_time():
+    text = json.dumps({"title": "t", "chapters": [{"title": "x", "content": "abc\"" * 2_000_000}]})
+    started = time.perf_counter()
+    json.loads(text)
+    reference = time.perf_counter() - started
+    started = time.perf_counter()
+    chapters = list(iter_json_chapters(io.StringIO(text)))
+    elapsed = time.perf_counter() - started
+    assert len(chapters[0]["content"]) == 8_000_000
+    # Früher quadratisch (etwa 100-mal langsamer als json.loads)
+    assert elapsed < max(20 * reference, 0.5)
+
+
+class _CountingReader(io.StringIO):
+    def __init__(self, text):
+        super().__init__(text)
+        self.consumed = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.consumed += len(chunk)
+        return chunk
+
+
+def test_malformed_chapter_is_reported_early():
+    good = {"title": "gut", "content": "x" * 1000}
+    text = ('{"title": "t", "chapters": [{"title": "kaputt", "content": "a" bad}, '
+            + ", ".join(json.dumps(good) for _ in range(2000)) + "]}")
+    reader = _CountingReader(text)
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_chapters(reader))
+    assert reader.consumed < len(text) // 10
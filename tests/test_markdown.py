@@ -0,0 +1,99 @@
+"""Kapiteltext als Markdown-Teilmenge: Auszeichnungen, Escaping und Platzhalter in den Exporten"""
+
+import glob
+import os
+import re
+
+import pytest
+
+from book_builder import Chapter, InteractiveBook, render_markdown
+
+HOSTILE = "\"'><script>alert(1)</script>&amp;\x00\x01"
+
+
+@pytest.mark.parametrize("text, html", [
+    ("a *b* **c** _d_ __e__", "<p>a <em>b</em> <strong>c</strong> <em>d</em> <strong>e</strong></p>\n"),
+    ("[Weiter](kapitel_2.html)", '<p><a href="kapitel_2.html">Weiter</a></p>\n'),
+    ("# Titel\n\nText", "<h3>Titel</h3>\n<p>Text</p>\n"),
+    ("- a\n- b", "<ul>\n<li>a</li>\n<li>b</li>\n</ul>\n"),
+    ("3. x\n4. y", '<ol start="3">\n<li>x</li>\n<li>y</li>\n</ol>\n'),
+    ("***", "<hr>\n"),
+    ("\\*kein\\* Stern", "<p>*kein* Stern</p>\n"),
+    ("", ""),
+])
+def test_markup(text, html):
+    assert render_markdown(text) == html
+
+
+@pytest.mark.parametrize("text, html", [
+    ("*a **b", "<p>*a **b</p>\n"),
+    ("[a *b](c)*", '<p><a href="c">a *b</a>*</p>\n'),
+    # Hervorhebungen schließen nicht über ein offenes "[" hinweg
+    ("*a [b* c](d)", '<p>*a <a href="d">b* c</a></p>\n'),
+    ("**a [b** c", "<p>**a [b** c</p>\n"),
+    ("*[a](b)*", '<p><em><a href="b">a</a></em></p>\n'),
+    ("[*a*](b)", '<p><a href="b"><em>a</em></a></p>\n'),
+    ("***x***", "<p><strong><em>x</em></strong></p>\n"),
+    ("[offen", "<p>[offen</p>\n"),
+    ("snake_case_name", "<p>snake_case_name</p>\n"),
+])
+def test_unbalanced_and_nested_markup(text, html):
+    assert render_markdown(text) == html
+
+
+def test_html_is_escaped():
+    assert render_markdown("<b>&\"'</b>") == "<p>&lt;b&gt;&amp;&quot;&#x27;&lt;/b&gt;</p>\n"
+    html = render_markdown('[x](https://a.b/?q=1&r="2")')
+    assert html == '<p><a href="https://a.b/?q=1&amp;r=&quot;2&quot;">x</a></p>\n'
+
+
+@pytest.mark.parametrize("url", [
+    "javascript:alert", "JavaScript:alert", "\x01javascript:alert", "\tjavascript:alert",
+    "data:text/html", "vbscript:x",
+])
+def test_unsafe_link_targets(url):
+    hrefs = re.findall(r'href="([^"]*)"', render_markdown(f"[x]({url})"))
+    assert all(href == "#" for href in hrefs)
+
+
+@pytest.mark.parametrize("url", ["https://example.org/", "mailto:a@b.de", "bilder/karte.png", "#anker"])
+def test_safe_link_targets(url):
+    assert render_markdown(f"[x]({url})") == f'<p><a href="{url}">x</a></p>\n'
+
+
+def test_placeholders_are_stripped_from_text():
+    assert render_markdown("a\x00b\x01c") == "<p>abc</p>\n"
+
+
+def _export_all(book, directory):
+    book.save_to_html(os.path.join(directory, "buch.html"), search=True)
+    book.save_to_html_pages(os.path.join(directory, "seiten"))
+    book.export("reader", os.path.join(directory, "reader"))
+    return [path for path in glob.glob(os.path.join(directory, "**", "*.html"), recursive=True)]
+
+
+def test_user_fields_are_escaped_in_every_html_export(tmp_path):
+    book = InteractiveBook(title=HOSTILE, author=HOSTILE)
+    book.chapters.append(Chapter(HOSTILE, HOSTILE, HOSTILE, "k1", ((HOSTILE, "k1"),)))
+    book.chapters.append(Chapter("Zwei", "Text", None, "k\x012", (("zurück", "k1"),)))
+    paths = _export_all(book, str(tmp_path))
+    assert len(paths) >= 4
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        assert "<script>alert" not in html, path
+        assert "'>" not in html and "\"'" not in html, path
+        assert "\x00" not in html and "\x01" not in html, path
+        assert "&amp;amp;" in html, path
+
+
+def test_choice_targets_survive_any_id(tmp_path):
+    book = InteractiveBook(title="Titel", author="Autor")
+    book.chapters.append(Chapter("Eins", "a", None, "k1", (("zu zwei", "k\x002"), ("zu drei", "k\x013"))))
+    book.chapters.append(Chapter("Zwei", "b", None, "k\x002"))
+    book.chapters.append(Chapter("Drei", "c", None, "k\x013"))
+    path = str(tmp_path / "buch.html")
+    book.save_to_html(path)
+    with open(path, encoding="utf-8") as f:
+        links = re.findall(r'<a href="([^"]*)">zu (\w+)</a>', f.read())
+    assert links == [("#kapitel-2", "zwei"), ("#kapitel-3", "drei")]
@@ -0,0 +1,85 @@
+"""Gepacktes Buchformat (.kibook): Round-Trip, wahlfreier Zugriff, ungültige Dateien"""
+
+import struct
+
+import pytest
+
+import book_pack
+from book_builder import Chapter, InteractiveBook
+from book_pack import PackedBook, write_pack
+
+
+def _book():
+    book = InteractiveBook(title="Reise – ü", author="Autorin")
+    book.add_chapters([
+        Chapter("Eins", "Erster Text\n\nmit Absatz", "bilder/eins.png", "k1", (("Weiter", "k2"),)),
+        Chapter("Zwei", "", None, "k2"),
+        Chapter("Drei", "x" * 100000),
+    ])
+    return book
+
+
+@pytest.mark.parametrize("compression", sorted(book_pack.COMPRESSIONS))
+def test_round_trip(tmp_path, compression):
+    book = _book()
+    path = str(tmp_path / "buch.kibook")
+    book.save_to_pack(path, compression=compression)
+
+    loaded = InteractiveBook.load_from_pack(path)
+    assert (loaded.title, loaded.author) == (book.title, book.author)
+    assert list(loaded.chapters) == list(book.chapters)
+
+
+def test_random_access(tmp_path):
+    book = _book()
+    path = str(tmp_path / "buch.kibook")
+    book.save_to_pack(path)
+
+    with InteractiveBook.open_pack(path) as packed:
+        assert len(packed) == 3
+        assert packed[1] == book.chapters[1]
+        assert packed[-1] == book.chapters[2]
+        with pytest.raises(IndexError):
+            packed[3]
+        with pytest.raises(IndexError):
+            packed[-4]
+
+
+def test_empty_book(tmp_path):
+    path = str(tmp_path / "leer.kibook")
+    assert write_pack(path, {}, []) == 0
+    with PackedBook(path) as packed:
+        assert len(packed) == 0
+        assert list(packed) == []
+        assert (packed.title, packed.author) == ("", "")
+
+
+def test_chapters_are_read_once(tmp_path):
+    path = str(tmp_path / "buch.kibook")
+    chapters = ({"title": f"Kapitel {i}", "content": "Text"} for i in range(10))
+    assert write_pack(path, {"title": "Generator"}, chapters) == 10
+    with PackedBook(path) as packed:
+        assert packed[9] == {"title": "Kapitel 9", "content": "Text"}
+
+
+def test_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        write_pack(str(tmp_path / "buch.kibook"), {}, [], compression="brotli")
+
+
+@pytest.mark.parametrize("data", [b"", b"KIBOOK", b"NOBOOK" + b"\0" * 64])
+def test_invalid_file(tmp_path, data):
+    path = tmp_path / "kaputt.kibook"
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        PackedBook(str(path))
+
+
+def test_unsupported_version(tmp_path):
+    path = str(tmp_path / "buch.kibook")
+    write_pack(path, {}, [{"title": "a"}])
+    with open(path, 'r+b') as f:
+        f.seek(6)
+        f.write(struct.pack("<H", book_pack.VERSION + 1))
+    with pytest.raises(ValueError, match="Version"):
+        PackedBook(path)
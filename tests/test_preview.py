@@ -0,0 +1,86 @@
+"""Vorschau-Server: Seiten, ETag/304, Cache, Bilder und Host-Prüfung"""
+
+import http.client
+
+import pytest
+
+from book_builder import InteractiveBook
+from book_preview import PreviewServer
+
+
+@pytest.fixture
+def preview():
+    book = InteractiveBook("Titel", "Autor")
+    book.add_chapters([("Eins", "Erster *Text*"), ("Zwei", "Zweiter Text"), ("Drei", "Dritter Text")])
+    server = PreviewServer(book).start()
+    yield server
+    server.stop()
+
+
+def _get(server: PreviewServer, path: str, host: str = None, **headers):
+    port = server._httpd.server_address[1]
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        connection.putrequest("GET", path, skip_host=True)
+        connection.putheader("Host", f"127.0.0.1:{port}" if host is None else host)
+        for name, value in headers.items():
+            connection.putheader(name.replace("_", "-"), value)
+        connection.endheaders()
+        response = connection.getresponse()
+        return response.status, response.getheader("ETag"), response.read()
+    finally:
+        connection.close()
+
+
+def test_pages_and_not_found(preview):
+    status, _, body = _get(preview, "/")
+    assert status == 200 and b"Zwei" in body
+    status, _, body = _get(preview, "/2.html")
+    assert status == 200 and b"Zweiter Text" in body and b"EventSource" in body
+    for path in ("/0.html", "/4.html", "/x.html", "/2", "/bild/1"):
+        assert _get(preview, path)[0] == 404
+
+
+def test_matching_etag_returns_304(preview):
+    status, etag, _ = _get(preview, "/1.html")
+    assert status == 200 and etag
+    status, same, body = _get(preview, "/1.html", If_None_Match=etag)
+    assert (status, same, body) == (304, etag, b"")
+    assert _get(preview, "/1.html", If_None_Match=f'"anders", W/{etag}')[0] == 304
+    assert preview.not_modified == 2
+
+
+def test_only_changed_chapter_gets_new_etag(preview):
+    etags = [_get(preview, f"/{i}.html")[1] for i in (1, 2, 3)]
+    misses = preview.misses
+    assert _get(preview, "/2.html")[0] == 200 and preview.misses == misses
+
+    preview.book.edit_chapter(2, content="Geändert")
+    after = [_get(preview, f"/{i}.html")[1] for i in (1, 2, 3)]
+    assert after[:2] == etags[:2] and after[2] != etags[2]
+    assert _get(preview, "/3.html", If_None_Match=etags[2])[0] == 200
+
+    # Ein neues Kapitel ändert den "Weiter"-Link der bisher letzten Seite
+    preview.book.add_chapter("Vier", "Text")
+    assert _get(preview, "/3.html")[1] != after[2]
+    assert _get(preview, "/1.html")[1] == etags[0]
+
+
+def test_chapter_image(preview, tmp_path):
+    image = tmp_path / "bild.png"
+    image.write_bytes(b"\x89PNG\r\n\x1a\n")
+    preview.book.edit_chapter(0, image_path=str(image))
+    assert b'src="bild/1"' in _get(preview, "/1.html")[2]
+    status, etag, body = _get(preview, "/bild/1")
+    assert (status, body) == (200, b"\x89PNG\r\n\x1a\n")
+    assert _get(preview, "/bild/1", If_None_Match=etag)[0] == 304
+
+
+def test_foreign_host_is_rejected(preview):
+    port = preview._httpd.server_address[1]
+    assert _get(preview, "/", host=f"localhost:{port}")[0] == 200
+    assert _get(preview, "/", host=f"LOCALHOST:{port}")[0] == 200
+    for host in (f"angreifer.example:{port}", "127.0.0.1", f"127.0.0.1:{port + 1}", ""):
+        status, _, body = _get(preview, "/1.html", host=host)
+        assert status == 403 and b"Zweiter" not in body
+    assert _get(preview, "/events", host=f"angreifer.example:{port}")[0] == 403
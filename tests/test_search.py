@@ -0,0 +1,92 @@
+"""Volltextsuche: BM25-Rangfolge, Präfixe, Phrasen und inkrementelle Aktualisierung"""
+
+import json
+
+from book_builder import InteractiveBook
+from book_search import SearchIndex, tokenize
+
+
+def _index(**docs) -> SearchIndex:
+    index = SearchIndex()
+    for key, text in docs.items():
+        index.add(key, text)
+    return index
+
+
+def test_tokenize():
+    assert tokenize("Über die Brücke, zu Fuß!") == ["über", "die", "brücke", "zu", "fuß"]
+
+
+def test_bm25_prefers_frequent_and_rare_terms():
+    index = _index(a="drache drache drache burg", b="drache wald wald wald", c="wald burg")
+    assert [key for key, _ in index.search("drache")] == ["a", "b"]
+    # "burg" und "drache" müssen beide vorkommen
+    assert [key for key, _ in index.search("drache burg")] == ["a"]
+    assert index.search("einhorn") == []
+
+
+def test_prefix_and_phrase_queries():
+    index = _index(a="der rote drache schläft", b="drache rot gefärbt", c="die drachenhöhle")
+    assert {key for key, _ in index.search("drach*")} == {"a", "b", "c"}
+    assert [key for key, _ in index.search('"rote drache"')] == ["a"]
+    assert [key for key, _ in index.search("rote-drache")] == ["a"]
+    assert index.search('"drache rote"') == []
+    assert index.search('""') == []
+
+
+def test_remove_updates_scores():
+    index = _index(a="drache", b="drache burg")
+    index.remove("a", "drache")
+    assert "a" not in index
+    assert [key for key, _ in index.search("drache")] == ["b"]
+    index.remove("b", "drache burg")
+    assert len(index) == 0 and index.postings == {}
+
+
+def test_save_and_load(tmp_path):
+    index = _index(a="der rote drache", b="ein grüner wald")
+    filename = str(tmp_path / "index.json")
+    index.save(filename)
+    loaded = SearchIndex.load(filename)
+    assert loaded.search("rot*") == index.search("rot*")
+
+
+def test_book_search_follows_edits(tmp_path):
+    book = InteractiveBook("Titel", "Autor")
+    book.add_chapter("Burg", "Die Burg steht am Fluss.")
+    book.add_chapter("Wald", "Im Wald wohnt ein Drache.")
+    book.add_chapter("Kopie", "Im Wald wohnt ein Drache.")
+    assert [i for i, _ in book.search("drache")] == [1, 2]
+
+    book.edit_chapter(1, content="Hier wohnt niemand.")
+    book.remove_chapter(0)
+    assert [i for i, _ in book.search("drache")] == [1]
+    assert [i for i, _ in book.search("niemand")] == [0]
+    assert book.search("fluss") == []
+
+
+def test_saved_index_reindexes_only_changed_chapters(tmp_path, monkeypatch):
+    book = InteractiveBook("Titel", "Autor")
+    book.add_chapters([("Eins", "alpha"), ("Zwei", "beta")])
+    filename = str(tmp_path / "buch.search.json")
+    book.save_search_index(filename)
+
+    book.edit_chapter(1, content="gamma")
+    added = []
+    original = SearchIndex.add
+    monkeypatch.setattr(SearchIndex, "add", lambda self, key, text: (added.append(text), original(self, key, text)))
+    book.enable_search(filename)
+    assert len(added) == 1 and "gamma" in added[0]
+    assert [i for i, _ in book.search("beta")] == []
+    assert [i for i, _ in book.search("gamma")] == [1]
+
+
+def test_html_export_writes_search_shard(tmp_path):
+    book = InteractiveBook("Titel", "Autor")
+    book.add_chapters([("Eins", "alpha beta"), ("Zwei", "beta")])
+    book.save_to_html(str(tmp_path / "buch.html"), search=True)
+    script = (tmp_path / "buch.search.js").read_text(encoding="utf-8")
+    data = json.loads(script[len("window.BOOK_SEARCH = "):].rstrip(";\n"))
+    assert data["count"] == 2 and data["titles"] == ["Eins", "Zwei"]
+    assert data["postings"][data["terms"].index("beta")] == [1, 1, 2, 1]
+    assert 'src="buch.search.js"' in (tmp_path / "buch.html").read_text(encoding="utf-8")
@@ -0,0 +1,133 @@
+"""Buch-Datenbank (.kidb): Reihenfolge über Ränge, Neuverteilung und Snapshots"""
+
+import random
+import sqlite3
+
+import pytest
+
+import book_store
+from book_builder import Chapter, InteractiveBook, _stored_chapter
+from book_store import ChapterStore
+
+
+def _open(path):
+    return ChapterStore(str(path), chapter_factory=_stored_chapter)
+
+
+def _titles(store):
+    return [chapter.title for chapter in store]
+
+
+def _db_ranks(store):
+    return [rank for (rank,) in store._db.execute("SELECT rank FROM chapters ORDER BY rank")]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_random_edits_match_a_list(tmp_path, monkeypatch, seed):
+    # Kleiner Abstand, damit Lücken oft voll sind und neu verteilt wird
+    monkeypatch.setattr(book_store, "RANK_GAP", 4)
+    rng = random.Random(seed)
+    path = tmp_path / "buch.kidb"
+    store = _open(path)
+    expected = []
+    for step in range(400):
+        action = rng.random()
+        if action < 0.4 or not expected:
+            index = rng.randint(-2, len(expected) + 2)
+            store.insert(index, Chapter(f"k{step}", "Text"))
+            expected.insert(index, f"k{step}")
+        elif action < 0.7:
+            source, target = rng.randrange(len(expected)), rng.randrange(len(expected))
+            store.move(source, target)
+            expected.insert(target, expected.pop(source))
+        elif action < 0.8:
+            index = rng.randrange(len(expected))
+            store[index] = Chapter(f"e{step}", "neu")
+            expected[index] = f"e{step}"
+        elif action < 0.9:
+            del store[rng.randrange(len(expected))]
+            expected = _titles(store)
+        else:
+            store.extend(Chapter(f"x{step}-{i}", "viele") for i in range(3))
+            expected.extend(f"x{step}-{i}" for i in range(3))
+        assert list(store._ranks) == _db_ranks(store)
+    assert _titles(store) == expected
+    assert [store[i].title for i in range(len(store))] == expected
+    store.close()
+
+    reopened = _open(path)
+    assert _titles(reopened) == expected
+    reopened.close()
+
+
+def test_respacing_rolls_back_with_failed_insert(tmp_path, monkeypatch):
+    monkeypatch.setattr(book_store, "RANK_GAP", 2)
+    store = _open(tmp_path / "buch.kidb")
+    store.extend(Chapter(f"k{i}", "Text") for i in range(3))
+    store.insert(1, Chapter("voll", "Text"))
+    ranks = list(store._ranks)
+    assert ranks == _db_ranks(store)
+
+    # Die Lücke ist voll: das Einfügen verteilt neu und scheitert dann
+    with pytest.raises(AttributeError):
+        store.insert(1, object())
+    assert list(store._ranks) == ranks == _db_ranks(store)
+    assert _titles(store) == ["k0", "voll", "k1", "k2"]
+
+    store.move(3, 1)
+    assert _titles(store) == ["k0", "k2", "voll", "k1"]
+    assert list(store._ranks) == _db_ranks(store)
+    store.close()
+
+
+def test_snapshot_does_not_see_later_changes(tmp_path):
+    store = _open(tmp_path / "buch.kidb")
+    store.extend(Chapter(f"k{i}", "Text") for i in range(5))
+
+    with store.snapshot() as snapshot:
+        store.move(0, 4)
+        del store[0]
+        store[0] = Chapter("geändert", "neu")
+        store.append(Chapter("neu", "Text"))
+        assert _titles(snapshot) == ["k0", "k1", "k2", "k3", "k4"]
+        assert snapshot[2].title == "k2"
+        assert list(snapshot.titles()) == ["k0", "k1", "k2", "k3", "k4"]
+    with pytest.raises(sqlite3.ProgrammingError):
+        snapshot[0]
+    assert _titles(store) == ["geändert", "k3", "k4", "k0", "neu"]
+    store.close()
+
+
+def test_book_copy_closes_its_snapshot(tmp_path):
+    book = InteractiveBook.open_store(str(tmp_path / "buch.kidb"), title="Titel", author="Autor")
+    book.add_chapters([("Eins", "a"), ("Zwei", "b")])
+    copy = book.copy()
+    book.remove_chapter(0)
+    assert [chapter.title for chapter in copy.chapters] == ["Eins", "Zwei"]
+    copy.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        copy.chapters[0]
+    book.close()
+
+
+def test_meta_and_clear_persist(tmp_path):
+    path = str(tmp_path / "buch.kidb")
+    book = InteractiveBook.open_store(path, title="Titel", author="Autor")
+    book.add_chapters([("Eins", "a"), ("Zwei", "b")])
+    book.close()
+
+    book = InteractiveBook.open_store(path)
+    assert (book.title, book.author, len(book.chapters)) == ("Titel", "Autor", 2)
+    book.clear()
+    book.close()
+
+    book = InteractiveBook.open_store(path)
+    assert (book.title, book.author, len(book.chapters)) == ("", "", 0)
+    book.close()
+
+
+def test_invalid_database(tmp_path):
+    path = tmp_path / "kaputt.kidb"
+    path.write_bytes(b"keine Datenbank" * 100)
+    with pytest.raises(ValueError):
+        ChapterStore(str(path))
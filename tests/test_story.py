@@ -0,0 +1,143 @@
+"""StoryGraph: inkrementelle Erreichbarkeit, Enden und längster Weg gegen Neuberechnung"""
+
+import random
+from collections import deque
+
+import pytest
+
+from book_builder import InteractiveBook
+from book_story import StoryGraph
+
+
+def _expected(choices, start):
+    """Erreichbare Knoten, erreichbare Enden, Zyklus und längster Weg, direkt berechnet"""
+    reachable = set()
+    if start in choices:
+        reachable.add(start)
+        queue = deque([start])
+        while queue:
+            for _label, target in choices[queue.popleft()]:
+                if target in choices and target not in reachable:
+                    reachable.add(target)
+                    queue.append(target)
+    endings = sum(1 for node in reachable if not choices[node])
+
+    longest = {}
+    active = set()
+
+    def length(node):
+        # Knoten auf dem längsten Weg ab node; None bei einem Zyklus
+        if node in active:
+            return None
+        if node not in longest:
+            active.add(node)
+            best = 1
+            for _label, target in choices[node]:
+                if target in choices:
+                    rest = length(target)
+                    if rest is None:
+                        return None
+                    best = max(best, rest + 1)
+            active.discard(node)
+            longest[node] = best
+        return longest[node]
+
+    path = length(start) if start in choices else 0
+    return reachable, endings, path is None, path
+
+
+def _check(graph, choices, start):
+    reachable, endings, cyclic, path = _expected(choices, start)
+    assert graph.reachable() == reachable
+    assert graph.ending_count() == endings
+    assert graph.ending_count(reachable_only=False) == sum(1 for c in choices.values() if not c)
+    assert graph.has_cycle() == cyclic
+    assert graph.longest_path_length() == (None if cyclic else path)
+    if not cyclic:
+        assert len(graph.longest_path()) == path
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_matches_recomputation(seed):
+    rng = random.Random(seed)
+    names = [f"k{i}" for i in range(12)]
+    choices = {}
+    graph = StoryGraph("k0")
+    start = "k0"
+
+    def random_choices():
+        # Ziele dürfen fehlen (Links ins Leere)
+        return tuple((f"zu {target}", target) for target in rng.sample(names, rng.randint(0, 3)))
+
+    for _ in range(600):
+        action = rng.random()
+        missing = [name for name in names if name not in choices]
+        if action < 0.35 and missing:
+            node = rng.choice(missing)
+            choices[node] = random_choices()
+            graph.add(node, choices[node])
+        elif action < 0.55 and choices:
+            node = rng.choice(sorted(choices))
+            del choices[node]
+            graph.remove(node)
+        elif action < 0.9 and choices:
+            node = rng.choice(sorted(choices))
+            choices[node] = random_choices()
+            graph.update(node, choices[node])
+        elif action < 0.95:
+            start = rng.choice(names)
+            graph.set_start(start)
+        # Abfragen zwischendurch halten die vorberechneten Daten aktuell,
+        # sonst würde nur die Neuberechnung geprüft
+        if rng.random() < 0.7:
+            _check(graph, choices, start)
+    _check(graph, choices, start)
+
+
+def test_new_links_extend_reachable_set():
+    graph = StoryGraph("a")
+    graph.add("a", (("weiter", "b"),))
+    assert graph.reachable() == {"a"}
+    graph.add("b", (("weiter", "c"), ("Ende", "d")))
+    graph.add("d")
+    assert graph.reachable() == {"a", "b", "d"}
+    assert graph.ending_count() == 1
+    graph.add("c", (("zurück", "a"),))
+    assert graph.reachable() == {"a", "b", "c", "d"}
+    assert graph.has_cycle()
+    assert graph.longest_path_length() is None
+    graph.update("c", ())
+    assert not graph.has_cycle()
+    assert graph.longest_path() == ["a", "b", "c"]
+
+
+def test_removed_link_shrinks_reachable_set():
+    graph = StoryGraph("a")
+    graph.add("a", (("1", "b"), ("2", "c")))
+    graph.add("b", (("1", "c"),))
+    graph.add("c")
+    assert graph.longest_path_length() == 3
+    graph.update("a", (("2", "c"),))
+    assert graph.reachable() == {"a", "c"}
+    assert graph.longest_path_length() == 2
+    graph.remove("c")
+    assert graph.reachable() == {"a"}
+    assert sorted(graph.validate()["dangling"]) == [("a", "2", "c"), ("b", "1", "c")]
+
+
+def test_book_keeps_graph_in_sync():
+    book = InteractiveBook("Geschichte", "Autor")
+    book.add_chapters([("Start", "a"), ("Mitte", "b"), ("Ende", "c"), ("Abseits", "d")])
+    book.enable_story()
+    book.add_choice(0, 1, "weiter")
+    book.add_choice(1, 2, "weiter")
+    assert book.story.longest_path_length() == 3
+    assert book.validate_story()["unreachable"] == [3]
+
+    book.remove_choice(1)
+    book.add_choice(1, 3, "abbiegen")
+    assert book.validate_story()["unreachable"] == [2]
+    # Das erste Kapitel ist der Start
+    book.move_chapter(1, 0)
+    assert book.story.reachable() == {"k2", "k4"}
+    assert book.validate_story()["unreachable"] == [1, 2]
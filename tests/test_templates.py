@@ -0,0 +1,70 @@
+"""Vorlagen und Themes: Übersetzung, Zwischenspeicher und Theme-Verzeichnisse"""
+
+import os
+import pickle
+
+import pytest
+
+from book_builder import InteractiveBook
+import book_templates
+from book_templates import DEFAULT_TEMPLATES, Theme, compile_template, get_theme, load_template, register_theme
+
+
+def test_placeholders_and_braces():
+    template = compile_template("a { $name } ${x}y $$ 5")
+    assert template.render(name="N", x="X") == "a { N } Xy $ 5"
+    assert template.fields == ["name", "x"]
+
+
+def test_invalid_placeholder():
+    with pytest.raises(ValueError):
+        compile_template("Preis: $ 5")
+
+
+def test_identical_sources_share_one_compiled_template():
+    assert compile_template("<p>$text</p>") is compile_template("<p>$text</p>")
+
+
+def test_template_file_is_reread_only_after_change(tmp_path):
+    path = tmp_path / "chapter.html"
+    path.write_text("<p>$title</p>", encoding="utf-8")
+    first = load_template(str(path))
+    assert load_template(str(path)) is first
+
+    path.write_text("<div>$title</div>", encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert load_template(str(path)).render(title="T") == "<div>T</div>"
+
+
+def test_theme_directory_overrides_and_fallback(tmp_path):
+    (tmp_path / "style.css").write_text("body { color: red; }", encoding="utf-8")
+    theme = Theme.from_directory(str(tmp_path))
+    assert theme.name == os.path.basename(str(tmp_path))
+    assert theme.templates["style"].source == "body { color: red; }"
+    assert theme.templates["chapter"].source == DEFAULT_TEMPLATES["chapter"]
+    assert theme.fingerprint != get_theme(None).fingerprint
+
+    fingerprint = theme.fingerprint
+    assert not theme.refresh()
+    (tmp_path / "chapter_image.html").write_text('<img src="$src">', encoding="utf-8")
+    assert theme.refresh() and theme.fingerprint != fingerprint
+
+
+def test_registered_theme_is_used_for_export(tmp_path, monkeypatch):
+    monkeypatch.setattr(book_templates, "THEMES", dict(book_templates.THEMES))
+    register_theme(Theme("test-rot", {"style": "body { color: red; }"}))
+    book = InteractiveBook("Titel", "Autor")
+    book.add_chapter("Eins", "Text")
+    book.set_theme("test-rot")
+    book.save_to_html(str(tmp_path / "buch.html"))
+    assert "color: red" in (tmp_path / "buch.html").read_text(encoding="utf-8")
+    with pytest.raises(ValueError):
+        book.set_theme("gibt-es-nicht")
+
+
+def test_theme_survives_pickling():
+    theme = Theme("kopie", {"style": "p {}"})
+    copy = pickle.loads(pickle.dumps(theme))
+    assert copy.fingerprint == theme.fingerprint
+    assert copy.render("chapter_image", src="a.png", title="t") == theme.render("chapter_image", src="a.png", title="t")